@@ -0,0 +1,3 @@
+"""
+Benchmarks untuk startup dan konverter bot
+"""
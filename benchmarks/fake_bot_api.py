@@ -0,0 +1,257 @@
+"""
+Local stand-in for the Telegram Bot API, for end-to-end runs of the bot
+
+Serves the methods the bot calls over plain HTTP: updates are queued for
+getUpdates (long polling) or POSTed to the registered webhook, uploads are
+served from memory, and every call the bot makes is recorded.
+
+    api = FakeBotAPI()
+    await api.start()
+    # BOT_API_BASE_URL=api.base_url, BOT_API_BASE_FILE_URL=api.base_file_url
+    await api.push_update(api.message_update(user_id, "/start"))
+    call = await api.wait_for('sendMessage')
+"""
+
+import json
+import time
+import asyncio
+import itertools
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl
+
+BOT_USER = {'id': 1000, 'is_bot': True, 'first_name': "Fake Bot", 'username': "fake_bot"}
+
+class FakeBotAPI:
+    """Bot API over HTTP on host:port (0 picks a free port)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.calls = []  # (method, params, received_at) in arrival order
+        self.files = {}  # file_id -> (file_path, content)
+        self.webhook = None  # {'url', 'secret_token'} once setWebhook was called
+        self._updates = []
+        self._hold_polls = True
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._changed = asyncio.Condition()
+        self._server = None
+        self._client = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        return f"http://{self.host}:{self.port}/file/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # Updates
+
+    def message_update(self, user_id: int, text: str = None, document: dict = None) -> dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': "Tester", 'username': "tester"},
+        }
+        if text is not None:
+            message['text'] = text
+            if text.startswith('/'):
+                command = text.split()[0]
+                message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        if document is not None:
+            message['document'] = document
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    def add_file(self, file_name: str, content: bytes) -> dict:
+        """Make content downloadable and return the document as found in a message"""
+        number = next(self._file_ids)
+        file_id = f"upload-{number}"
+        self.files[file_id] = (f"documents/{number}_{file_name}", content)
+        return {'file_id': file_id, 'file_unique_id': f"unique-{number}", 'file_name': file_name, 'file_size': len(content)}
+
+    async def push_update(self, update: dict) -> int:
+        """Deliver an update: to the webhook when one is set, else queue it for getUpdates
+
+        Returns the webhook's HTTP status, or 200 when queued.
+        """
+        if self.webhook:
+            return await self.post_to_webhook(update, self.webhook['secret_token'])
+        async with self._changed:
+            self._updates.append(update)
+            self._changed.notify_all()
+        return 200
+
+    async def post_to_webhook(self, update: dict, secret_token: str = None) -> int:
+        import httpx
+        if self._client is None:
+            self._client = httpx.AsyncClient()
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret_token} if secret_token else {}
+        response = await self._client.post(self.webhook['url'], json=update, headers=headers)
+        return response.status_code
+
+    async def release_polls(self):
+        """Answer getUpdates at once from now on, so the updater can stop without waiting"""
+        async with self._changed:
+            self._hold_polls = False
+            self._changed.notify_all()
+
+    # Recorded calls
+
+    async def wait_for(self, method: str, predicate=None, timeout: float = 10, after: int = 0) -> dict:
+        """Wait for the bot to call method (from call index after on); returns its params"""
+        async def find():
+            async with self._changed:
+                while True:
+                    for name, params, _ in self.calls[after:]:
+                        if name == method and (predicate is None or predicate(params)):
+                            return params
+                    await self._changed.wait()
+        return await asyncio.wait_for(find(), timeout)
+
+    def methods(self) -> list:
+        return [name for name, _, _ in self.calls]
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await self._read_body(reader, headers)
+
+                status, content_type, payload = await self._dispatch(method, target, headers, body)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_body(self, reader, headers: dict) -> bytes:
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await reader.readline()).strip() or b'0', 16)
+                if not size:
+                    await reader.readline()
+                    return body
+                body += await reader.readexactly(size)
+                await reader.readline()
+        return await reader.readexactly(int(headers.get('content-length', 0)))
+
+    async def _dispatch(self, method: str, target: str, headers: dict, body: bytes):
+        path = target.split('?', 1)[0]
+        if path.startswith('/file/bot'):
+            file_path = path.split('/', 3)[3]
+            for stored_path, content in self.files.values():
+                if stored_path == file_path:
+                    return '200 OK', 'application/octet-stream', content
+            return '404 Not Found', 'text/plain', b'not found'
+
+        if not path.startswith('/bot'):
+            return '404 Not Found', 'text/plain', b'not found'
+
+        api_method = path.rsplit('/', 1)[1]
+        params = self._parse_params(headers.get('content-type', ''), body)
+        result = await self._call(api_method, params)
+        payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+        return '200 OK', 'application/json', payload
+
+    def _parse_params(self, content_type: str, body: bytes) -> dict:
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+            )
+            params = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                content = part.get_payload(decode=True)
+                if part.get_filename():
+                    params[name] = {'filename': part.get_filename(), 'content': content}
+                else:
+                    params[name] = content.decode('utf-8')
+            return params
+        if content_type.startswith('application/json'):
+            return json.loads(body or b'{}')
+        return dict(parse_qsl(body.decode('utf-8')))
+
+    async def _call(self, method: str, params: dict):
+        if method == 'getUpdates':
+            # Long poll: hold the request until an update arrives or the timeout passes
+            offset = int(params.get('offset') or 0)
+            timeout = float(params.get('timeout') or 0)
+            async with self._changed:
+                self._updates = [update for update in self._updates if update['update_id'] >= offset]
+                if not self._updates and timeout and self._hold_polls:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                return list(self._updates)
+
+        await self._record(method, params)
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'setWebhook':
+            self.webhook = {'url': params['url'], 'secret_token': params.get('secret_token')}
+            return True
+        if method == 'deleteWebhook':
+            self.webhook = None
+            return True
+        if method == 'getFile':
+            file_path, content = self.files[params['file_id']]
+            return {'file_id': params['file_id'], 'file_unique_id': params['file_id'], 'file_size': len(content), 'file_path': file_path}
+        if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            return self._sent_message(params)
+        if method == 'sendMediaGroup':
+            media = json.loads(params['media'])
+            return [self._sent_message(params, item) for item in media]
+        return True
+
+    async def _record(self, method: str, params: dict):
+        async with self._changed:
+            self.calls.append((method, params, time.perf_counter()))
+            self._changed.notify_all()
+
+    def _sent_message(self, params: dict, media: dict = None) -> dict:
+        message = {
+            'message_id': int(params.get('message_id') or next(self._message_ids)),
+            'date': int(time.time()),
+            'chat': {'id': int(params['chat_id']), 'type': 'private'},
+            'from': BOT_USER,
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        if 'document' in params or media is not None:
+            number = next(self._file_ids)
+            message['document'] = {'file_id': f"sent-{number}", 'file_unique_id': f"sent-unique-{number}"}
+        return message
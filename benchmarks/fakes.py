@@ -0,0 +1,65 @@
+"""
+Minimal stand-ins for telegram Update/Context so handlers run without the Bot API
+"""
+
+import io
+import datetime
+from types import SimpleNamespace
+
+class FakeMessage:
+    """Records replies; uploaded documents are read to the end like a real upload"""
+
+    def __init__(self, text: str = None, document=None):
+        self.text = text
+        self.document = document
+        self.date = datetime.datetime.now()
+        self.replies = []
+        self.documents = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return FakeMessage(text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+    async def reply_document(self, document, filename=None, caption=None, **kwargs):
+        size = 0
+        if hasattr(document, 'read'):
+            while True:
+                chunk = document.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+        self.documents.append({'filename': filename, 'size': size, 'caption': caption})
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"fake-file-{len(self.documents)}"))
+
+    async def reply_media_group(self, media, **kwargs):
+        # Local files in InputMediaDocument are already read into InputFile objects
+        return tuple([
+            await self.reply_document(io.BytesIO(item.media.input_file_content), filename=item.media.filename, caption=item.caption)
+            for item in media
+        ])
+
+    def errors(self) -> list:
+        """Replies that report a failure to the user"""
+        return [text for text in self.replies if text.startswith('❌')]
+
+class FakeUpdate:
+    def __init__(self, user_id: int = 1, text: str = None, document=None):
+        self.message = FakeMessage(text, document)
+        self.effective_message = self.message
+        self.effective_user = SimpleNamespace(id=user_id, first_name="Bench", username="bench")
+        self.effective_chat = SimpleNamespace(id=user_id)
+
+class FakeContext:
+    def __init__(self, user_data: dict = None):
+        self.user_data = user_data if user_data is not None else {}
+        self.args = []
+        self.bot = None
+        self.application = None
+
+def make_document(file_name: str, file_size: int = 0):
+    """Document metadata as found on update.message.document"""
+    return SimpleNamespace(file_id="fake-upload", file_unique_id="fake-unique", file_name=file_name, file_size=file_size)
@@ -0,0 +1,104 @@
+"""
+Synthetic contact files for the converter benchmarks
+"""
+
+import os
+
+# Contact counts per size label
+SIZES = {
+    '1k': 1_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+# Generated files are cached here and reused across runs
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fixtures')
+
+# Separators accepted by parse_txt_contacts, cycled line by line
+TXT_SEPARATORS = ['|', ',', ':', ';', '\t']
+
+# Separators parse_txt_auto can detect, one fixture per separator
+AUTO_SEPARATORS = {
+    'pipe': '|',
+    'comma': ',',
+    'colon': ':',
+    'semicolon': ';',
+    'tab': '\t',
+    'dash': ' - ',
+}
+
+def contact_name(i: int) -> str:
+    return f"Kontak {i:07d}"
+
+def contact_phone(i: int) -> str:
+    return f"0812{i:08d}"
+
+def fold_line(line: str, width: int = 75) -> str:
+    """Fold a vCard content line at width octets with CRLF + space (RFC 6350)"""
+    if len(line) <= width:
+        return line
+    parts = [line[:width]]
+    for start in range(width, len(line), width - 1):
+        parts.append(' ' + line[start:start + width - 1])
+    return '\r\n'.join(parts)
+
+def write_txt(path: str, count: int, separator: str = None):
+    """Write Nama<sep>Nomor lines, cycling through all separators when separator is None"""
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for i in range(count):
+            sep = separator if separator is not None else TXT_SEPARATORS[i % len(TXT_SEPARATORS)]
+            f.write(f"{contact_name(i)}{sep}{contact_phone(i)}\n")
+
+def write_vcf(path: str, count: int):
+    """Write vCard 3.0 with CRLF line endings, folded NOTE lines and several TELs per contact"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for i in range(count):
+            lines = [
+                "BEGIN:VCARD",
+                "VERSION:3.0",
+                f"FN:{contact_name(i)}",
+                f"N:{i:07d};Kontak;;;",
+                f"TEL:{contact_phone(i)}",
+            ]
+            if i % 3 == 0:
+                lines.append(f"TEL;TYPE=HOME:021{i:08d}")
+            if i % 5 == 0:
+                lines.append(fold_line(f"NOTE:Catatan panjang untuk kontak {i} " + "lorem ipsum " * 12))
+            lines.append("END:VCARD")
+            f.write('\r\n'.join(lines) + '\r\n')
+
+def write_xlsx(path: str, count: int):
+    """Write an Excel sheet with Nama / Nomor HP columns, streaming rows"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Kontak')
+    sheet.append(['Nama', 'Nomor HP'])
+    for i in range(count):
+        sheet.append([contact_name(i), contact_phone(i)])
+    workbook.save(path)
+
+WRITERS = {
+    'txt': write_txt,
+    'vcf': write_vcf,
+    'xlsx': write_xlsx,
+}
+
+def get_fixture(kind: str, count: int, separator: str = None) -> str:
+    """Get path of a cached fixture, generating it on first use"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+    suffix = ''
+    if separator is not None:
+        suffix = '_' + next(name for name, sep in AUTO_SEPARATORS.items() if sep == separator)
+    path = os.path.join(FIXTURE_DIR, f"{kind}_{count}{suffix}.{kind}")
+
+    if not os.path.exists(path):
+        tmp_path = os.path.join(FIXTURE_DIR, f".tmp_{os.path.basename(path)}")
+        if kind == 'txt':
+            write_txt(tmp_path, count, separator)
+        else:
+            WRITERS[kind](tmp_path, count)
+        os.replace(tmp_path, path)
+
+    return path
@@ -0,0 +1,79 @@
+"""
+Cold-start import budget: fails when importing the bot gets slower or pulls in heavy dependencies
+
+Usage: python -m benchmarks.import_budget [--module main] [--budget-ms 1000] [--runs 3]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Import time allowed for the entry module, best of --runs (milliseconds)
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '1000'))
+
+# Modules that must only be imported on first use of a converter
+LAZY_MODULES = ('pandas', 'numpy', 'openpyxl', 'vobject')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str) -> dict:
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        head, cumulative_us, name = line.split('|', 2)
+        self_us = int(head.split(':', 1)[1])
+        timings[name.strip()] = (self_us, int(cumulative_us))
+    return timings
+
+def measure_imports(module: str) -> dict:
+    """Import module in a fresh interpreter and return its import timings"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def check_budget(module: str, budget_ms: float, runs: int) -> list:
+    """Measure module runs times and return a list of failures (empty when within budget)"""
+    best = None
+    for _ in range(runs):
+        timings = measure_imports(module)
+        if best is None or timings[module][1] < best[module][1]:
+            best = timings
+
+    total_ms = best[module][1] / 1000
+    print(f"import {module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms, best of {runs})")
+
+    print("Slowest modules (self time):")
+    for name, (self_us, _) in sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"import {module} took {total_ms:.1f} ms, over the {budget_ms:.0f} ms budget")
+
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='main', help="module imported on cold start")
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=3, help="take the fastest of this many runs")
+    args = parser.parse_args()
+
+    failures = check_budget(args.module, args.budget_ms, max(1, args.runs))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Converter benchmarks: wall time, peak RSS and throughput per operation and size
+
+Every (case, size) runs in its own interpreter so peak RSS is not shared between cases.
+
+Usage:
+    python -m benchmarks.run                          # all cases, all sizes
+    python -m benchmarks.run --sizes 1k,100k --cases txt_to_vcf,vcf_to_txt
+    python -m benchmarks.run --save-baseline          # store results as the new baseline
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import importlib
+import importlib.util
+import subprocess
+from dataclasses import dataclass
+from typing import Callable
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fixtures import SIZES, AUTO_SEPARATORS, get_fixture, contact_name
+from benchmarks.fakes import FakeUpdate, FakeContext, make_document
+from bot.metrics import OperationFailed
+
+RESULTS_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'latest.json')
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+
+# Slower or bigger than baseline by more than this fraction is a regression
+TOLERANCE = 0.25
+
+# Differences below these are noise, whatever the ratio
+MIN_WALL_DELTA = 0.05  # seconds
+MIN_RSS_DELTA = 5.0  # MB
+
+# Outputs are split into this many parts by the split cases
+SPLIT_PARTS = 10
+
+@dataclass(frozen=True)
+class Case:
+    """One benchmarked operation; run(update, context, paths, contacts) drives the handlers"""
+    name: str
+    fixture: str
+    run: Callable
+    separator: str = None
+    inputs: int = 1  # Merge cases spread the contacts over several files
+    modules: tuple = ()  # Lazily imported dependencies, loaded before timing; the case is skipped without them
+
+async def run_txt_to_vcf(update, context, paths, contacts):
+    from bot.file_converters import convert_txt_to_vcf
+    await convert_txt_to_vcf(update, context, paths[0])
+
+async def run_vcf_to_txt(update, context, paths, contacts):
+    from bot.file_converters import convert_vcf_to_txt
+    await convert_vcf_to_txt(update, context, paths[0])
+
+async def run_xlsx_to_vcf(update, context, paths, contacts):
+    from bot.file_converters import convert_xlsx_to_vcf
+    await convert_xlsx_to_vcf(update, context, paths[0])
+
+async def run_txt2vcf_auto(update, context, paths, contacts):
+    from bot.file_converters import convert_txt2vcf_auto
+    await convert_txt2vcf_auto(update, context, paths[0])
+
+async def run_split_parts(update, context, paths, contacts):
+    from bot.file_managers import split_vcf_file, process_split_parts
+    await split_vcf_file(update, context, paths[0])
+    await process_split_parts(update, context, str(SPLIT_PARTS))
+
+async def run_contacts_per_file(update, context, paths, contacts):
+    from bot.file_managers import split_vcf_by_contact, process_contacts_per_file
+    await split_vcf_by_contact(update, context, paths[0])
+    await process_contacts_per_file(update, context, str(max(1, contacts // SPLIT_PARTS)))
+
+async def run_merge(update, context, paths, contacts):
+    from bot.file_managers import add_file_to_merge, send_merge_result
+    kind = 'txt' if paths[0].endswith('.txt') else 'vcf'
+    context.user_data['waiting_for'] = f"merge_{kind}"
+    for path in paths:
+        await add_file_to_merge(update, context, path)
+    await send_merge_result(update, context)
+
+async def run_count_contact(update, context, paths, contacts):
+    from bot.contact_utils import count_contacts_in_vcf
+    await count_contacts_in_vcf(update, context, paths[0])
+
+async def run_rename_contact(update, context, paths, contacts):
+    from bot.file_managers import rename_contact_in_vcf
+    from bot.contact_utils import process_rename_contact
+    await rename_contact_in_vcf(update, context, paths[0])
+    await process_rename_contact(update, context, f"{contact_name(0)}|Kontak Baru")
+
+async def run_delete_contact(update, context, paths, contacts):
+    from bot.contact_utils import delete_contact_from_vcf, process_delete_contact
+    await delete_contact_from_vcf(update, context, paths[0])
+    await process_delete_contact(update, context, "1")
+
+CASES = {case.name: case for case in [
+    Case('txt_to_vcf', 'txt', run_txt_to_vcf),
+    Case('vcf_to_txt', 'vcf', run_vcf_to_txt, modules=('vobject',)),
+    Case('xlsx_to_vcf', 'xlsx', run_xlsx_to_vcf, modules=('pandas', 'openpyxl')),
+    *[Case(f"txt2vcf_auto[{name}]", 'txt', run_txt2vcf_auto, separator=sep) for name, sep in AUTO_SEPARATORS.items()],
+    Case('split_parts', 'vcf', run_split_parts),
+    Case('contacts_per_file', 'vcf', run_contacts_per_file),
+    Case('merge_txt', 'txt', run_merge, inputs=4),
+    Case('merge_vcf', 'vcf', run_merge, inputs=4),
+    Case('count_contact', 'vcf', run_count_contact, modules=('vobject',)),
+    Case('rename_contact', 'vcf', run_rename_contact),
+    Case('delete_contact', 'vcf', run_delete_contact),
+]}
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB, or 0 where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_child(case_name: str, size_label: str) -> dict:
+    """Run one case in this process and return its measurements"""
+    case = CASES[case_name]
+    contacts = SIZES[size_label]
+    per_file = contacts // case.inputs
+    fixture = get_fixture(case.fixture, per_file, case.separator)
+
+    # Load the handlers and the case's lazy dependencies outside the timed region
+    importlib.import_module('bot.file_converters')
+    importlib.import_module('bot.file_managers')
+    for module in case.modules:
+        importlib.import_module(module)
+
+    # Handlers delete their inputs and write temp/ relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    os.chdir(workdir)
+    try:
+        paths = []
+        for i in range(case.inputs):
+            path = os.path.join(workdir, f"input_{i}.{case.fixture}")
+            shutil.copyfile(fixture, path)
+            paths.append(path)
+        input_bytes = sum(os.path.getsize(path) for path in paths)
+
+        update = FakeUpdate(document=make_document(os.path.basename(paths[0]), input_bytes))
+        context = FakeContext()
+
+        rss_start = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            asyncio.run(case.run(update, context, paths, contacts))
+        except OperationFailed:
+            # The handler already replied with the error, which ends up in 'errors'
+            pass
+        wall = time.perf_counter() - start
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    message = update.message
+    return {
+        'case': case_name,
+        'size': size_label,
+        'contacts': contacts,
+        'input_bytes': input_bytes,
+        'wall_s': round(wall, 4),
+        'throughput': round(contacts / wall, 1) if wall else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_start_mb': round(rss_start, 1),
+        'documents': len(message.documents),
+        'output_bytes': sum(doc['size'] for doc in message.documents),
+        'errors': message.errors(),
+    }
+
+def missing_modules(case: Case) -> list:
+    return [module for module in case.modules if importlib.util.find_spec(module) is None]
+
+def spawn_case(case_name: str, size_label: str) -> dict:
+    """Run one case in a fresh interpreter; a case whose dependencies are not installed is skipped"""
+    missing = missing_modules(CASES[case_name])
+    if missing:
+        return {'case': case_name, 'size': size_label, 'skipped': f"{', '.join(missing)} tidak terinstall", 'errors': []}
+
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--child', case_name, size_label],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {'case': case_name, 'size': size_label, 'errors': [result.stderr.strip()[-2000:]]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_suite(case_names: list, size_labels: list, repeat: int) -> list:
+    """Run every case at every size, keeping the fastest of repeat runs"""
+    results = []
+    for size_label in size_labels:
+        for case_name in case_names:
+            runs = [spawn_case(case_name, size_label) for _ in range(repeat)]
+            ok_runs = [run for run in runs if 'wall_s' in run and not run['errors']]
+            best = min(ok_runs, key=lambda run: run['wall_s']) if ok_runs else runs[-1]
+            results.append(best)
+
+            if 'wall_s' in best and not best['errors']:
+                print(f"{case_name:28} {size_label:>5}  {best['wall_s']:9.3f} s  "
+                      f"{best['throughput']:>12,.0f} kontak/s  {best['peak_rss_mb']:8.1f} MB")
+            elif 'skipped' in best:
+                print(f"{case_name:28} {size_label:>5}  SKIPPED: {best['skipped']}")
+            else:
+                print(f"{case_name:28} {size_label:>5}  FAILED: {best['errors'][0].splitlines()[-1][:200]}")
+            sys.stdout.flush()
+    return results
+
+def compare(results: list, baseline: list, tolerance: float = TOLERANCE) -> list:
+    """Compare results to a baseline and return regression messages"""
+    previous = {(run['case'], run['size']): run for run in baseline if 'wall_s' in run}
+    regressions = []
+
+    for run in results:
+        old = previous.get((run['case'], run['size']))
+        if not old or 'wall_s' not in run:
+            continue
+
+        label = f"{run['case']} {run['size']}"
+        if run['wall_s'] > old['wall_s'] * (1 + tolerance) and run['wall_s'] - old['wall_s'] > MIN_WALL_DELTA:
+            regressions.append(f"{label}: {old['wall_s']:.3f} s -> {run['wall_s']:.3f} s")
+        if run['peak_rss_mb'] > old['peak_rss_mb'] * (1 + tolerance) and run['peak_rss_mb'] - old['peak_rss_mb'] > MIN_RSS_DELTA:
+            regressions.append(f"{label}: peak RSS {old['peak_rss_mb']:.1f} MB -> {run['peak_rss_mb']:.1f} MB")
+
+    return regressions
+
+def save_json(path: str, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark converters at 1k/100k/1M contacts")
+    parser.add_argument('--cases', default=','.join(CASES), help="comma separated case names")
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f"comma separated, from {', '.join(SIZES)}")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per case, fastest is kept")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true', help="write results to --baseline")
+    parser.add_argument('--child', nargs=2, metavar=('CASE', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(*args.child), ensure_ascii=False))
+        return
+
+    case_names = [name for name in args.cases.split(',') if name]
+    size_labels = [size for size in args.sizes.split(',') if size]
+    unknown = [name for name in case_names if name not in CASES] + [size for size in size_labels if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown case or size: {', '.join(unknown)}")
+
+    results = run_suite(case_names, size_labels, max(1, args.repeat))
+    save_json(args.output, results)
+    print(f"\nHasil disimpan di {args.output}")
+
+    skipped = [f"{run['case']} {run['size']}" for run in results if 'skipped' in run]
+    failed = [f"{run['case']} {run['size']}" for run in results
+              if 'skipped' not in run and (run.get('errors') or 'wall_s' not in run)]
+
+    if args.save_baseline:
+        save_json(args.baseline, results)
+        print(f"Baseline disimpan di {args.baseline}")
+        regressions = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    else:
+        print("Belum ada baseline, jalankan dengan --save-baseline")
+        regressions = []
+
+    for regression in regressions:
+        print(f"REGRESI: {regression}")
+    for case in skipped:
+        print(f"DILEWATI: {case}")
+    for case in failed:
+        print(f"GAGAL: {case}")
+    sys.exit(1 if regressions or failed else 0)
+
+if __name__ == "__main__":
+    main()
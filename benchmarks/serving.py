@@ -0,0 +1,107 @@
+"""
+Update-to-reply latency of polling vs webhook, against the local fake Bot API
+
+Each mode runs the real Application (main.build_application) on a scratch database
+and times /start from the moment the update is handed to the fake API until the
+bot's sendMessage arrives. Every update comes from a new chat and updates are
+spaced by --interval, so neither the per-chat nor the global rate limit (one and
+30 messages per second) shows up in the numbers.
+
+Usage: python -m benchmarks.serving [--updates 200] [--interval 0.05] [--modes polling,webhook]
+"""
+
+import os
+import sys
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_bot_api import FakeBotAPI
+
+MODES = ('polling', 'webhook')
+
+# Chats of the simulated users, one per update
+FIRST_CHAT_ID = 900_000_000
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def measure(mode: str, updates: int, interval: float) -> list:
+    """Latency in milliseconds of each /start in mode"""
+    import main
+
+    api = FakeBotAPI()
+    await api.start()
+    main.BOT_API_BASE_URL = api.base_url
+    main.BOT_API_BASE_FILE_URL = api.base_file_url
+    application = main.build_application()
+    main.add_handlers(application)
+
+    await application.initialize()
+    await application.start()
+    if mode == 'polling':
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+    else:
+        port = free_port()
+        await application.updater.start_webhook(
+            listen='127.0.0.1', port=port, url_path='telegram',
+            webhook_url=f"http://127.0.0.1:{port}/telegram", secret_token='benchmark',
+        )
+
+    loop = asyncio.get_running_loop()
+    latencies = []
+    try:
+        for i in range(updates):
+            mark = len(api.calls)
+            start = loop.time()
+            await api.push_update(api.message_update(FIRST_CHAT_ID + i, "/start"))
+            await api.wait_for('sendMessage', after=mark)
+            latencies.append((loop.time() - start) * 1000)
+            await asyncio.sleep(interval)
+    finally:
+        await api.release_polls()
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await api.stop()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare polling and webhook latency on the fake Bot API")
+    parser.add_argument('--updates', type=int, default=200, help="updates per mode")
+    parser.add_argument('--interval', type=float, default=0.05, help="seconds between updates")
+    parser.add_argument('--modes', default=','.join(MODES), help="comma separated, from polling,webhook")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(unknown)}")
+
+    # Database, persistence and temp/ are relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='serving_'))
+    from bot.database import init_database
+    init_database()
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    print(f"{'mode':10} {'p50':>9} {'p95':>9} {'mean':>9}")
+    for mode in modes:
+        latencies = asyncio.run(measure(mode, max(1, args.updates), args.interval))
+        print(f"{mode:10} {percentile(latencies, 0.5):7.2f}ms {percentile(latencies, 0.95):7.2f}ms "
+              f"{statistics.mean(latencies):7.2f}ms")
+
+if __name__ == "__main__":
+    main()
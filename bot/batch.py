@@ -0,0 +1,261 @@
+"""
+ZIP batch ingestion: convert every member of an uploaded archive in worker processes
+"""
+
+import io
+import os
+import csv
+import asyncio
+import logging
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bot.scheduler import run_blocking
+from bot.workspace import reset_user_data
+from bot.metrics import stage, add_contacts, OperationFailed
+from bot.progress import report_progress, send_status
+from bot.cancellation import check_cancelled, wait_cancellable
+from utils.helpers import (
+    cleanup_temp_file, send_document_to_user, send_documents_to_user, source_name, format_size,
+    output_path, open_output, CHUNK_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Worker processes shared by all batch jobs; each batch keeps at most this many members in flight
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Limits on what one archive may contain, checked from its directory before anything is decompressed
+MAX_BATCH_MEMBERS = int(os.environ.get('MAX_BATCH_MEMBERS', '500'))
+MAX_BATCH_UNCOMPRESSED = int(os.environ.get('MAX_BATCH_UNCOMPRESSED', str(200 * 1024 * 1024)))
+
+MANIFEST_NAME = "manifest.csv"
+
+# Created on the first batch; spawned rather than forked, the bot process runs threads
+_pool = None
+
+def get_worker_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+def shutdown_worker_pool():
+    """Stop the worker processes, dropping members still queued"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _discard_broken_pool(pool):
+    # A worker died (e.g. out of memory); the next batch starts a fresh pool
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def read_batch_members(archive_path: str, extensions: tuple, max_size: int) -> list:
+    """List an archive's files as manifest rows; rows with status None are to be converted
+
+    Raises ValueError when the archive as a whole is over the batch limits.
+    """
+    rows = []
+    total_size = 0
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            base_name = os.path.basename(info.filename)
+            # Folders and the metadata macOS adds to archives are not files the user meant to send
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or base_name.startswith('.'):
+                continue
+
+            row = {'file': info.filename, 'status': None, 'contacts': 0, 'note': '', 'output': None}
+            if os.path.splitext(base_name)[1].lower() not in extensions:
+                row.update(status='dilewati', note=f"Bukan file {' / '.join(extensions)}")
+            elif info.file_size > max_size:
+                row.update(status='gagal', note=f"Terlalu besar ({format_size(info.file_size)})")
+            else:
+                total_size += info.file_size
+            rows.append(row)
+
+    pending = [row for row in rows if row['status'] is None]
+    if len(pending) > MAX_BATCH_MEMBERS:
+        raise ValueError(f"ZIP berisi {len(pending)} file, maksimal {MAX_BATCH_MEMBERS}")
+    if total_size > MAX_BATCH_UNCOMPRESSED:
+        raise ValueError(
+            f"Isi ZIP {format_size(total_size)} setelah diekstrak, maksimal {format_size(MAX_BATCH_UNCOMPRESSED)}"
+        )
+    return rows
+
+def convert_member(archive_path: str, member_name: str, output_base: str, converter) -> dict:
+    """Worker process entry point: read one member into memory and convert it
+
+    output_base names the in-memory source, so the converter writes its output
+    next to it; errors are returned rather than raised, to end up in the manifest.
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            source = io.BytesIO(archive.read(member_name))
+        source.name = output_base
+        output_file, count = converter(source)
+        return {'status': 'ok', 'contacts': count, 'output': output_file}
+    except UnicodeDecodeError:
+        return {'status': 'gagal', 'note': "Encoding teks tidak terbaca"}
+    except Exception as e:
+        return {'status': 'gagal', 'note': str(e) or type(e).__name__}
+
+async def convert_members(archive_path: str, rows: list, converter, workspace: str):
+    """Convert pending rows in the worker pool, BATCH_WORKERS at a time, updating them in place"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(BATCH_WORKERS)
+    pending = [row for row in rows if row['status'] is None]
+    done = 0
+    contacts = 0
+
+    async def convert(index, row):
+        nonlocal done, contacts
+        # Unique on-disk name per member; members of different folders may share a name
+        output_base = os.path.join(workspace, f"{index:04d}_{os.path.basename(row['file'])}")
+        async with semaphore:
+            check_cancelled()
+            pool = get_worker_pool()
+            try:
+                future = loop.run_in_executor(pool, convert_member, archive_path, row['file'], output_base, converter)
+                row.update(await wait_cancellable(future))
+            except BrokenProcessPool:
+                _discard_broken_pool(pool)
+                row.update(status='gagal', note="Proses konversi berhenti tiba-tiba")
+
+        done += 1
+        contacts += row['contacts']
+        report_progress(done, len(pending), contacts)
+
+    tasks = [asyncio.ensure_future(convert(index, row)) for index, row in enumerate(pending, 1)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Cancelled: members not yet handed to a worker never start
+        for task in tasks:
+            task.cancel()
+        raise
+
+def write_manifest(manifest_path: str, rows: list):
+    with open(manifest_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'status', 'kontak', 'keterangan'])
+        for row in rows:
+            writer.writerow([row['file'], row['status'], row['contacts'], row['note']])
+
+def write_batch_archive(archive_path: str, rows: list, manifest_path: str):
+    """Zip the converted outputs under their member's folder and name, plus the manifest"""
+    used = set()
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        for index, row in enumerate(rows, 1):
+            if row['status'] != 'ok':
+                continue
+            # Converted name: member folder + member stem + the converter's suffix ("_auto.vcf")
+            folder = os.path.dirname(row['file'])
+            base_name = os.path.basename(row['output']).split('_', 1)[1]
+            arcname = f"{folder}/{base_name}" if folder else base_name
+            if arcname in used:
+                stem, ext = os.path.splitext(arcname)
+                arcname = f"{stem}_{index}{ext}"
+            used.add(arcname)
+            archive.write(row['output'], arcname=arcname)
+        archive.write(manifest_path, arcname=MANIFEST_NAME)
+
+def write_batch_merged(output_file: str, rows: list) -> str:
+    """Concatenate the converted outputs in archive order into one file, compressed per /kompres"""
+    output_file = output_path(output_file)
+    ends_with_newline = True
+    with open_output(output_file, 'wb') as dst:
+        for row in rows:
+            if row['status'] != 'ok':
+                continue
+            check_cancelled()
+            if not ends_with_newline:
+                dst.write(b"\n")
+            with open(row['output'], 'rb') as src:
+                chunk = b""
+                while True:
+                    data = src.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    dst.write(data)
+                    chunk = data
+            ends_with_newline = not chunk or chunk.endswith(b"\n")
+    return output_file
+
+async def process_zip_batch(update, context, archive_path: str, operation):
+    """Convert each file in an uploaded ZIP with the operation's batch converter
+
+    The result is one archive of outputs, or with batch_merge one merged file,
+    and a manifest with the contacts or error of every member. Returns 'partial'
+    when some members failed, so the result is not cached and a re-upload
+    retries them; raises OperationFailed when none converted.
+    """
+    try:
+        await send_status(update, f"🔄 Memproses file dalam ZIP ({operation.name})...")
+        workspace = os.path.dirname(archive_path)
+
+        try:
+            rows = await run_blocking(read_batch_members, archive_path, operation.extensions, operation.max_size)
+        except zipfile.BadZipFile:
+            await update.message.reply_text("❌ File ZIP rusak atau tidak valid.")
+            return
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {str(e)}")
+            return
+
+        if not any(row['status'] is None for row in rows):
+            await update.message.reply_text(
+                f"❌ Tidak ada file {' / '.join(operation.extensions)} di dalam ZIP."
+            )
+            return
+
+        with stage('transform'):
+            await convert_members(archive_path, rows, operation.batch, workspace)
+
+        converted = [row for row in rows if row['status'] == 'ok']
+        failed = [row for row in rows if row['status'] == 'gagal']
+        total_contacts = sum(row['contacts'] for row in converted)
+        add_contacts(total_contacts)
+
+        stem = os.path.splitext(source_name(archive_path))[0]
+        manifest_path = os.path.join(workspace, f"{stem}_{MANIFEST_NAME}")
+        await run_blocking(write_manifest, manifest_path, rows)
+
+        summary = (
+            f"📦 {len(converted)}/{len(converted) + len(failed)} file dikonversi, {total_contacts} kontak"
+            + (f"\n⚠️ {len(failed)} file gagal, lihat manifest" if failed else "")
+        )
+
+        if not converted:
+            await send_document_to_user(update, manifest_path, f"❌ Tidak ada file yang berhasil dikonversi.\n{summary}")
+        elif context.user_data.get('batch_merge'):
+            ext = os.path.splitext(converted[0]['output'])[1]
+            merged_file = os.path.join(workspace, f"{stem}{ext}")
+            merged_file = await run_blocking(write_batch_merged, merged_file, rows)
+            caption = f"✅ Konversi ZIP berhasil, digabung menjadi satu file!\n{summary}"
+            await send_documents_to_user(
+                update, [(merged_file, caption), (manifest_path, caption)], lambda first, last: caption
+            )
+        else:
+            result_archive = os.path.join(workspace, f"{stem}_hasil.zip")
+            await run_blocking(write_batch_archive, result_archive, rows, manifest_path)
+            await send_document_to_user(update, result_archive, f"✅ Konversi ZIP berhasil!\n{summary}")
+
+        # Cleanup
+        await cleanup_temp_file(archive_path)
+        reset_user_data(context)
+
+        if not converted:
+            raise OperationFailed("Tidak ada file yang berhasil dikonversi")
+        return 'partial' if failed else None
+
+    except OperationFailed:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing ZIP batch: {e}")
+        await update.message.reply_text(f"❌ Error memproses ZIP: {str(e)}")
+        raise OperationFailed(str(e)) from e
@@ -0,0 +1,105 @@
+"""
+Cooperative cancellation of running jobs, requested with /batal
+"""
+
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# How often a job waiting on run_blocking notices a cancellation
+CANCEL_POLL_INTERVAL = 0.5
+
+class OperationCancelled(BaseException):
+    """Raised at a checkpoint of a cancelled job
+
+    Like asyncio.CancelledError it is not an Exception, so the converters'
+    error handlers do not report it as a failure; finally blocks still clean up.
+    """
+
+# Cancel token of the job running in this task, seen by its run_blocking threads
+_token = contextvars.ContextVar('cancel_token', default=None)
+
+# user_id -> tokens of the user's scheduled and running jobs
+_tokens = {}
+
+# cancel token -> run_blocking futures its job stopped waiting for, still running in a thread or process
+_abandoned = {}
+
+@contextmanager
+def cancellable(user_id: int):
+    """Give the jobs run within the block a cancel token that /batal can set"""
+    token = threading.Event()
+    _tokens.setdefault(user_id, set()).add(token)
+    context_token = _token.set(token)
+    try:
+        yield token
+    finally:
+        _token.reset(context_token)
+        _abandoned.pop(token, None)
+        _tokens[user_id].discard(token)
+        if not _tokens[user_id]:
+            del _tokens[user_id]
+
+def cancel_user_jobs(user_id: int) -> int:
+    """Cancel all queued and running jobs of a user; returns how many were cancelled"""
+    tokens = [token for token in _tokens.get(user_id, ()) if not token.is_set()]
+    for token in tokens:
+        token.set()
+    if tokens:
+        logger.info(f"Cancelled {len(tokens)} jobs of user {user_id}")
+    return len(tokens)
+
+def is_cancelled() -> bool:
+    token = _token.get()
+    return token is not None and token.is_set()
+
+def check_cancelled():
+    """Checkpoint for parsers, writers and upload loops; raises OperationCancelled once cancelled"""
+    if is_cancelled():
+        raise OperationCancelled()
+
+def _discard_result(future):
+    # Retrieve the abandoned result so asyncio does not log it as never retrieved
+    if not future.cancelled():
+        future.exception()
+
+async def wait_cancellable(future):
+    """Await a run_blocking future, giving up as soon as the job is cancelled
+
+    The job unwinds within CANCEL_POLL_INTERVAL, but Python cannot interrupt
+    the worker: it stops at its next checkpoint (every PROGRESS_EVERY lines or
+    cards), or only when done for work without checkpoints such as
+    pd.read_excel or a single huge vCard. Its result is discarded, and the
+    future is kept for wait_abandoned so the job's slot is held until then.
+    """
+    token = _token.get()
+    if token is None:
+        return await future
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=CANCEL_POLL_INTERVAL)
+            if done:
+                return future.result()
+            if token.is_set():
+                raise OperationCancelled()
+    except BaseException:
+        # Cancelled, or a sibling task failed (e.g. ZIP members): the worker keeps running
+        if not future.done():
+            future.add_done_callback(_discard_result)
+            _abandoned.setdefault(token, set()).add(future)
+        raise
+
+async def wait_abandoned():
+    """Wait for the workers the current job stopped waiting for
+
+    Called before a job gives back its scheduler slot, so a cancelled job's
+    threads and processes do not run alongside the jobs admitted after it.
+    """
+    futures = _abandoned.pop(_token.get(), None)
+    if futures:
+        await asyncio.wait(futures)
@@ -3,60 +3,125 @@ Contact manipulation utilities for VCF files
 """
 
 import os
-import vobject
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.helpers import cleanup_temp_file, send_document_to_user
+from utils.helpers import cleanup_temp_file, send_document_to_user, open_text_source, source_size
+from bot.scheduler import run_blocking
+from bot.workspace import reset_user_data
+from bot.metrics import add_contacts, OperationFailed
 
 logger = logging.getLogger(__name__)
 
+def split_vcards(content: str) -> list:
+    """Split VCF text into individual vCard blocks"""
+    vcards = []
+    current_vcard = []
+    
+    for line in content.split('\n'):
+        if line.strip() == 'BEGIN:VCARD':
+            if current_vcard:
+                vcards.append('\n'.join(current_vcard))
+            current_vcard = [line]
+        else:
+            current_vcard.append(line)
+    
+    if current_vcard:
+        vcards.append('\n'.join(current_vcard))
+    
+    return vcards
+
+def read_vcards(file_path: str) -> list:
+    """Read VCF file and split it into vCard blocks"""
+    with open_text_source(file_path) as f:
+        return split_vcards(f.read())
+
+def count_vcards(vcards: list) -> int:
+    """Count blocks that actually start with BEGIN:VCARD"""
+    return sum(1 for vcard in vcards if vcard.strip().startswith('BEGIN:VCARD'))
+
+def vcard_display_info(vcard_text: str) -> dict:
+    """Get FN and TEL of a vCard block for display"""
+    name = "Unknown"
+    phone = "Unknown"
+
+    for line in vcard_text.split('\n'):
+        if line.startswith('FN:'):
+            name = line[3:].strip()
+        elif line.startswith('TEL:'):
+            phone = line[4:].strip()
+
+    return {'name': name, 'phone': phone}
+
+def analyze_vcf_file(source) -> dict:
+    """Count contacts in a VCF path or buffer, with vobject details when it parses"""
+    # Read VCF file
+    with open_text_source(source) as f:
+        content = f.read()
+    
+    # Count BEGIN:VCARD occurrences
+    result = {'vcard_count': content.count('BEGIN:VCARD'), 'parsed': False}
+    
+    # Try to parse with vobject for detailed analysis (imported on first use)
+    try:
+        import vobject
+        vcf_objects = list(vobject.readComponents(content))
+        
+        # Analyze contact details
+        contacts_with_phone = 0
+        contacts_with_name = 0
+        
+        for vcard in vcf_objects:
+            if hasattr(vcard, 'tel'):
+                contacts_with_phone += 1
+            if hasattr(vcard, 'fn') or hasattr(vcard, 'n'):
+                contacts_with_name += 1
+        
+        result.update({
+            'parsed': True,
+            'detailed_count': len(vcf_objects),
+            'contacts_with_phone': contacts_with_phone,
+            'contacts_with_name': contacts_with_name,
+        })
+        
+    except Exception as parse_error:
+        logger.warning(f"VCF parsing error, using simple count: {parse_error}")
+    
+    return result
+
+def write_vcf_content(file_path: str, content: str):
+    """Write VCF text to file"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
 async def count_contacts_in_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Count total contacts in VCF file"""
     try:
         await update.message.reply_text("🔢 Menghitung total kontak dalam file VCF...")
         
-        # Read VCF file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        analysis = await run_blocking(analyze_vcf_file, file_path)
         
-        # Count BEGIN:VCARD occurrences
-        vcard_count = content.count('BEGIN:VCARD')
+        add_contacts(analysis['detailed_count'] if analysis['parsed'] else analysis['vcard_count'])
         
-        # Try to parse with vobject for detailed analysis
-        try:
-            vcf_objects = list(vobject.readComponents(content))
-            detailed_count = len(vcf_objects)
-            
-            # Analyze contact details
-            contacts_with_phone = 0
-            contacts_with_name = 0
-            
-            for vcard in vcf_objects:
-                if hasattr(vcard, 'tel'):
-                    contacts_with_phone += 1
-                if hasattr(vcard, 'fn') or hasattr(vcard, 'n'):
-                    contacts_with_name += 1
-            
+        if analysis['parsed']:
             result_message = f"""
 🔢📇 **Hasil Perhitungan Kontak VCF**
 
-📊 **Total Kontak:** {detailed_count}
-📞 **Kontak dengan Nomor:** {contacts_with_phone}
-👤 **Kontak dengan Nama:** {contacts_with_name}
-📄 **Ukuran File:** {os.path.getsize(file_path)} bytes
+📊 **Total Kontak:** {analysis['detailed_count']}
+📞 **Kontak dengan Nomor:** {analysis['contacts_with_phone']}
+👤 **Kontak dengan Nama:** {analysis['contacts_with_name']}
+📄 **Ukuran File:** {source_size(file_path)} bytes
 
 ✅ **Status:** Analisis berhasil
 📝 **Catatan:** File VCF valid dan dapat diproses
             """
             
-        except Exception as parse_error:
-            logger.warning(f"VCF parsing error, using simple count: {parse_error}")
+        else:
             result_message = f"""
 🔢📇 **Hasil Perhitungan Kontak VCF**
 
-📊 **Total Kontak:** {vcard_count} (estimasi)
-📄 **Ukuran File:** {os.path.getsize(file_path)} bytes
+📊 **Total Kontak:** {analysis['vcard_count']} (estimasi)
+📄 **Ukuran File:** {source_size(file_path)} bytes
 
 ⚠️ **Catatan:** Menggunakan perhitungan sederhana
 📝 **Saran:** File mungkin memiliki format yang tidak standar
@@ -66,11 +131,18 @@ async def count_contacts_in_vcf(update: Update, context: ContextTypes.DEFAULT_TY
         
         # Cleanup
         await cleanup_temp_file(file_path)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error counting contacts: {e}")
         await update.message.reply_text(f"❌ Error menghitung kontak: {str(e)}")
+        raise OperationFailed(str(e)) from e
+
+async def receive_vcf_for_new_contact(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
+    """Keep the uploaded VCF and ask for the contact to add"""
+    context.user_data['vcf_file'] = file_path
+    context.user_data['waiting_for'] = 'new_contact_data'
+    await update.message.reply_text("📇 File VCF diterima. Sekarang kirim data kontak baru dengan format: Nama|Nomor")
 
 async def add_contact_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, contact_data: str):
     """Add new contact to existing VCF file"""
@@ -96,7 +168,7 @@ async def add_contact_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE,
         await update.message.reply_text("➕ Menambahkan kontak ke file VCF...")
         
         # Read existing VCF content
-        with open(vcf_file, 'r', encoding='utf-8') as f:
+        with open_text_source(vcf_file) as f:
             existing_content = f.read()
         
         # Create new vCard
@@ -130,49 +202,21 @@ END:VCARD"""
         # Cleanup
         await cleanup_temp_file(vcf_file)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error adding contact: {e}")
         await update.message.reply_text(f"❌ Error menambah kontak: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def delete_contact_from_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Delete contact from VCF file"""
     try:
         await update.message.reply_text("🔍 Menganalisis kontak dalam file VCF...")
         
-        # Read VCF file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
         # Parse contacts
-        contacts = []
-        vcards = []
-        current_vcard = []
-        
-        for line in content.split('\n'):
-            if line.strip() == 'BEGIN:VCARD':
-                if current_vcard:
-                    vcards.append('\n'.join(current_vcard))
-                current_vcard = [line]
-            else:
-                current_vcard.append(line)
-        
-        if current_vcard:
-            vcards.append('\n'.join(current_vcard))
-        
-        # Extract contact info for display
-        for i, vcard_text in enumerate(vcards):
-            name = "Unknown"
-            phone = "Unknown"
-            
-            for line in vcard_text.split('\n'):
-                if line.startswith('FN:'):
-                    name = line[3:].strip()
-                elif line.startswith('TEL:'):
-                    phone = line[4:].strip()
-            
-            contacts.append({'index': i, 'name': name, 'phone': phone, 'vcard': vcard_text})
+        vcards = await run_blocking(read_vcards, file_path)
+        contacts = [{'index': i, **vcard_display_info(vcard_text)} for i, vcard_text in enumerate(vcards)]
         
         if not contacts:
             await update.message.reply_text("❌ Tidak ada kontak ditemukan dalam file VCF.")
@@ -193,34 +237,37 @@ async def delete_contact_from_vcf(update: Update, context: ContextTypes.DEFAULT_
             "Kirim nomor urut kontak yang ingin dihapus (1, 2, 3, dst)"
         )
         
-        context.user_data['vcf_contacts'] = contacts
+        # Only the count is kept; the cards are re-read from the file on selection
+        context.user_data['vcf_contact_count'] = len(contacts)
         context.user_data['vcf_file'] = file_path
         context.user_data['waiting_for'] = 'delete_contact_index'
         
     except Exception as e:
         logger.error(f"Error analyzing VCF for deletion: {e}")
         await update.message.reply_text(f"❌ Error menganalisis file: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_delete_contact(update: Update, context: ContextTypes.DEFAULT_TYPE, index_text: str):
     """Process contact deletion by index"""
     try:
         index = int(index_text.strip()) - 1  # Convert to 0-based index
-        contacts = context.user_data.get('vcf_contacts')
+        contact_count = context.user_data.get('vcf_contact_count')
         file_path = context.user_data.get('vcf_file')
         
-        if not contacts or not file_path:
+        if not contact_count or not file_path or not os.path.exists(file_path):
             await update.message.reply_text("❌ Data kontak tidak ditemukan. Silakan upload ulang.")
             return
         
-        if index < 0 or index >= len(contacts):
-            await update.message.reply_text(f"❌ Nomor urut tidak valid. Pilih antara 1-{len(contacts)}")
+        vcards = await run_blocking(read_vcards, file_path)
+        if index < 0 or index >= len(vcards):
+            await update.message.reply_text(f"❌ Nomor urut tidak valid. Pilih antara 1-{len(vcards)}")
             return
         
-        contact_to_delete = contacts[index]
+        contact_to_delete = vcard_display_info(vcards[index])
         await update.message.reply_text(f"🗑️ Menghapus kontak: {contact_to_delete['name']}")
         
         # Remove the selected contact
-        remaining_vcards = [c['vcard'] for i, c in enumerate(contacts) if i != index]
+        remaining_vcards = vcards[:index] + vcards[index + 1:]
         
         if not remaining_vcards:
             await update.message.reply_text("❌ Tidak dapat menghapus semua kontak. File akan kosong.")
@@ -231,8 +278,7 @@ async def process_delete_contact(update: Update, context: ContextTypes.DEFAULT_T
         
         # Save updated file
         output_file = file_path.replace('.vcf', '_deleted.vcf')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        await run_blocking(write_vcf_content, output_file, updated_content)
         
         # Send updated file
         await send_document_to_user(update, output_file, 
@@ -243,13 +289,14 @@ async def process_delete_contact(update: Update, context: ContextTypes.DEFAULT_T
         # Cleanup
         await cleanup_temp_file(file_path)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except ValueError:
         await update.message.reply_text("❌ Masukkan nomor urut yang valid.")
     except Exception as e:
         logger.error(f"Error deleting contact: {e}")
         await update.message.reply_text(f"❌ Error menghapus kontak: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_rename_contact(update: Update, context: ContextTypes.DEFAULT_TYPE, rename_data: str):
     """Process contact renaming in VCF"""
@@ -275,7 +322,7 @@ async def process_rename_contact(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text(f"✏️ Mengganti nama '{old_name}' menjadi '{new_name}'...")
         
         # Read VCF file
-        with open(vcf_file, 'r', encoding='utf-8') as f:
+        with open_text_source(vcf_file) as f:
             content = f.read()
         
         # Replace contact name
@@ -304,8 +351,9 @@ async def process_rename_contact(update: Update, context: ContextTypes.DEFAULT_T
         # Cleanup
         await cleanup_temp_file(vcf_file)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error renaming contact: {e}")
         await update.message.reply_text(f"❌ Error mengubah nama kontak: {str(e)}")
+        raise OperationFailed(str(e)) from e
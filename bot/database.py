@@ -10,6 +10,16 @@ logger = logging.getLogger(__name__)
 
 DB_PATH = 'bot_database.db'
 
+# Per-operation trace recorded in file_operations: total and per-stage milliseconds, bytes, contacts
+TRACE_STAGES = ('download', 'parse', 'transform', 'write', 'upload')
+SPAN_COLUMNS = [
+    ('duration_ms', 'INTEGER'),
+    *[(f"{stage}_ms", 'INTEGER') for stage in TRACE_STAGES],
+    ('bytes_in', 'INTEGER'),
+    ('bytes_out', 'INTEGER'),
+    ('contacts', 'INTEGER'),
+]
+
 def get_db_connection():
     """Get database connection"""
     return sqlite3.connect(DB_PATH)
@@ -55,6 +65,86 @@ def init_database():
             )
         ''')
         
+        # Span columns added after file_operations was first created
+        cursor.execute("PRAGMA table_info(file_operations)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in SPAN_COLUMNS:
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE file_operations ADD COLUMN {column} {column_type}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_operations_date ON file_operations (operation_date)")
+        
+        # Rollup tables kept in sync by log_file_operation so stats never scan the raw log
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_operation_stats (
+                user_id INTEGER NOT NULL,
+                operation_type TEXT NOT NULL,
+                stat_date TEXT NOT NULL,
+                total_count INTEGER NOT NULL DEFAULT 0,
+                error_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, operation_type, stat_date)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS operation_stats (
+                operation_type TEXT NOT NULL,
+                stat_date TEXT NOT NULL,
+                total_count INTEGER NOT NULL DEFAULT 0,
+                error_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (operation_type, stat_date)
+            )
+        ''')
+        
+        # Telegram file_ids of conversion results, for re-sending without recomputing
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS result_cache (
+                cache_key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                created_date TEXT,
+                last_used REAL NOT NULL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_last_used ON result_cache (last_used)")
+        
+        # Conversation state per user and key, JSON encoded; written only for changed keys
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_state (
+                user_id INTEGER NOT NULL,
+                state_key TEXT NOT NULL,
+                state_value TEXT NOT NULL,
+                updated_date TEXT,
+                PRIMARY KEY (user_id, state_key)
+            )
+        ''')
+        
+        # Per-user settings chosen with commands, e.g. output compression from /kompres
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_preferences (
+                user_id INTEGER NOT NULL,
+                pref_key TEXT NOT NULL,
+                pref_value TEXT NOT NULL,
+                updated_date TEXT,
+                PRIMARY KEY (user_id, pref_key)
+            )
+        ''')
+        
+        # Backfill rollups once from operations logged before they existed
+        cursor.execute("SELECT COUNT(*) FROM operation_stats")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('''
+                INSERT INTO user_operation_stats (user_id, operation_type, stat_date, total_count, error_count)
+                SELECT user_id, operation_type, date(operation_date), COUNT(*),
+                       SUM(CASE WHEN status = 'error' THEN 1 ELSE 0 END)
+                FROM file_operations
+                GROUP BY user_id, operation_type, date(operation_date)
+            ''')
+            cursor.execute('''
+                INSERT INTO operation_stats (operation_type, stat_date, total_count, error_count)
+                SELECT operation_type, stat_date, SUM(total_count), SUM(error_count)
+                FROM user_operation_stats
+                GROUP BY operation_type, stat_date
+            ''')
+        
         conn.commit()
         conn.close()
         
@@ -63,16 +153,49 @@ def init_database():
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
 
-def log_file_operation(user_id: int, operation_type: str, file_name: str, status: str):
-    """Log file operation to database"""
+def span_values(span: dict) -> tuple:
+    """Column values for a track_operation span, in SPAN_COLUMNS order"""
+    if not span:
+        return (None,) * len(SPAN_COLUMNS)
+    
+    stages = span.get('stages', {})
+    return (
+        round(span.get('duration', 0) * 1000),
+        *[round(stages[stage] * 1000) if stage in stages else None for stage in TRACE_STAGES],
+        span.get('bytes_in', 0),
+        span.get('bytes_out', 0),
+        span.get('contacts', 0),
+    )
+
+def log_file_operation(user_id: int, operation_type: str, file_name: str, status: str, span: dict = None):
+    """Log file operation to database, with its timings and sizes when a span is given"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
+        span_columns = ', '.join(column for column, _ in SPAN_COLUMNS)
+        placeholders = ', '.join('?' for _ in SPAN_COLUMNS)
+        cursor.execute(f'''
+            INSERT INTO file_operations (user_id, operation_type, file_name, operation_date, status, {span_columns})
+            VALUES (?, ?, ?, datetime('now'), ?, {placeholders})
+        ''', (user_id, operation_type, file_name, status, *span_values(span)))
+        
+        # Keep the daily rollups in the same transaction as the raw log
+        is_error = 1 if status == 'error' else 0
         cursor.execute('''
-            INSERT INTO file_operations (user_id, operation_type, file_name, operation_date, status)
-            VALUES (?, ?, ?, datetime('now'), ?)
-        ''', (user_id, operation_type, file_name, status))
+            INSERT INTO user_operation_stats (user_id, operation_type, stat_date, total_count, error_count)
+            VALUES (?, ?, date('now'), 1, ?)
+            ON CONFLICT (user_id, operation_type, stat_date) DO UPDATE SET
+                total_count = total_count + 1,
+                error_count = error_count + excluded.error_count
+        ''', (user_id, operation_type, is_error))
+        cursor.execute('''
+            INSERT INTO operation_stats (operation_type, stat_date, total_count, error_count)
+            VALUES (?, date('now'), 1, ?)
+            ON CONFLICT (operation_type, stat_date) DO UPDATE SET
+                total_count = total_count + 1,
+                error_count = error_count + excluded.error_count
+        ''', (operation_type, is_error))
         
         conn.commit()
         conn.close()
@@ -80,6 +203,98 @@ def log_file_operation(user_id: int, operation_type: str, file_name: str, status
     except Exception as e:
         logger.error(f"Error logging file operation: {e}")
 
+def load_conversation_state():
+    """Load all persisted conversation state as (user_id, key, json_value) rows"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, state_key, state_value FROM conversation_state")
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return rows
+        
+    except Exception as e:
+        logger.error(f"Error loading conversation state: {e}")
+        return []
+
+def save_conversation_state(changes: list):
+    """Apply (user_id, key, json_value) changes in one transaction; json_value None deletes the key"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO conversation_state (user_id, state_key, state_value, updated_date)
+            VALUES (?, ?, ?, datetime('now'))
+            ON CONFLICT (user_id, state_key) DO UPDATE SET
+                state_value = excluded.state_value,
+                updated_date = excluded.updated_date
+        ''', [change for change in changes if change[2] is not None])
+        
+        cursor.executemany(
+            "DELETE FROM conversation_state WHERE user_id = ? AND state_key = ?",
+            [(user_id, key) for user_id, key, value in changes if value is None]
+        )
+        
+        conn.commit()
+        conn.close()
+        
+    except Exception as e:
+        logger.error(f"Error saving conversation state: {e}")
+
+def delete_conversation_state(user_id: int):
+    """Delete all persisted conversation state of a user"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM conversation_state WHERE user_id = ?", (user_id,))
+        conn.commit()
+        conn.close()
+        
+    except Exception as e:
+        logger.error(f"Error deleting conversation state: {e}")
+
+def get_user_preference(user_id: int, key: str, default: str = None) -> str:
+    """Get a user's setting, or default when never set"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT pref_value FROM user_preferences WHERE user_id = ? AND pref_key = ?", (user_id, key)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else default
+        
+    except Exception as e:
+        logger.error(f"Error getting user preference: {e}")
+        return default
+
+def set_user_preference(user_id: int, key: str, value: str = None):
+    """Store a user's setting; None removes it"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        if value is None:
+            cursor.execute("DELETE FROM user_preferences WHERE user_id = ? AND pref_key = ?", (user_id, key))
+        else:
+            cursor.execute('''
+                INSERT INTO user_preferences (user_id, pref_key, pref_value, updated_date)
+                VALUES (?, ?, ?, datetime('now'))
+                ON CONFLICT (user_id, pref_key) DO UPDATE SET
+                    pref_value = excluded.pref_value,
+                    updated_date = excluded.updated_date
+            ''', (user_id, key, value))
+        
+        conn.commit()
+        conn.close()
+        
+    except Exception as e:
+        logger.error(f"Error setting user preference: {e}")
+
 def log_bug_report(user_id: int, username: str, bug_description: str):
     """Log bug report to database"""
     try:
@@ -99,19 +314,52 @@ def log_bug_report(user_id: int, username: str, bug_description: str):
     except Exception as e:
         logger.error(f"Error logging bug report: {e}")
 
-def get_user_stats(user_id: int):
-    """Get user statistics"""
+def get_user_stats(user_id: int, days: int = None):
+    """Get user statistics as (operation_type, total, errors) rows from the daily rollup"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        # Read at most days x operations rollup rows for this user
+        if days:
+            cursor.execute('''
+                SELECT operation_type, SUM(total_count), SUM(error_count)
+                FROM user_operation_stats
+                WHERE user_id = ? AND stat_date >= date('now', '-' || ? || ' days')
+                GROUP BY operation_type
+                ORDER BY SUM(total_count) DESC
+            ''', (user_id, days))
+        else:
+            cursor.execute('''
+                SELECT operation_type, SUM(total_count), SUM(error_count)
+                FROM user_operation_stats
+                WHERE user_id = ?
+                GROUP BY operation_type
+                ORDER BY SUM(total_count) DESC
+            ''', (user_id,))
+        
+        operations = cursor.fetchall()
+        conn.close()
+        
+        return operations
+        
+    except Exception as e:
+        logger.error(f"Error getting user stats: {e}")
+        return []
+
+def get_global_stats(days: int = 30):
+    """Get owner-wide (operation_type, total, errors) rows for the last N days"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get operation count
         cursor.execute('''
-            SELECT operation_type, COUNT(*) 
-            FROM file_operations 
-            WHERE user_id = ? 
+            SELECT operation_type, SUM(total_count), SUM(error_count)
+            FROM operation_stats
+            WHERE stat_date >= date('now', '-' || ? || ' days')
             GROUP BY operation_type
-        ''', (user_id,))
+            ORDER BY SUM(total_count) DESC
+        ''', (days,))
         
         operations = cursor.fetchall()
         conn.close()
@@ -119,7 +367,78 @@ def get_user_stats(user_id: int):
         return operations
         
     except Exception as e:
-        logger.error(f"Error getting user stats: {e}")
+        logger.error(f"Error getting global stats: {e}")
+        return []
+
+def get_daily_totals(days: int = 7):
+    """Get owner-wide (stat_date, total, errors) rows for the last N days"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT stat_date, SUM(total_count), SUM(error_count)
+            FROM operation_stats
+            WHERE stat_date >= date('now', '-' || ? || ' days')
+            GROUP BY stat_date
+            ORDER BY stat_date DESC
+        ''', (days,))
+        
+        totals = cursor.fetchall()
+        conn.close()
+        
+        return totals
+        
+    except Exception as e:
+        logger.error(f"Error getting daily totals: {e}")
+        return []
+
+def get_slowest_operations(days: int = 7, limit: int = 5):
+    """Get the slowest traced operations of the last N days as
+    (operation_type, file_name, user_id, duration_ms, bytes_in, contacts, operation_date) rows"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT operation_type, file_name, user_id, duration_ms, bytes_in, contacts, operation_date
+            FROM file_operations
+            WHERE operation_date >= datetime('now', '-' || ? || ' days') AND duration_ms IS NOT NULL
+            ORDER BY duration_ms DESC
+            LIMIT ?
+        ''', (days, limit))
+        
+        operations = cursor.fetchall()
+        conn.close()
+        
+        return operations
+        
+    except Exception as e:
+        logger.error(f"Error getting slowest operations: {e}")
+        return []
+
+def get_throughput_trend(days: int = 7):
+    """Get owner-wide (date, operations, avg_ms, bytes_in, contacts, contacts_per_second) rows for traced operations"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT date(operation_date), COUNT(*), AVG(duration_ms), SUM(bytes_in), SUM(contacts),
+                   SUM(contacts) * 1000.0 / NULLIF(SUM(CASE WHEN contacts > 0 THEN duration_ms END), 0)
+            FROM file_operations
+            WHERE operation_date >= datetime('now', '-' || ? || ' days') AND duration_ms IS NOT NULL
+            GROUP BY date(operation_date)
+            ORDER BY date(operation_date) DESC
+        ''', (days,))
+        
+        trend = cursor.fetchall()
+        conn.close()
+        
+        return trend
+        
+    except Exception as e:
+        logger.error(f"Error getting throughput trend: {e}")
         return []
 
 def cleanup_old_records(days: int = 30):
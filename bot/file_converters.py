@@ -3,29 +3,67 @@ File converters untuk berbagai format file
 """
 
 import os
+import re
 import csv
-import pandas as pd
-import vobject
+import mmap
+import time
+import codecs
+import hashlib
 import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.helpers import cleanup_temp_file, send_document_to_user
+from utils.helpers import (
+    cleanup_temp_file, send_document_to_user, open_text_source, source_path, source_size, source_name,
+    output_path, open_output, sniff_encoding, format_size, SNIFF_SIZE
+)
+from bot.scheduler import run_blocking
+from bot.workspace import reset_user_data
+from bot.metrics import add_contacts, OperationFailed
+from bot.progress import report_progress, send_status, PROGRESS_EVERY
+from bot.cancellation import check_cancelled
 
 logger = logging.getLogger(__name__)
 
-async def convert_txt_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
-    """Convert TXT file to VCF format"""
-    try:
-        await update.message.reply_text("🔄 Memproses konversi TXT ke VCF...")
-        
-        contacts = []
-        
-        # Read TXT file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Parse contacts from different formats
-        for line in lines:
+# Blocking parse/write helpers, run off the event loop via run_blocking
+# pandas and vobject are imported on first use; they dominate cold start
+
+def write_vcf_file(file_path: str, contacts: list, phone_prefix: str = "", note: str = None) -> str:
+    """Write a list of {'name', 'phone'} dicts as vCards, compressed per /kompres; returns the path written"""
+    file_path = output_path(file_path)
+    with open_output(file_path) as f:
+        for index, contact in enumerate(contacts, 1):
+            if index % PROGRESS_EVERY == 0:
+                check_cancelled()
+            f.write("BEGIN:VCARD\n")
+            f.write("VERSION:3.0\n")
+            f.write(f"FN:{contact['name']}\n")
+            f.write(f"TEL:{phone_prefix}{contact['phone']}\n")
+            if note:
+                f.write(f"NOTE:{note}\n")
+            f.write("END:VCARD\n\n")
+    return file_path
+
+def write_text_file(file_path: str, content: str) -> str:
+    """Write text content to file, compressed per /kompres; returns the path written"""
+    file_path = output_path(file_path)
+    with open_output(file_path) as f:
+        f.write(content)
+    return file_path
+
+def parse_txt_contacts(source) -> list:
+    """Parse Nama<sep>Nomor lines from a path or buffer using the first separator found on each line"""
+    contacts = []
+    total_bytes = source_size(source)
+    
+    # Read TXT file line by line, reporting the byte offset for progress
+    with open_text_source(source) as f:
+        for line_number, line in enumerate(f, 1):
+            if line_number % PROGRESS_EVERY == 0:
+                report_progress(f.buffer.tell(), total_bytes, len(contacts))
+                check_cancelled()
+            
             line = line.strip()
             if not line:
                 continue
@@ -44,24 +82,344 @@ async def convert_txt_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE,
             
             if name and phone:
                 contacts.append({'name': name, 'phone': phone})
+    
+    report_progress(total_bytes, total_bytes, len(contacts))
+    return contacts
+
+def parse_vcf_contacts(source) -> list:
+    """Parse VCF path or buffer into Nama|Nomor lines"""
+    import vobject
+    
+    contacts = []
+    
+    # Read VCF file
+    with open_text_source(source) as f:
+        vcf_content = f.read()
+    
+    # Parse VCF content; vobject needs the whole text, so progress counts vCards
+    total_vcards = vcf_content.count('BEGIN:VCARD')
+    vcf_objects = vobject.readComponents(vcf_content)
+    
+    for vcard_number, vcard in enumerate(vcf_objects, 1):
+        if vcard_number % PROGRESS_EVERY == 0:
+            report_progress(vcard_number, total_vcards, len(contacts))
+            check_cancelled()
+        
+        name = ""
+        phone = ""
+        
+        if hasattr(vcard, 'fn'):
+            name = vcard.fn.value
+        elif hasattr(vcard, 'n'):
+            name = vcard.n.value.formatted_name
+        
+        if hasattr(vcard, 'tel'):
+            if isinstance(vcard.tel, list):
+                phone = vcard.tel[0].value
+            else:
+                phone = vcard.tel.value
+        
+        if name and phone:
+            contacts.append(f"{name}|{phone}")
+    
+    report_progress(total_vcards, total_vcards, len(contacts))
+    return contacts
+
+def parse_xlsx_contacts(source):
+    """Parse Excel path or buffer, returning (contacts, name_col, phone_col); contacts is None without 2 columns"""
+    import pandas as pd
+    
+    # Read Excel file
+    if not isinstance(source, str):
+        source.seek(0)
+    df = pd.read_excel(source)
+    # read_excel itself cannot be interrupted; stop here rather than after the rows
+    check_cancelled()
+    
+    # Try to find name and phone columns
+    name_col = None
+    phone_col = None
+    
+    for col in df.columns:
+        col_lower = col.lower()
+        if 'nama' in col_lower or 'name' in col_lower:
+            name_col = col
+        elif 'telepon' in col_lower or 'phone' in col_lower or 'no' in col_lower or 'nomor' in col_lower:
+            phone_col = col
+    
+    if not name_col or not phone_col:
+        # Use first two columns as fallback
+        if len(df.columns) >= 2:
+            name_col = df.columns[0]
+            phone_col = df.columns[1]
+        else:
+            return None, None, None
+    
+    contacts = []
+    
+    for row_number, (name, phone) in enumerate(zip(df[name_col], df[phone_col]), 1):
+        if row_number % PROGRESS_EVERY == 0:
+            check_cancelled()
+        name = str(name).strip()
+        phone = str(phone).strip()
+        
+        if name and phone and name != 'nan' and phone != 'nan':
+            contacts.append({'name': name, 'phone': phone})
+    
+    return contacts, name_col, phone_col
+
+def parse_txt_auto(source):
+    """Detect the separator from the first lines and parse contacts, returning (contacts, separator)"""
+    contacts = []
+    
+    # Read TXT file
+    with open_text_source(source) as f:
+        content = f.read()
+    
+    # Auto detect format
+    lines = content.split('\n')
+    detected_separator = None
+    
+    # Test different separators
+    separators = ['|', ',', ':', ';', '\t', ' - ', ' ']
+    separator_counts = {}
+    
+    for line in lines[:10]:  # Test first 10 lines
+        line = line.strip()
+        if not line:
+            continue
+        for sep in separators:
+            if sep in line:
+                parts = line.split(sep)
+                if len(parts) == 2 and parts[0].strip() and parts[1].strip():
+                    separator_counts[sep] = separator_counts.get(sep, 0) + 1
+    
+    if separator_counts:
+        detected_separator = max(separator_counts, key=separator_counts.get)
+    
+    if not detected_separator:
+        return [], None
+    
+    # Parse contacts; the text is already in memory, so progress counts characters consumed
+    consumed = 0
+    for line_number, line in enumerate(lines, 1):
+        consumed += len(line) + 1
+        if line_number % PROGRESS_EVERY == 0:
+            report_progress(consumed, len(content), len(contacts))
+            check_cancelled()
+        
+        line = line.strip()
+        if not line:
+            continue
+            
+        if detected_separator in line:
+            parts = line.split(detected_separator, 1)
+            if len(parts) == 2:
+                name = parts[0].strip()
+                phone = parts[1].strip()
+                
+                # Clean phone number
+                phone = ''.join(filter(str.isdigit, phone))
+                if phone.startswith('0'):
+                    phone = '62' + phone[1:]
+                elif not phone.startswith('62'):
+                    phone = '62' + phone
+                
+                if name and phone:
+                    contacts.append({'name': name, 'phone': phone})
+    
+    report_progress(len(content), len(content), len(contacts))
+    return contacts, detected_separator
+
+def admin_navy_note(contacts: list):
+    """Get the vCard note for contact lists that mention Admin Navy, or None"""
+    if any('navy' in contact['name'].lower() or 'admin' in contact['name'].lower() for contact in contacts):
+        return "Processed by Admin Navy Bot"
+    return None
+
+# Batch converters: one member of a ZIP upload in, (output file, contact count) out.
+# They run in worker processes (see bot.batch), so they are plain functions that raise
+# ValueError for members without usable contacts.
+
+def batch_txt_to_vcf(source):
+    contacts = parse_txt_contacts(source)
+    if not contacts:
+        raise ValueError("Tidak ada kontak yang valid")
+    output_file = os.path.splitext(source_path(source))[0] + '.vcf'
+    output_file = write_vcf_file(output_file, contacts)
+    return output_file, len(contacts)
+
+def batch_vcf_to_txt(source):
+    contacts = parse_vcf_contacts(source)
+    if not contacts:
+        raise ValueError("Tidak ada kontak yang valid")
+    output_file = os.path.splitext(source_path(source))[0] + '.txt'
+    output_file = write_text_file(output_file, "\n".join(contacts))
+    return output_file, len(contacts)
+
+def batch_xlsx_to_vcf(source):
+    contacts, _, _ = parse_xlsx_contacts(source)
+    if contacts is None:
+        raise ValueError("File Excel harus memiliki minimal 2 kolom (nama dan nomor)")
+    if not contacts:
+        raise ValueError("Tidak ada kontak yang valid")
+    output_file = os.path.splitext(source_path(source))[0] + '.vcf'
+    output_file = write_vcf_file(output_file, contacts)
+    return output_file, len(contacts)
+
+def batch_txt2vcf_auto(source):
+    contacts, detected_separator = parse_txt_auto(source)
+    if not detected_separator:
+        raise ValueError("Format tidak terdeteksi")
+    if not contacts:
+        raise ValueError("Tidak ada kontak yang valid")
+    output_file = os.path.splitext(source_path(source))[0] + '_auto.vcf'
+    output_file = write_vcf_file(output_file, contacts, "+", admin_navy_note(contacts))
+    return output_file, len(contacts)
+
+# Admin file analysis reads the mapped file in chunks of this size
+ANALYZE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Analysis scans bytes; only encodings whose newlines and ASCII are not single bytes are re-encoded
+WIDE_ENCODINGS = ('utf-16', 'utf-32')
+
+# Phone of a vCard TEL line, and the rest of a Nama<sep>Nomor line once every separator is turned
+# into '|'; only its digits are kept. Both start with a literal, so the regex engine skips ahead
+# instead of trying every position
+VCF_PHONE_PATTERN = re.compile(rb'\nTEL[^:\n]*:([^\r\n]*)')
+TXT_PHONE_PATTERN = re.compile(rb'\|[^\n]*')
+TXT_SEPARATORS = bytes.maketrans(b',:;\t', b'||||')
+NON_DIGIT_BYTES = bytes(byte for byte in range(256) if not (48 <= byte <= 57 or byte == 10))
+
+def detect_file_format(file_name: str, sample: bytes, text: str) -> str:
+    """Classify a file as VCF, CSV, TXT, XLSX or BINARY from its name, first bytes and first text"""
+    extension = os.path.splitext(file_name)[1].lower()
+    if sample.startswith(b'PK\x03\x04'):
+        return 'XLSX' if extension == '.xlsx' else 'BINARY'
+    if text is None:
+        return 'BINARY'
+    if 'BEGIN:VCARD' in text.upper():
+        return 'VCF'
+    if extension == '.csv':
+        return 'CSV'
+
+    # Comma on every one of the first lines and no pipe: a comma separated export
+    lines = [line for line in text.split('\n')[:10] if line.strip()]
+    if lines and all(',' in line and '|' not in line for line in lines):
+        return 'CSV'
+    return 'TXT'
+
+def collect_phones(matches: list, keys: array) -> int:
+    """Append a 64-bit hash of the digits of each matched phone to keys; returns how many had digits"""
+    if not matches:
+        return 0
+    # One translate over all matches, then filter/map/extend: the per-phone work stays in C
+    before = len(keys)
+    digits = b'\n'.join(matches).translate(None, NON_DIGIT_BYTES).split(b'\n')
+    keys.extend(map(hash, filter(None, digits)))
+    return len(keys) - before
+
+def count_distinct(keys: array) -> int:
+    """Count distinct keys by sorting them in place with numpy (installed with pandas)"""
+    import numpy as np
+    if not keys:
+        return 0
+    values = np.frombuffer(keys, dtype=np.int64)
+    values.sort()
+    return int(np.count_nonzero(values[1:] != values[:-1])) + 1
+
+def analyze_admin_file(file_path: str) -> dict:
+    """Analyze a file in one pass over a memory map
+
+    Every chunk is hashed and scanned once for lines, contacts and phones;
+    duplicates are phones whose digits repeat. UTF-16/32 text is decoded
+    incrementally and scanned as UTF-8.
+
+    Phones are kept as 8-byte hashes of their digits in one array rather than
+    a set of bytes objects, about 8 instead of ~130 bytes per phone. Two
+    different numbers sharing a hash would be counted as one duplicate; among
+    the ~40M phones of a 1 GB file that is expected well under once.
+    """
+    size = os.path.getsize(file_path)
+    sha256 = hashlib.sha256()
+    result = {'size': size, 'encoding': None, 'format': 'TXT', 'lines': 0, 'contacts': 0, 'phones': 0, 'duplicates': 0}
+    phones = array('q')
+    if not size:
+        result['sha256'] = sha256.hexdigest()
+        return result
+
+    # hashlib releases the GIL, so hashing runs alongside the scan; one worker keeps chunk order
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+            ThreadPoolExecutor(max_workers=1) as hasher:
+        sample = mapped[:SNIFF_SIZE]
+        encoding = sniff_encoding(sample)
+        wide = encoding.startswith(WIDE_ENCODINGS)
+        # NUL bytes outside UTF-16/32 mean a binary file; it is only hashed
+        text = sample.decode(encoding, errors='replace') if wide or b'\x00' not in sample else None
+        file_format = detect_file_format(file_path, sample, text)
+        scan = file_format not in ('XLSX', 'BINARY')
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace') if scan and wide else None
+        pending = b''
+        
+        for offset in range(0, size, ANALYZE_CHUNK_SIZE):
+            check_cancelled()
+            chunk = mapped[offset:offset + ANALYZE_CHUNK_SIZE]
+            hashed = hasher.submit(sha256.update, chunk)
+            last = offset + ANALYZE_CHUNK_SIZE >= size
+            
+            if scan:
+                if decoder:
+                    chunk = decoder.decode(chunk, final=last).encode('utf-8')
+                # Scan whole lines only; the partial last line waits for the next chunk
+                data = pending + chunk
+                cut = len(data) if last else data.rfind(b'\n') + 1
+                data, pending = data[:cut], data[cut:]
+                
+                result['lines'] += data.count(b'\n')
+                if last and data and not data.endswith(b'\n'):
+                    result['lines'] += 1
+                if file_format == 'VCF':
+                    result['contacts'] += data.count(b'BEGIN:VCARD')
+                    # data starts at a line start; the leading newline lets the pattern match its first line
+                    result['phones'] += collect_phones(VCF_PHONE_PATTERN.findall(b'\n' + data), phones)
+                else:
+                    found = collect_phones(TXT_PHONE_PATTERN.findall(data.translate(TXT_SEPARATORS)), phones)
+                    result['contacts'] += found
+                    result['phones'] += found
+            
+            # At most one chunk waits to be hashed
+            hashed.result()
+            report_progress(min(offset + ANALYZE_CHUNK_SIZE, size), size, result['contacts'])
+    
+    result['sha256'] = sha256.hexdigest()
+    result['format'] = file_format
+    result['encoding'] = encoding if scan else None
+    
+    if file_format == 'XLSX':
+        # Cells live in compressed XML; count them with the XLSX converter's parser
+        contacts, _, _ = parse_xlsx_contacts(file_path)
+        contacts = contacts or []
+        result['contacts'] = result['phones'] = collect_phones([str(contact['phone']).encode() for contact in contacts], phones)
+    
+    result['duplicates'] = result['phones'] - count_distinct(phones)
+    return result
+
+async def convert_txt_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
+    """Convert TXT file to VCF format"""
+    try:
+        await send_status(update, "🔄 Memproses konversi TXT ke VCF...")
+        
+        contacts = await run_blocking(parse_txt_contacts, file_path)
         
         if not contacts:
             await update.message.reply_text("❌ Tidak ada kontak yang valid ditemukan dalam file TXT.")
             return
         
-        # Create VCF content
-        vcf_content = ""
-        for contact in contacts:
-            vcf_content += f"BEGIN:VCARD\n"
-            vcf_content += f"VERSION:3.0\n"
-            vcf_content += f"FN:{contact['name']}\n"
-            vcf_content += f"TEL:{contact['phone']}\n"
-            vcf_content += f"END:VCARD\n\n"
+        add_contacts(len(contacts))
         
         # Save VCF file
-        output_file = file_path.replace('.txt', '.vcf')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(vcf_content)
+        output_file = source_path(file_path).replace('.txt', '.vcf')
+        output_file = await run_blocking(write_vcf_file, output_file, contacts)
         
         # Send result to user
         await send_document_to_user(update, output_file, 
@@ -70,55 +428,30 @@ async def convert_txt_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE,
         # Cleanup
         await cleanup_temp_file(file_path)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error converting TXT to VCF: {e}")
         await update.message.reply_text(f"❌ Error konversi: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def convert_vcf_to_txt(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Convert VCF file to TXT format"""
     try:
-        await update.message.reply_text("🔄 Memproses konversi VCF ke TXT...")
-        
-        contacts = []
+        await send_status(update, "🔄 Memproses konversi VCF ke TXT...")
         
-        # Read VCF file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            vcf_content = f.read()
-        
-        # Parse VCF content
-        vcf_objects = vobject.readComponents(vcf_content)
-        
-        for vcard in vcf_objects:
-            name = ""
-            phone = ""
-            
-            if hasattr(vcard, 'fn'):
-                name = vcard.fn.value
-            elif hasattr(vcard, 'n'):
-                name = vcard.n.value.formatted_name
-            
-            if hasattr(vcard, 'tel'):
-                if isinstance(vcard.tel, list):
-                    phone = vcard.tel[0].value
-                else:
-                    phone = vcard.tel.value
-            
-            if name and phone:
-                contacts.append(f"{name}|{phone}")
+        contacts = await run_blocking(parse_vcf_contacts, file_path)
         
         if not contacts:
             await update.message.reply_text("❌ Tidak ada kontak yang valid ditemukan dalam file VCF.")
             return
         
-        # Create TXT content
-        txt_content = "\n".join(contacts)
+        add_contacts(len(contacts))
         
-        # Save TXT file
-        output_file = file_path.replace('.vcf', '.txt')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(txt_content)
+        # Create and save TXT file
+        txt_content = "\n".join(contacts)
+        output_file = source_path(file_path).replace('.vcf', '.txt')
+        output_file = await run_blocking(write_text_file, output_file, txt_content)
         
         # Send result to user
         await send_document_to_user(update, output_file, 
@@ -127,66 +460,33 @@ async def convert_vcf_to_txt(update: Update, context: ContextTypes.DEFAULT_TYPE,
         # Cleanup
         await cleanup_temp_file(file_path)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error converting VCF to TXT: {e}")
         await update.message.reply_text(f"❌ Error konversi: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def convert_xlsx_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Convert XLSX file to VCF format"""
     try:
-        await update.message.reply_text("🔄 Memproses konversi XLSX ke VCF...")
-        
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        # Try to find name and phone columns
-        name_col = None
-        phone_col = None
-        
-        for col in df.columns:
-            col_lower = col.lower()
-            if 'nama' in col_lower or 'name' in col_lower:
-                name_col = col
-            elif 'telepon' in col_lower or 'phone' in col_lower or 'no' in col_lower or 'nomor' in col_lower:
-                phone_col = col
-        
-        if not name_col or not phone_col:
-            # Use first two columns as fallback
-            if len(df.columns) >= 2:
-                name_col = df.columns[0]
-                phone_col = df.columns[1]
-            else:
-                await update.message.reply_text("❌ File Excel harus memiliki minimal 2 kolom (nama dan nomor).")
-                return
+        await send_status(update, "🔄 Memproses konversi XLSX ke VCF...")
         
-        contacts = []
+        contacts, name_col, phone_col = await run_blocking(parse_xlsx_contacts, file_path)
         
-        for index, row in df.iterrows():
-            name = str(row[name_col]).strip()
-            phone = str(row[phone_col]).strip()
-            
-            if name and phone and name != 'nan' and phone != 'nan':
-                contacts.append({'name': name, 'phone': phone})
+        if contacts is None:
+            await update.message.reply_text("❌ File Excel harus memiliki minimal 2 kolom (nama dan nomor).")
+            return
         
         if not contacts:
             await update.message.reply_text("❌ Tidak ada kontak yang valid ditemukan dalam file Excel.")
             return
         
-        # Create VCF content
-        vcf_content = ""
-        for contact in contacts:
-            vcf_content += f"BEGIN:VCARD\n"
-            vcf_content += f"VERSION:3.0\n"
-            vcf_content += f"FN:{contact['name']}\n"
-            vcf_content += f"TEL:{contact['phone']}\n"
-            vcf_content += f"END:VCARD\n\n"
+        add_contacts(len(contacts))
         
         # Save VCF file
-        output_file = file_path.replace('.xlsx', '.vcf').replace('.xls', '.vcf')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(vcf_content)
+        output_file = source_path(file_path).replace('.xlsx', '.vcf').replace('.xls', '.vcf')
+        output_file = await run_blocking(write_vcf_file, output_file, contacts)
         
         # Send result to user
         await send_document_to_user(update, output_file, 
@@ -196,91 +496,37 @@ async def convert_xlsx_to_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE
         # Cleanup
         await cleanup_temp_file(file_path)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error converting XLSX to VCF: {e}")
         await update.message.reply_text(f"❌ Error konversi: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def convert_txt2vcf_auto(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Auto detect TXT format and convert to VCF"""
     try:
-        await update.message.reply_text("🔄 Memproses konversi TXT ke VCF dengan deteksi otomatis...")
-        
-        contacts = []
-        
-        # Read TXT file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        await send_status(update, "🔄 Memproses konversi TXT ke VCF dengan deteksi otomatis...")
         
-        # Auto detect format
-        lines = content.split('\n')
-        detected_separator = None
-        
-        # Test different separators
-        separators = ['|', ',', ':', ';', '\t', ' - ', ' ']
-        separator_counts = {}
-        
-        for line in lines[:10]:  # Test first 10 lines
-            line = line.strip()
-            if not line:
-                continue
-            for sep in separators:
-                if sep in line:
-                    parts = line.split(sep)
-                    if len(parts) == 2 and parts[0].strip() and parts[1].strip():
-                        separator_counts[sep] = separator_counts.get(sep, 0) + 1
-        
-        if separator_counts:
-            detected_separator = max(separator_counts, key=separator_counts.get)
+        contacts, detected_separator = await run_blocking(parse_txt_auto, file_path)
         
         if not detected_separator:
             await update.message.reply_text("❌ Tidak dapat mendeteksi format file TXT. Pastikan format: Nama|Nomor")
             return
         
-        # Parse contacts
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if detected_separator in line:
-                parts = line.split(detected_separator, 1)
-                if len(parts) == 2:
-                    name = parts[0].strip()
-                    phone = parts[1].strip()
-                    
-                    # Clean phone number
-                    phone = ''.join(filter(str.isdigit, phone))
-                    if phone.startswith('0'):
-                        phone = '62' + phone[1:]
-                    elif not phone.startswith('62'):
-                        phone = '62' + phone
-                    
-                    if name and phone:
-                        contacts.append({'name': name, 'phone': phone})
-        
         if not contacts:
             await update.message.reply_text("❌ Tidak ada kontak yang valid ditemukan.")
             return
         
+        add_contacts(len(contacts))
+        
         # Create VCF content with Admin Navy detection
-        vcf_content = ""
-        admin_navy_detected = any('navy' in contact['name'].lower() or 'admin' in contact['name'].lower() for contact in contacts)
-        
-        for contact in contacts:
-            vcf_content += f"BEGIN:VCARD\n"
-            vcf_content += f"VERSION:3.0\n"
-            vcf_content += f"FN:{contact['name']}\n"
-            vcf_content += f"TEL:+{contact['phone']}\n"
-            if admin_navy_detected:
-                vcf_content += f"NOTE:Processed by Admin Navy Bot\n"
-            vcf_content += f"END:VCARD\n\n"
+        note = admin_navy_note(contacts)
+        admin_navy_detected = note is not None
         
         # Save VCF file
-        output_file = file_path.replace('.txt', '_auto.vcf')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(vcf_content)
+        output_file = source_path(file_path).replace('.txt', '_auto.vcf')
+        output_file = await run_blocking(write_vcf_file, output_file, contacts, "+", note)
         
         # Send result to user
         navy_note = " 🚢 Admin Navy Detected!" if admin_navy_detected else ""
@@ -292,47 +538,52 @@ async def convert_txt2vcf_auto(update: Update, context: ContextTypes.DEFAULT_TYP
         # Cleanup
         await cleanup_temp_file(file_path)
         await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error in auto TXT to VCF conversion: {e}")
         await update.message.reply_text(f"❌ Error konversi otomatis: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_admin_file(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
-    """Process admin file - special handling for owner"""
+    """Analyze an admin file: hash, encoding, format, lines, contacts and duplicate phones"""
     try:
-        await update.message.reply_text("🗃️ Memproses file admin...")
-        
-        file_size = os.path.getsize(file_path)
-        file_name = os.path.basename(file_path)
-        
-        # Basic file analysis
-        with open(file_path, 'rb') as f:
-            content = f.read(1024)  # Read first 1KB
-            
-        is_text = all(byte < 128 for byte in content)
-        
-        analysis = f"""
-🗃️👩‍💼 **Analisis File Admin**
-
-📁 **Nama File:** {file_name}
-📊 **Ukuran:** {file_size} bytes
-📝 **Tipe:** {'Text File' if is_text else 'Binary File'}
-🔍 **Status:** File berhasil dianalisis
-
-**Fitur Admin:**
-✅ File integrity check
-✅ Size analysis
-✅ Content type detection
-✅ Security scan passed
-        """
+        await send_status(update, "🗃️ Menganalisis file admin...")
+        
+        file_name = source_name(file_path)
+        started = time.perf_counter()
+        result = await run_blocking(analyze_admin_file, file_path)
+        elapsed = time.perf_counter() - started
+        add_contacts(result['contacts'])
+        
+        speed = f" ({format_size(int(result['size'] / elapsed))}/dtk)" if elapsed > 0 and result['size'] else ""
+        if result['format'] == 'BINARY':
+            details = "📝 **Isi:** File biner, hanya di-hash"
+        else:
+            details = (
+                f"🔤 **Encoding:** {result['encoding'] or '-'}\n"
+                f"📄 **Baris:** {result['lines']:,}\n"
+                f"👥 **Kontak:** {result['contacts']:,}\n"
+                f"📞 **Nomor duplikat:** {result['duplicates']:,} dari {result['phones']:,} nomor"
+            )
+        
+        analysis = (
+            "🗃️👩‍💼 **Analisis File Admin**\n\n"
+            f"📁 **Nama File:** {file_name}\n"
+            f"📊 **Ukuran:** {format_size(result['size'])} ({result['size']:,} bytes)\n"
+            f"🧾 **Format:** {result['format']}\n"
+            f"{details}\n"
+            f"🔐 **SHA-256:** {result['sha256']}\n"
+            f"⏱️ **Waktu analisis:** {elapsed:.2f} dtk{speed}"
+        )
         
         await update.message.reply_text(analysis)
         
         # Cleanup
         await cleanup_temp_file(file_path)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error processing admin file: {e}")
         await update.message.reply_text(f"❌ Error memproses file admin: {str(e)}")
+        raise OperationFailed(str(e)) from e
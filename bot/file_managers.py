@@ -4,13 +4,122 @@ File management operations
 
 import os
 import shutil
+import asyncio
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.helpers import cleanup_temp_file, send_document_to_user
+from utils.helpers import (
+    cleanup_temp_file, send_document_to_user, send_documents_to_user, open_text_source,
+    output_path, open_output, get_output_compression, gzip_to_zip
+)
+from bot.scheduler import run_blocking
+from bot.workspace import reset_user_data, get_session_workspace, job_workspace
+from bot.contact_utils import read_vcards, count_vcards, split_vcards
+from bot.metrics import add_contacts, OperationFailed
+from bot.progress import send_status
+from bot.cancellation import check_cancelled
 
 logger = logging.getLogger(__name__)
 
+# Merge sessions append each upload to the output as it arrives; /selesai only sends it
+MERGE_OUTPUT_NAMES = {'txt': "merged_files.txt", 'vcf': "merged_contacts.vcf"}
+
+# Appends to one merge output are serialized in upload order
+_merge_locks = {}
+
+# Lines or vCards already in a deduplicated merge output, rebuilt from the output after a restart
+_merge_seen = {}
+
+def _prune_merge_state():
+    """Forget locks and dedup sets of sessions whose workspace is gone"""
+    for output_file in [path for path in _merge_locks if not os.path.isdir(os.path.dirname(path))]:
+        _merge_locks.pop(output_file, None)
+        _merge_seen.pop(output_file, None)
+
+def read_merge_seen(output_file: str, kind: str) -> set:
+    """Collect the lines or vCards already merged into output_file"""
+    if not os.path.exists(output_file):
+        return set()
+    
+    with open_text_source(output_file) as f:
+        content = f.read()
+    if kind == 'vcf':
+        return {vcard.strip() for vcard in split_vcards(content) if vcard.strip().startswith('BEGIN:VCARD')}
+    return {line.strip() for line in content.split('\n') if line.strip() and not line.startswith('=== File ')}
+
+def merge_into_output(file_path: str, output_file: str, kind: str, file_number: int, seen: set = None):
+    """Validate an uploaded file and append it to the merge output
+
+    Returns (items added, duplicates skipped); items are vCards for VCF and non-empty lines for TXT.
+    With a seen set, lines or vCards already merged are skipped and seen is updated.
+    """
+    with open_text_source(file_path) as f:
+        content = f.read().strip()
+    
+    duplicates = 0
+    if kind == 'vcf':
+        if 'BEGIN:VCARD' not in content:
+            return 0, 0
+        if seen is None:
+            added = content.count('BEGIN:VCARD')
+        else:
+            kept = []
+            for vcard in split_vcards(content):
+                vcard = vcard.strip()
+                if not vcard.startswith('BEGIN:VCARD'):
+                    continue
+                if vcard in seen:
+                    duplicates += 1
+                else:
+                    seen.add(vcard)
+                    kept.append(vcard)
+            content = "\n\n".join(kept)
+            added = len(kept)
+        chunk, separator = content, "\n\n"
+    else:
+        if seen is None:
+            added = sum(1 for line in content.split('\n') if line.strip())
+        else:
+            kept = []
+            for line in content.split('\n'):
+                if not line.strip():
+                    continue
+                if line.strip() in seen:
+                    duplicates += 1
+                else:
+                    seen.add(line.strip())
+                    kept.append(line)
+            content = "\n".join(kept)
+            added = len(kept)
+        chunk = f"=== File {file_number}: {os.path.basename(file_path)} ===\n{content}\n"
+        separator = "\n"
+    
+    if not added:
+        return 0, duplicates
+    
+    has_content = os.path.exists(output_file) and os.path.getsize(output_file) > 0
+    with open_output(output_file, 'a') as f:
+        if has_content:
+            f.write(separator)
+        f.write(chunk)
+    return added, duplicates
+
+def write_vcf_parts(vcards: list, bounds: list, name_pattern: str) -> list:
+    """Write vcards[start:end] for each bound, returning [(output_file, contact_count)]"""
+    output_files = []
+    
+    for i, (start_idx, end_idx) in enumerate(bounds):
+        check_cancelled()
+        part_vcards = vcards[start_idx:end_idx]
+        output_file = output_path(name_pattern.format(i + 1))
+        
+        with open_output(output_file) as f:
+            f.write('\n\n'.join(part_vcards))
+        
+        output_files.append((output_file, count_vcards(part_vcards)))
+    
+    return output_files
+
 async def rename_contact_in_vcf(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Rename contacts in VCF file"""
     try:
@@ -21,10 +130,12 @@ async def rename_contact_in_vcf(update: Update, context: ContextTypes.DEFAULT_TY
     except Exception as e:
         logger.error(f"Error in rename contact: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
-async def rename_uploaded_file(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str, original_name: str):
+async def rename_uploaded_file(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str, original_name: str = None):
     """Rename uploaded file"""
     try:
+        original_name = original_name or update.message.document.file_name
         await update.message.reply_text(f"✏️ File '{original_name}' diterima. Kirim nama baru untuk file (tanpa ekstensi):")
         context.user_data['file_path'] = file_path
         context.user_data['original_name'] = original_name
@@ -33,6 +144,7 @@ async def rename_uploaded_file(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         logger.error(f"Error in rename file: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_rename_file(update: Update, context: ContextTypes.DEFAULT_TYPE, new_name: str):
     """Process file rename with new name"""
@@ -62,92 +174,106 @@ async def process_rename_file(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         # Cleanup
         await cleanup_temp_file(new_file_path)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error renaming file: {e}")
         await update.message.reply_text(f"❌ Error mengubah nama file: {str(e)}")
+        raise OperationFailed(str(e)) from e
+
+def merge_output_path(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str) -> str:
+    # The first merged file fixes the output name, and with it the session's compression
+    output_file = context.user_data.get('merge_output')
+    if output_file and os.path.exists(output_file):
+        return output_file
+    return output_path(os.path.join(get_session_workspace(update, context), MERGE_OUTPUT_NAMES[kind]), appendable=True)
 
-async def merge_txt_files(update: Update, context: ContextTypes.DEFAULT_TYPE, file_paths: list):
-    """Merge multiple TXT files"""
+async def add_file_to_merge(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
+    """Validate, count and append an upload for /gabungtxt or /gabungvcf as soon as it arrives"""
+    kind = 'txt' if context.user_data.get('waiting_for') == 'merge_txt' else 'vcf'
+    unit = "baris" if kind == 'txt' else "kontak"
+    file_name = os.path.basename(file_path)
+    output_file = merge_output_path(update, context, kind)
+    
+    if output_file not in _merge_locks:
+        _prune_merge_state()
+    lock = _merge_locks.setdefault(output_file, asyncio.Lock())
+    
     try:
-        await update.message.reply_text("🔗 Menggabungkan file TXT...")
-        
-        merged_content = []
-        file_count = 0
-        
-        for file_path in file_paths:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        merged_content.append(f"=== File {file_count + 1}: {os.path.basename(file_path)} ===")
-                        merged_content.append(content)
-                        merged_content.append("")  # Empty line separator
-                        file_count += 1
-        
-        if not merged_content:
-            await update.message.reply_text("❌ Tidak ada konten yang dapat digabungkan.")
-            return
-        
-        # Create merged file
-        output_file = "temp/merged_files.txt"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("\n".join(merged_content))
-        
-        # Send result to user
-        await send_document_to_user(update, output_file, 
-                                  f"✅ Berhasil menggabungkan {file_count} file TXT!")
+        async with lock:
+            seen = None
+            if context.user_data.get('merge_unique'):
+                seen = _merge_seen.get(output_file)
+                if seen is None:
+                    seen = _merge_seen[output_file] = await run_blocking(read_merge_seen, output_file, kind)
+            
+            file_number = context.user_data.get('merge_files', 0) + 1
+            added, duplicates = await run_blocking(merge_into_output, file_path, output_file, kind, file_number, seen)
+            
+            if added:
+                context.user_data['merge_output'] = output_file
+                context.user_data['merge_files'] = file_number
+                context.user_data['merge_items'] = context.user_data.get('merge_items', 0) + added
+        
+        duplicate_note = f", {duplicates} duplikat dilewati" if duplicates else ""
+        if added:
+            message = f"✅ File {file_name} ditambahkan: {added} {unit}{duplicate_note}."
+        elif duplicates:
+            message = f"⚠️ Semua isi file {file_name} sudah ada ({duplicates} duplikat), dilewati."
+        else:
+            message = f"⚠️ File {file_name} tidak berisi {unit} yang bisa digabung, dilewati."
         
-        # Cleanup
-        for file_path in file_paths:
-            await cleanup_temp_file(file_path)
-        await cleanup_temp_file(output_file)
+        await update.message.reply_text(
+            f"{message}\n"
+            f"📊 Total: {context.user_data.get('merge_files', 0)} file, {context.user_data.get('merge_items', 0)} {unit}. "
+            "Kirim file lain atau /selesai"
+        )
         
+    except UnicodeDecodeError:
+        await update.message.reply_text(f"❌ File {file_name} tidak terbaca sebagai teks, dilewati. Kirim file lain atau /selesai")
     except Exception as e:
-        logger.error(f"Error merging TXT files: {e}")
-        await update.message.reply_text(f"❌ Error menggabungkan file: {str(e)}")
+        logger.error(f"Error adding file to merge: {e}")
+        await update.message.reply_text(f"❌ Error menambahkan file: {str(e)}")
+        raise OperationFailed(str(e)) from e
+    finally:
+        # The content now lives in the merge output
+        await cleanup_temp_file(file_path)
 
-async def merge_vcf_files(update: Update, context: ContextTypes.DEFAULT_TYPE, file_paths: list):
-    """Merge multiple VCF files"""
+async def send_merge_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send the merge output built while the files were uploaded"""
+    kind = 'txt' if context.user_data.get('waiting_for') == 'merge_txt' else 'vcf'
+    output_file = context.user_data.get('merge_output')
+    file_count = context.user_data.get('merge_files', 0)
+    item_count = context.user_data.get('merge_items', 0)
+    
     try:
-        await update.message.reply_text("🔗 Menggabungkan file VCF...")
-        
-        merged_vcards = []
-        total_contacts = 0
-        
-        for file_path in file_paths:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        # Count vcards in this file
-                        vcard_count = content.count('BEGIN:VCARD')
-                        total_contacts += vcard_count
-                        merged_vcards.append(content)
-        
-        if not merged_vcards:
-            await update.message.reply_text("❌ Tidak ada kontak yang dapat digabungkan.")
+        if not file_count or not output_file or not os.path.exists(output_file):
+            await update.message.reply_text(f"❌ Tidak ada file {kind.upper()} untuk digabung.")
             return
         
-        # Create merged VCF file
-        output_file = "temp/merged_contacts.vcf"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("\n\n".join(merged_vcards))
+        if kind == 'vcf':
+            add_contacts(item_count)
+            caption = f"✅ Berhasil menggabungkan {file_count} file VCF!\n📇 Total kontak: {item_count}"
+        else:
+            caption = f"✅ Berhasil menggabungkan {file_count} file TXT!"
+        if context.user_data.get('merge_unique'):
+            caption += "\n🧹 Duplikat sudah dihapus"
         
-        # Send result to user
-        await send_document_to_user(update, output_file, 
-                                  f"✅ Berhasil menggabungkan {len(file_paths)} file VCF!\n"
-                                  f"📇 Total kontak: {total_contacts}")
+        # Appended as gzip; a ZIP preference gets it recompressed, still without an uncompressed copy
+        result_file = output_file
+        if get_output_compression() == 'zip' and output_file.endswith('.gz'):
+            result_file = await run_blocking(gzip_to_zip, output_file)
         
-        # Cleanup
-        for file_path in file_paths:
-            await cleanup_temp_file(file_path)
-        await cleanup_temp_file(output_file)
+        await send_document_to_user(update, result_file, caption)
+        await cleanup_temp_file(result_file)
         
     except Exception as e:
-        logger.error(f"Error merging VCF files: {e}")
+        logger.error(f"Error sending merged file: {e}")
         await update.message.reply_text(f"❌ Error menggabungkan file: {str(e)}")
+        raise OperationFailed(str(e)) from e
+    finally:
+        _merge_locks.pop(output_file, None)
+        _merge_seen.pop(output_file, None)
 
 async def split_vcf_file(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Split VCF file into multiple parts"""
@@ -159,6 +285,7 @@ async def split_vcf_file(update: Update, context: ContextTypes.DEFAULT_TYPE, fil
     except Exception as e:
         logger.error(f"Error in split VCF: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_split_parts(update: Update, context: ContextTypes.DEFAULT_TYPE, parts_text: str):
     """Process VCF file splitting by parts"""
@@ -173,72 +300,58 @@ async def process_split_parts(update: Update, context: ContextTypes.DEFAULT_TYPE
             await update.message.reply_text("❌ File VCF tidak ditemukan. Silakan upload ulang.")
             return
         
-        await update.message.reply_text(f"✂️ Memecah file VCF menjadi {parts} bagian...")
-        
-        # Read VCF file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        await send_status(update, f"✂️ Memecah file VCF menjadi {parts} bagian...")
         
         # Split into individual vcards
-        vcards = []
-        current_vcard = []
-        
-        for line in content.split('\n'):
-            if line.strip() == 'BEGIN:VCARD':
-                if current_vcard:
-                    vcards.append('\n'.join(current_vcard))
-                current_vcard = [line]
-            else:
-                current_vcard.append(line)
-        
-        if current_vcard:
-            vcards.append('\n'.join(current_vcard))
+        vcards = await run_blocking(read_vcards, file_path)
         
         if len(vcards) < parts:
             await update.message.reply_text(f"❌ File hanya memiliki {len(vcards)} kontak, tidak dapat dipecah menjadi {parts} bagian.")
             return
         
+        add_contacts(len(vcards))
+        
         # Calculate contacts per part
         contacts_per_part = len(vcards) // parts
         remainder = len(vcards) % parts
         
-        # Create split files
-        output_files = []
+        bounds = []
         start_idx = 0
         
         for i in range(parts):
             end_idx = start_idx + contacts_per_part
             if i < remainder:
                 end_idx += 1
-            
-            part_vcards = vcards[start_idx:end_idx]
-            part_content = '\n\n'.join(part_vcards)
-            
-            output_file = f"temp/split_part_{i+1}.vcf"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(part_content)
-            
-            output_files.append(output_file)
+            bounds.append((start_idx, end_idx))
             start_idx = end_idx
         
+        # Create split files
+        output_files = await run_blocking(write_vcf_parts, vcards, bounds,
+                                          os.path.join(get_session_workspace(update, context), "split_part_{}.vcf"))
+        
         # Send all parts to user
         await update.message.reply_text(f"✅ File berhasil dipecah menjadi {parts} bagian!")
         
-        for i, output_file in enumerate(output_files):
-            part_contacts = len([line for line in open(output_file, 'r').read().split('\n') if line.strip() == 'BEGIN:VCARD'])
-            await send_document_to_user(update, output_file, f"📂 Bagian {i+1}/{parts} ({part_contacts} kontak)")
+        await send_documents_to_user(
+            update,
+            [(output_file, f"📂 Bagian {i+1}/{parts} ({part_contacts} kontak)")
+             for i, (output_file, part_contacts) in enumerate(output_files)],
+            lambda first, last: f"📂 Bagian {first+1}-{last+1} dari {parts} "
+                                f"({sum(count for _, count in output_files[first:last + 1])} kontak)"
+        )
         
         # Cleanup
         await cleanup_temp_file(file_path)
-        for output_file in output_files:
+        for output_file, _ in output_files:
             await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except ValueError:
         await update.message.reply_text("❌ Masukkan angka yang valid untuk jumlah bagian.")
     except Exception as e:
         logger.error(f"Error splitting VCF by parts: {e}")
         await update.message.reply_text(f"❌ Error memecah file: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def split_vcf_by_contact(update: Update, context: ContextTypes.DEFAULT_TYPE, file_path: str):
     """Split VCF file by contact count"""
@@ -250,6 +363,7 @@ async def split_vcf_by_contact(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         logger.error(f"Error in split VCF by contact: {e}")
         await update.message.reply_text(f"❌ Error: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_contacts_per_file(update: Update, context: ContextTypes.DEFAULT_TYPE, contacts_text: str):
     """Process VCF file splitting by contact count"""
@@ -264,104 +378,85 @@ async def process_contacts_per_file(update: Update, context: ContextTypes.DEFAUL
             await update.message.reply_text("❌ File VCF tidak ditemukan. Silakan upload ulang.")
             return
         
-        await update.message.reply_text(f"📇 Memecah file VCF dengan {contacts_per_file} kontak per file...")
-        
-        # Read VCF file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        await send_status(update, f"📇 Memecah file VCF dengan {contacts_per_file} kontak per file...")
         
         # Split into individual vcards
-        vcards = []
-        current_vcard = []
-        
-        for line in content.split('\n'):
-            if line.strip() == 'BEGIN:VCARD':
-                if current_vcard:
-                    vcards.append('\n'.join(current_vcard))
-                current_vcard = [line]
-            else:
-                current_vcard.append(line)
-        
-        if current_vcard:
-            vcards.append('\n'.join(current_vcard))
+        vcards = await run_blocking(read_vcards, file_path)
         
         total_contacts = len(vcards)
+        add_contacts(total_contacts)
         total_files = (total_contacts + contacts_per_file - 1) // contacts_per_file
         
-        # Create split files
-        output_files = []
+        bounds = [(i, min(i + contacts_per_file, total_contacts)) for i in range(0, total_contacts, contacts_per_file)]
         
-        for i in range(0, total_contacts, contacts_per_file):
-            end_idx = min(i + contacts_per_file, total_contacts)
-            part_vcards = vcards[i:end_idx]
-            part_content = '\n\n'.join(part_vcards)
-            
-            file_num = (i // contacts_per_file) + 1
-            output_file = f"temp/contacts_{file_num}.vcf"
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(part_content)
-            
-            output_files.append(output_file)
+        # Create split files
+        output_files = await run_blocking(write_vcf_parts, vcards, bounds,
+                                          os.path.join(get_session_workspace(update, context), "contacts_{}.vcf"))
         
         # Send all files to user
         await update.message.reply_text(f"✅ File berhasil dipecah menjadi {total_files} file!")
         
-        for i, output_file in enumerate(output_files):
-            actual_contacts = len([line for line in open(output_file, 'r').read().split('\n') if line.strip() == 'BEGIN:VCARD'])
-            await send_document_to_user(update, output_file, f"📇 File {i+1}/{total_files} ({actual_contacts} kontak)")
+        await send_documents_to_user(
+            update,
+            [(output_file, f"📇 File {i+1}/{total_files} ({actual_contacts} kontak)")
+             for i, (output_file, actual_contacts) in enumerate(output_files)],
+            lambda first, last: f"📇 File {first+1}-{last+1} dari {total_files} "
+                                f"({sum(count for _, count in output_files[first:last + 1])} kontak)"
+        )
         
         # Cleanup
         await cleanup_temp_file(file_path)
-        for output_file in output_files:
+        for output_file, _ in output_files:
             await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except ValueError:
         await update.message.reply_text("❌ Masukkan angka yang valid untuk jumlah kontak per file.")
     except Exception as e:
         logger.error(f"Error splitting VCF by contact count: {e}")
         await update.message.reply_text(f"❌ Error memecah file: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def save_message_to_txt(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
     """Save message to TXT file"""
     try:
         await update.message.reply_text("📝 Menyimpan pesan ke file TXT...")
         
-        # Create TXT file with message
-        output_file = "temp/saved_message.txt"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(f"Pesan dari: {update.effective_user.first_name}\n")
-            f.write(f"Username: @{update.effective_user.username}\n")
-            f.write(f"User ID: {update.effective_user.id}\n")
-            f.write(f"Tanggal: {update.message.date}\n")
-            f.write("=" * 50 + "\n")
-            f.write(message_text)
+        with job_workspace(update.effective_user.id) as workspace:
+            # Create TXT file with message
+            output_file = os.path.join(workspace, "saved_message.txt")
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(f"Pesan dari: {update.effective_user.first_name}\n")
+                f.write(f"Username: @{update.effective_user.username}\n")
+                f.write(f"User ID: {update.effective_user.id}\n")
+                f.write(f"Tanggal: {update.message.date}\n")
+                f.write("=" * 50 + "\n")
+                f.write(message_text)
+            
+            # Send file to user
+            await send_document_to_user(update, output_file, 
+                                      "✅ Pesan berhasil disimpan ke file TXT!")
         
-        # Send file to user
-        await send_document_to_user(update, output_file, 
-                                  "✅ Pesan berhasil disimpan ke file TXT!")
-        
-        # Cleanup
-        await cleanup_temp_file(output_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error saving message to TXT: {e}")
         await update.message.reply_text(f"❌ Error menyimpan pesan: {str(e)}")
+        raise OperationFailed(str(e)) from e
 
 async def process_bug_report(update: Update, context: ContextTypes.DEFAULT_TYPE, bug_text: str):
     """Process bug report"""
     try:
         # Save bug report to file
-        bug_file = "temp/bug_report.txt"
-        with open(bug_file, 'w', encoding='utf-8') as f:
-            f.write(f"Bug Report dari: {update.effective_user.first_name}\n")
-            f.write(f"Username: @{update.effective_user.username}\n")
-            f.write(f"User ID: {update.effective_user.id}\n")
-            f.write(f"Tanggal: {update.message.date}\n")
-            f.write("=" * 50 + "\n")
-            f.write(bug_text)
+        with job_workspace(update.effective_user.id) as workspace:
+            bug_file = os.path.join(workspace, "bug_report.txt")
+            with open(bug_file, 'w', encoding='utf-8') as f:
+                f.write(f"Bug Report dari: {update.effective_user.first_name}\n")
+                f.write(f"Username: @{update.effective_user.username}\n")
+                f.write(f"User ID: {update.effective_user.id}\n")
+                f.write(f"Tanggal: {update.message.date}\n")
+                f.write("=" * 50 + "\n")
+                f.write(bug_text)
         
         await update.message.reply_text(
             "🐞 **Bug Report Diterima!**\n\n"
@@ -374,10 +469,9 @@ async def process_bug_report(update: Update, context: ContextTypes.DEFAULT_TYPE,
         # Send bug report to developer (in real implementation, send to admin)
         logger.info(f"Bug report from {update.effective_user.id}: {bug_text}")
         
-        # Cleanup
-        await cleanup_temp_file(bug_file)
-        context.user_data.clear()
+        reset_user_data(context)
         
     except Exception as e:
         logger.error(f"Error processing bug report: {e}")
         await update.message.reply_text(f"❌ Error memproses laporan bug: {str(e)}")
+        raise OperationFailed(str(e)) from e
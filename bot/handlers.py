@@ -4,10 +4,22 @@ Handler untuk semua command bot Telegram
 
 import os
 import logging
+from contextlib import asynccontextmanager
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from bot.user_manager import check_user_access, is_owner
+from bot.database import log_file_operation, get_user_stats, get_global_stats, get_daily_totals, get_slowest_operations, get_throughput_trend, get_user_preference, set_user_preference
+from bot.scheduler import scheduler, SMALL_JOB_BYTES
+from bot.janitor import run_janitor
+from bot.operations import get_operation
+from bot.profiler import profile_operation, arm, disarm, get_armed
+from bot.progress import track_progress
+from bot.cancellation import cancellable, cancel_user_jobs, check_cancelled, wait_abandoned, OperationCancelled
+from bot.metrics import track_operation, OperationFailed, stage, add_bytes, REQUESTS, REQUEST_ERRORS, REQUEST_LATENCY, OPERATIONS, OPERATION_ERRORS, OPERATION_LATENCY, STAGE_LATENCY, BYTES
+from bot.workspace import reset_user_data, get_session_workspace, create_workspace, remove_workspace
+from bot.result_cache import make_cache_key, send_cached_result, store_result, get_cache_stats
+from bot.batch import process_zip_batch
 from bot.file_converters import *
 from bot.file_managers import *
 from bot.contact_utils import *
@@ -15,6 +27,32 @@ from utils.helpers import *
 
 logger = logging.getLogger(__name__)
 
+async def schedule_job(update: Update, job, heavy: bool = False):
+    """Run a file job through the scheduler, telling the user when it has to queue; /batal cancels it"""
+    user_id = update.effective_user.id
+    
+    async def notify_queued(position: int):
+        await update.message.reply_text(
+            f"⏳ Permintaan Anda masuk antrian (posisi {position}).\n"
+            "File akan diproses otomatis, tidak perlu mengirim ulang."
+        )
+    
+    async def run_job():
+        # Cancelled while queued: give the slot back without starting
+        check_cancelled()
+        try:
+            return await job()
+        finally:
+            # Keep the slot until threads left running by /batal have stopped
+            await wait_abandoned()
+    
+    try:
+        with cancellable(user_id):
+            await scheduler.submit(user_id, run_job, on_queued=notify_queued, heavy=heavy)
+    except OperationCancelled:
+        # /batal already replied and reset the session; workspaces were removed on the way out
+        logger.info(f"Job of user {user_id} cancelled")
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk command /start"""
     user_id = update.effective_user.id
@@ -113,9 +151,12 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ────────────────────────
 
 ⚙️ **Other Menu**
+/batal - Batalkan proses yang berjalan 🛑
+/kompres - Kompres file hasil (gz/zip) 🗜️
 /reset_conversions - Reset duplikat respon 🔧🔄
 /fixbug - Perbaiki bug menyeluruh 🛠️⚙️
 /laporkanbug - Laporkan bug 🐞📝
+/stats - Statistik penggunaan 📈
 
 ────────────────────────
 
@@ -123,6 +164,8 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /adduser - Tambah pengguna ➕👤
 /deluser - Hapus akses pengguna ❌👤
 /totaluser - Lihat jumlah pengguna 👀
+/metrics - Metrics bot 📊
+/profile - Profil operasi berikutnya 🔬
     """
     
     await update.message.reply_text(menu_text, parse_mode=ParseMode.MARKDOWN)
@@ -156,11 +199,13 @@ async def cv_txt_to_vcf_command(update: Update, context: ContextTypes.DEFAULT_TY
         "Format TXT yang didukung:\n"
         "• Nama|Nomor\n"
         "• Nama,Nomor\n"
-        "• Nama : Nomor",
+        "• Nama : Nomor"
+        "\n\n📦 Bisa juga ZIP berisi banyak file; `/cv_txt_to_vcf gabung` untuk satu file hasil",
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'txt_to_vcf'
+    context.user_data['batch_merge'] = bool(context.args) and context.args[0].lower() == 'gabung'
 
 async def cv_vcf_to_txt_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /cv_vcf_to_txt"""
@@ -171,11 +216,13 @@ async def cv_vcf_to_txt_command(update: Update, context: ContextTypes.DEFAULT_TY
     await update.message.reply_text(
         "📇➡️📄 **Convert VCF to TXT**\n\n"
         "Upload file .vcf untuk dikonversi ke format .txt\n"
-        "Hasil akan berupa file txt dengan format: Nama|Nomor",
+        "Hasil akan berupa file txt dengan format: Nama|Nomor"
+        "\n\n📦 Bisa juga ZIP berisi banyak file; `/cv_vcf_to_txt gabung` untuk satu file hasil",
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'vcf_to_txt'
+    context.user_data['batch_merge'] = bool(context.args) and context.args[0].lower() == 'gabung'
 
 async def cv_xlsx_to_vcf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /cv_xlsx_to_vcf"""
@@ -187,11 +234,13 @@ async def cv_xlsx_to_vcf_command(update: Update, context: ContextTypes.DEFAULT_T
         "📊➡️📇 **Convert XLSX to VCF**\n\n"
         "Upload file .xlsx yang berisi data kontak\n"
         "Bot akan mengambil nomor telepon dari tabel dan convert ke VCF\n"
-        "Pastikan ada kolom nama dan nomor telepon di Excel",
+        "Pastikan ada kolom nama dan nomor telepon di Excel"
+        "\n\n📦 Bisa juga ZIP berisi banyak file; `/cv_xlsx_to_vcf gabung` untuk satu file hasil",
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'xlsx_to_vcf'
+    context.user_data['batch_merge'] = bool(context.args) and context.args[0].lower() == 'gabung'
 
 async def txt2vcf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /txt2vcf"""
@@ -203,11 +252,13 @@ async def txt2vcf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "📊➡️📇 **TXT to VCF Auto Detect**\n\n"
         "Upload file .txt dan bot akan otomatis mendeteksi format\n"
         "Mendukung berbagai format pemisah (koma, titik koma, dll)\n"
-        "Deteksi otomatis Admin Navy! 🚢",
+        "Deteksi otomatis Admin Navy! 🚢"
+        "\n\n📦 Bisa juga ZIP berisi banyak file; `/txt2vcf gabung` untuk satu file hasil",
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'txt2vcf_auto'
+    context.user_data['batch_merge'] = bool(context.args) and context.args[0].lower() == 'gabung'
 
 async def cv_admin_file_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /cvadminfile"""
@@ -221,8 +272,8 @@ async def cv_admin_file_command(update: Update, context: ContextTypes.DEFAULT_TY
     
     await update.message.reply_text(
         "🗃️👩‍💼 **Kelola File Admin**\n\n"
-        "Upload file admin yang ingin dikelola\n"
-        "Fitur khusus untuk admin dalam mengelola file sistem",
+        "Upload file admin yang ingin dianalisis (VCF/TXT/CSV/XLSX atau file lain)\n"
+        "Hasil: SHA-256, encoding, format, jumlah baris, kontak dan nomor duplikat",
         parse_mode=ParseMode.MARKDOWN
     )
     
@@ -265,15 +316,20 @@ async def gabung_txt_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("❌ Akses ditolak.")
         return
     
+    # Mulai sesi baru; "/gabungtxt unik" membuang baris duplikat
+    unique = bool(context.args) and context.args[0].lower() == 'unik'
+    reset_user_data(context)
+    
     await update.message.reply_text(
         "📄🔗 **Gabung File TXT**\n\n"
         "Upload beberapa file .txt untuk digabungkan\n"
-        "Kirim file satu per satu, lalu ketik /selesai ketika sudah selesai upload",
+        "Setiap file langsung diproses saat diterima, lalu ketik /selesai ketika sudah selesai upload\n"
+        + ("🧹 Duplikat akan dibuang" if unique else "Gunakan `/gabungtxt unik` untuk membuang duplikat"),
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'merge_txt'
-    context.user_data['txt_files'] = []
+    context.user_data['merge_unique'] = unique
 
 async def gabung_vcf_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /gabungvcf"""
@@ -281,15 +337,20 @@ async def gabung_vcf_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("❌ Akses ditolak.")
         return
     
+    # Mulai sesi baru; "/gabungvcf unik" membuang kontak duplikat
+    unique = bool(context.args) and context.args[0].lower() == 'unik'
+    reset_user_data(context)
+    
     await update.message.reply_text(
         "📄🔗 **Gabung File VCF**\n\n"
         "Upload beberapa file .vcf untuk digabungkan\n"
-        "Kirim file satu per satu, lalu ketik /selesai ketika sudah selesai upload",
+        "Setiap file langsung diproses saat diterima, lalu ketik /selesai ketika sudah selesai upload\n"
+        + ("🧹 Duplikat akan dibuang" if unique else "Gunakan `/gabungvcf unik` untuk membuang duplikat"),
         parse_mode=ParseMode.MARKDOWN
     )
     
     context.user_data['waiting_for'] = 'merge_vcf'
-    context.user_data['vcf_files'] = []
+    context.user_data['merge_unique'] = unique
 
 async def pecah_file_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /pecahfile"""
@@ -401,8 +462,9 @@ async def reset_conversions_command(update: Update, context: ContextTypes.DEFAUL
         await update.message.reply_text("❌ Akses ditolak.")
         return
     
-    # Clear user data
-    context.user_data.clear()
+    # Stop running jobs and clear user data
+    cancel_user_jobs(update.effective_user.id)
+    reset_user_data(context)
     
     await update.message.reply_text(
         "🔧🔄 **Reset Berhasil!**\n\n"
@@ -410,21 +472,78 @@ async def reset_conversions_command(update: Update, context: ContextTypes.DEFAUL
         "Bot siap menerima command baru"
     )
 
+async def batal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /batal"""
+    user_id = update.effective_user.id
+    if not await check_user_access(user_id):
+        await update.message.reply_text("❌ Akses ditolak.")
+        return
+    
+    # Running jobs stop at their next checkpoint and remove their own workspace
+    cancelled = cancel_user_jobs(user_id)
+    reset_user_data(context)
+    
+    if cancelled:
+        await update.message.reply_text(
+            f"🛑 {cancelled} proses dibatalkan.\n"
+            "File sementara dibersihkan, silakan kirim command baru."
+        )
+    else:
+        await update.message.reply_text("ℹ️ Tidak ada proses yang sedang berjalan. Sesi Anda telah direset.")
+
+# Pilihan /kompres -> nilai preferensi 'compression'
+COMPRESSION_CHOICES = {'gz': 'gz', 'zip': 'zip', 'off': None}
+
+async def kompres_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /kompres"""
+    user_id = update.effective_user.id
+    if not await check_user_access(user_id):
+        await update.message.reply_text("❌ Akses ditolak.")
+        return
+    
+    usage = (
+        "Gunakan:\n"
+        "• /kompres gz - hasil .vcf.gz / .txt.gz\n"
+        "• /kompres zip - hasil .zip\n"
+        "• /kompres off - tanpa kompresi"
+    )
+    
+    if not context.args:
+        current = get_user_preference(user_id, 'compression')
+        await update.message.reply_text(f"🗜️ Kompresi file hasil: {current or 'off'}\n\n{usage}")
+        return
+    
+    choice = context.args[0].lower()
+    if choice not in COMPRESSION_CHOICES:
+        await update.message.reply_text(f"❌ Pilihan tidak dikenali.\n\n{usage}")
+        return
+    
+    set_user_preference(user_id, 'compression', COMPRESSION_CHOICES[choice])
+    if COMPRESSION_CHOICES[choice]:
+        await update.message.reply_text(
+            f"✅ File hasil konversi, gabung dan pecah akan dikirim terkompres ({choice}).\n"
+            "VCF biasanya 10x lebih kecil, upload jadi lebih cepat."
+        )
+    else:
+        await update.message.reply_text("✅ Kompresi dimatikan, file hasil dikirim apa adanya.")
+
 async def fix_bug_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /fixbug"""
     if not await check_user_access(update.effective_user.id):
         await update.message.reply_text("❌ Akses ditolak.")
         return
     
-    # Clear semua data dan reset
-    context.user_data.clear()
+    # Hentikan proses berjalan, clear semua data dan reset, lalu bersihkan temp/ sekarang juga
+    cancel_user_jobs(update.effective_user.id)
+    reset_user_data(context)
+    cleanup = await run_janitor(context.application)
     
     await update.message.reply_text(
         "🛠️⚙️ **Perbaikan Bug Menyeluruh**\n\n"
         "✅ Cache dibersihkan\n"
         "✅ Memory direset\n"
         "✅ State conversation direset\n"
-        "✅ Temporary files dibersihkan\n\n"
+        f"✅ Temporary files dibersihkan: {cleanup['files']} file, {format_size(cleanup['bytes'])}\n\n"
         "Bot telah diperbaiki dan siap digunakan!"
     )
 
@@ -447,6 +566,193 @@ async def laporkan_bug_command(update: Update, context: ContextTypes.DEFAULT_TYP
     
     context.user_data['waiting_for'] = 'bug_report'
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /stats"""
+    user_id = update.effective_user.id
+    if not await check_user_access(user_id):
+        await update.message.reply_text("❌ Akses ditolak.")
+        return
+    
+    # Optional jumlah hari, contoh: /stats 7
+    days = 30
+    if context.args:
+        try:
+            days = max(1, int(context.args[0]))
+        except ValueError:
+            await update.message.reply_text("❌ Format salah. Gunakan: /stats atau /stats <jumlah hari>")
+            return
+    
+    user_rows = get_user_stats(user_id, days)
+    if user_rows:
+        user_lines = [f"• `{op}`: {total} ({errors} gagal)" for op, total, errors in user_rows]
+        user_total = sum(row[1] for row in user_rows)
+        user_text = "\n".join(user_lines) + f"\n\n📊 Total: {user_total} operasi"
+    else:
+        user_text = "Belum ada operasi tercatat"
+    
+    stats_text = f"📈 **Statistik Anda ({days} hari terakhir)**\n\n{user_text}"
+    
+    if await is_owner(user_id):
+        global_rows = get_global_stats(days)
+        daily_rows = get_daily_totals(min(days, 7))
+        
+        if global_rows:
+            global_lines = [f"• `{op}`: {total} ({errors} gagal)" for op, total, errors in global_rows]
+            global_total = sum(row[1] for row in global_rows)
+            global_text = "\n".join(global_lines) + f"\n\n📊 Total: {global_total} operasi"
+        else:
+            global_text = "Belum ada operasi tercatat"
+        
+        daily_text = "\n".join(f"• {date}: {total} ({errors} gagal)" for date, total, errors in daily_rows)
+        
+        stats_text += (
+            f"\n\n────────────────────────\n\n"
+            f"✨ **Semua Pengguna ({days} hari terakhir)**\n\n{global_text}"
+        )
+        if daily_text:
+            stats_text += f"\n\n📅 **Harian:**\n{daily_text}"
+        
+        slowest_rows = get_slowest_operations(min(days, 7))
+        if slowest_rows:
+            slowest_text = "\n".join(
+                f"• `{op}` {duration_ms / 1000:.1f} dtk, {(bytes_in or 0) / (1024 * 1024):.1f} MB, {contacts or 0} kontak (user {op_user})"
+                for op, _, op_user, duration_ms, bytes_in, contacts, _ in slowest_rows
+            )
+            stats_text += f"\n\n🐢 **Operasi Terlambat:**\n{slowest_text}"
+        
+        trend_rows = get_throughput_trend(min(days, 7))
+        if trend_rows:
+            trend_text = "\n".join(
+                f"• {date}: {count} operasi, rata-rata {(avg_ms or 0) / 1000:.2f} dtk, {rate or 0:,.0f} kontak/dtk"
+                for date, count, avg_ms, _, _, rate in trend_rows
+            )
+            stats_text += f"\n\n🚀 **Throughput:**\n{trend_text}"
+        
+        load = scheduler.get_stats()
+        stats_text += (
+            f"\n\n⏱️ **Antrian:** {load['active']} berjalan, {load['queued']} menunggu\n"
+            f"p95 job kecil: {load['p95_small']:.2f} dtk • p95 job besar: {load['p95_heavy']:.2f} dtk"
+        )
+        
+        cache = get_cache_stats()
+        stats_text += (
+            f"\n\n⚡ **Cache hasil:** {cache['hit_rate']:.0%} hit "
+            f"({cache['hits']} hit, {cache['misses']} miss), {cache['entries']} entri, "
+            f"{cache['evictions']} dibuang"
+        )
+    
+    await update.message.reply_text(stats_text, parse_mode=ParseMode.MARKDOWN)
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /metrics"""
+    if not await is_owner(update.effective_user.id):
+        await update.message.reply_text("❌ Fitur ini hanya untuk owner.")
+        return
+    
+    latency = dict(REQUEST_LATENCY.items())
+    request_lines = []
+    for (command,), total in sorted(REQUESTS.items(), key=lambda item: item[1], reverse=True)[:10]:
+        data = latency.get((command,))
+        average = data[-2] / data[-1] if data and data[-1] else 0
+        request_lines.append(
+            f"• `{command}`: {total:g} ({REQUEST_ERRORS.get(command=command):g} error), "
+            f"rata-rata {average:.2f} dtk, p95 ≤ {REQUEST_LATENCY.percentile(95, command=command):g} dtk"
+        )
+    
+    operation_latency = dict(OPERATION_LATENCY.items())
+    operation_lines = []
+    for (name,), total in sorted(OPERATIONS.items(), key=lambda item: item[1], reverse=True):
+        data = operation_latency.get((name,))
+        average = data[-2] / data[-1] if data and data[-1] else 0
+        operation_lines.append(
+            f"• `{name}`: {total:g} ({OPERATION_ERRORS.get(operation=name):g} gagal), "
+            f"rata-rata {average:.2f} dtk, p95 ≤ {OPERATION_LATENCY.percentile(95, operation=name):g} dtk"
+        )
+    
+    # Waktu per tahap, dijumlah untuk semua operasi
+    stages = {}
+    for (_, stage_name), data in STAGE_LATENCY.items():
+        total_time, count = stages.get(stage_name, (0.0, 0))
+        stages[stage_name] = (total_time + data[-2], count + data[-1])
+    stage_lines = [
+        f"• {stage_name}: {count} kali, rata-rata {total_time / count:.3f} dtk"
+        for stage_name, (total_time, count) in sorted(stages.items()) if count
+    ]
+    
+    bytes_in = sum(value for (_, direction), value in BYTES.items() if direction == 'in')
+    bytes_out = sum(value for (_, direction), value in BYTES.items() if direction == 'out')
+    load = scheduler.get_stats()
+    
+    request_text = "\n".join(request_lines) or "Belum ada"
+    operation_text = "\n".join(operation_lines) or "Belum ada"
+    stage_text = "\n".join(stage_lines) or "Belum ada"
+    
+    metrics_text = (
+        "📊 **Metrics Bot (sejak start)**\n\n"
+        f"**Request:**\n{request_text}\n\n"
+        f"**Operasi file:**\n{operation_text}\n\n"
+        f"**Tahap:**\n{stage_text}\n\n"
+        f"📥 Masuk: {format_size(int(bytes_in))} • 📤 Keluar: {format_size(int(bytes_out))}\n"
+        f"⏱️ Antrian: {load['active']} berjalan, {load['queued']} menunggu"
+    )
+    
+    await update.message.reply_text(metrics_text, parse_mode=ParseMode.MARKDOWN)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /profile"""
+    if not await is_owner(update.effective_user.id):
+        await update.message.reply_text("❌ Fitur ini hanya untuk owner.")
+        return
+    
+    usage = (
+        "🔬 **Profil Operasi**\n\n"
+        "`/profile <jumlah>` - profil operasi berikutnya\n"
+        "`/profile <jumlah> <user_id>` - hanya operasi user tersebut\n"
+        "`/profile <jumlah> <operasi>` - hanya operasi tertentu, contoh: `xlsx_to_vcf`\n"
+        "`/profile off` - batalkan"
+    )
+    
+    if not context.args:
+        armed = get_armed()
+        if armed:
+            target = armed['user_id'] or armed['operation'] or "semua"
+            usage += f"\n\n✅ Aktif: {armed['remaining']} operasi berikutnya (filter: `{target}`)"
+        await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+        return
+    
+    if context.args[0].lower() == 'off':
+        disarm()
+        await update.message.reply_text("🔬 Profiling dibatalkan.")
+        return
+    
+    try:
+        count = int(context.args[0])
+        if count < 1:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(usage, parse_mode=ParseMode.MARKDOWN)
+        return
+    
+    user_id = None
+    operation = None
+    if len(context.args) > 1:
+        target = context.args[1]
+        if target.isdigit():
+            user_id = int(target)
+        elif get_operation(target):
+            operation = target
+        else:
+            await update.message.reply_text(f"❌ Operasi `{target}` tidak dikenal.", parse_mode=ParseMode.MARKDOWN)
+            return
+    
+    arm(update.effective_user.id, count, user_id=user_id, operation=operation)
+    target = f" user {user_id}" if user_id else (f" `{operation}`" if operation else "")
+    await update.message.reply_text(
+        f"🔬 Profiling aktif untuk {count} operasi{target} berikutnya.\n"
+        "Laporan TXT dan file .pstats akan dikirim ke chat ini.",
+        parse_mode=ParseMode.MARKDOWN
+    )
+
 # Owner Menu Handlers
 async def add_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk /adduser"""
@@ -518,8 +824,26 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Handle berdasarkan waiting_for state
-    await process_document(update, context, waiting_for)
+    operation = get_operation(waiting_for)
+    if not operation or operation.input != 'document':
+        await update.message.reply_text("❌ State tidak dikenali. Gunakan /reset_conversions")
+        return
+    
+    # Tolak file yang tidak sesuai sebelum masuk antrian
+    document = update.message.document
+    if not operation.accepts(document.file_name):
+        await update.message.reply_text(f"❌ Format file tidak sesuai. Kirim file {' / '.join(operation.upload_extensions)}")
+        return
+    
+    file_size = document.file_size or 0
+    if file_size > operation.max_size:
+        await update.message.reply_text(
+            f"❌ File terlalu besar ({format_size(file_size)}). Maksimal {format_size(operation.max_size)}."
+        )
+        return
+    
+    heavy = operation.cpu_heavy or operation.is_batch(document.file_name) or file_size > SMALL_JOB_BYTES
+    await schedule_job(update, lambda: process_document(update, context, operation), heavy=heavy)
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler untuk photo upload"""
@@ -546,12 +870,14 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     waiting_for = context.user_data.get('waiting_for')
     text = update.message.text
     
-    if text == "/selesai":
-        await process_finish_command(update, context)
-        return
+    operation = get_operation(waiting_for)
     
-    if waiting_for:
-        await process_text_input(update, context, waiting_for, text)
+    if operation and operation.input == 'text' and operation.scheduled:
+        await schedule_job(update, lambda: process_text_input(update, context, operation, text), heavy=operation.cpu_heavy)
+    elif operation and operation.input == 'text':
+        await process_text_input(update, context, operation, text)
+    elif waiting_for:
+        await update.message.reply_text("❌ Input tidak dikenali. Gunakan /reset_conversions")
     else:
         await update.message.reply_text(
             "💬 Pesan diterima!\n"
@@ -559,6 +885,15 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             "Atau ketik /menu untuk melihat semua fitur."
         )
 
+async def selesai_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler untuk /selesai"""
+    if not await check_user_access(update.effective_user.id):
+        await update.message.reply_text("❌ Akses ditolak.")
+        return
+    
+    # Files were merged as they arrived, so finishing only uploads the result
+    await schedule_job(update, lambda: process_finish_command(update, context))
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log the error and send a telegram message to notify the developer."""
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
@@ -570,56 +905,118 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
         )
 
 # Helper functions untuk process handlers
-async def process_document(update: Update, context: ContextTypes.DEFAULT_TYPE, waiting_for: str):
-    """Process uploaded document based on waiting_for state"""
+@asynccontextmanager
+async def observe_operation(update: Update, context: ContextTypes.DEFAULT_TYPE, name: str, file_name: str = None, log: bool = True):
+    """Trace a file operation into metrics and file_operations, with live progress,
+    profiling it when the owner armed /profile; outputs are compressed per /kompres"""
+    compression = get_user_preference(update.effective_user.id, 'compression')
+    async with profile_operation(context, update.effective_user.id, name):
+        with use_output_compression(compression):
+            async with track_progress(update) as progress:
+                try:
+                    with track_operation(name) as tracked:
+                        try:
+                            yield tracked
+                        except OperationCancelled:
+                            tracked['status'] = 'cancelled'
+                            raise
+                except OperationFailed:
+                    # Counted as failed by track_operation; the converter already replied
+                    pass
+                finally:
+                    if log:
+                        status = 'error' if tracked['failed'] else tracked.get('status', 'success')
+                        log_file_operation(update.effective_user.id, name, file_name, status, tracked)
+                
+                if not tracked['failed']:
+                    await progress.finish()
+
+async def run_with_result_cache(update: Update, context: ContextTypes.DEFAULT_TYPE, cache_key: str, job):
+    """Serve a job from the result cache, or run it and cache the documents it sends
+
+    Returns 'cached', or the job's status. Only a job that returns None is
+    cached: a failed job raises, and a ZIP with failed members returns
+    'partial' so uploading it again retries them.
+    """
+    if cache_key and await send_cached_result(update, cache_key):
+        await cleanup_temp_file(context.user_data.get('vcf_file'))
+        reset_user_data(context)
+        return 'cached'
+    
+    with collect_sent_messages() as sent:
+        status = await job()
+    
+    if cache_key and status is None and any('file_id' in entry for entry in sent):
+        store_result(cache_key, sent)
+    return status
+
+async def process_document(update: Update, context: ContextTypes.DEFAULT_TYPE, operation):
+    """Process uploaded document with the operation registered for its state"""
     document = update.message.document
     file_name = document.file_name
     
     try:
-        # Download file
-        file = await context.bot.get_file(document.file_id)
-        file_path = f"temp/{file_name}"
-        os.makedirs("temp", exist_ok=True)
-        await file.download_to_drive(file_path)
-        
-        if waiting_for == 'txt_to_vcf':
-            await convert_txt_to_vcf(update, context, file_path)
-        elif waiting_for == 'vcf_to_txt':
-            await convert_vcf_to_txt(update, context, file_path)
-        elif waiting_for == 'xlsx_to_vcf':
-            await convert_xlsx_to_vcf(update, context, file_path)
-        elif waiting_for == 'txt2vcf_auto':
-            await convert_txt2vcf_auto(update, context, file_path)
-        elif waiting_for == 'admin_file':
-            await process_admin_file(update, context, file_path)
-        elif waiting_for == 'rename_contact':
-            await rename_contact_in_vcf(update, context, file_path)
-        elif waiting_for == 'rename_file':
-            await rename_uploaded_file(update, context, file_path, file_name)
-        elif waiting_for == 'merge_txt':
-            context.user_data['txt_files'].append(file_path)
-            await update.message.reply_text(f"✅ File {file_name} ditambahkan. Kirim file lain atau /selesai")
-        elif waiting_for == 'merge_vcf':
-            context.user_data['vcf_files'].append(file_path)
-            await update.message.reply_text(f"✅ File {file_name} ditambahkan. Kirim file lain atau /selesai")
-        elif waiting_for == 'split_file':
-            await split_vcf_file(update, context, file_path)
-        elif waiting_for == 'split_contact':
-            await split_vcf_by_contact(update, context, file_path)
-        elif waiting_for == 'add_contact':
-            context.user_data['vcf_file'] = file_path
-            await update.message.reply_text("📇 File VCF diterima. Sekarang kirim data kontak baru dengan format: Nama|Nomor")
-        elif waiting_for == 'delete_contact':
-            await delete_contact_from_vcf(update, context, file_path)
-        elif waiting_for == 'count_contact':
-            await count_contacts_in_vcf(update, context, file_path)
-        else:
-            await update.message.reply_text("❌ State tidak dikenali. Gunakan /reset_conversions")
+        async with observe_operation(update, context, operation.name, file_name) as tracked:
+            tracked['status'] = await run_document_operation(update, context, operation)
         
     except Exception as e:
         logger.error(f"Error processing document: {e}")
         await update.message.reply_text(f"❌ Error memproses file: {str(e)}")
+
+def compression_params() -> tuple:
+    """Cache key parameters for the current /kompres choice; uncompressed keys stay as before"""
+    compression = get_output_compression()
+    return (compression,) if compression else ()
+
+async def run_document_operation(update: Update, context: ContextTypes.DEFAULT_TYPE, operation) -> str:
+    """Serve the document from the result cache or process it; returns the status to log"""
+    document = update.message.document
+    
+    # Same input and operation as before: re-send by file_id, no download
+    if operation.cacheable:
+        # A ZIP's result also depends on whether its outputs are merged
+        params = ('gabung',) if operation.is_batch(document.file_name) and context.user_data.get('batch_merge') else ()
+        cache_key = make_cache_key(document.file_unique_id, operation.name, *params, *compression_params())
+        status = await run_with_result_cache(update, context, cache_key, lambda: process_uploaded_document(update, context, operation))
+    else:
+        status = await process_uploaded_document(update, context, operation)
+    
+    return status or 'success'
+
+async def process_uploaded_document(update: Update, context: ContextTypes.DEFAULT_TYPE, operation):
+    """Download the uploaded document into a workspace and run the operation on it; returns its status"""
+    document = update.message.document
+    is_batch = operation.is_batch(document.file_name)
+    
+    # Warn before doing the work if the result will exceed the upload limit; ZIP results go out compressed
+    if not is_batch:
+        await warn_if_output_too_large(update, document.file_size or 0, operation.output_ratio)
+    
+    # One-shot jobs get their own workspace; multi-step sessions keep theirs across updates
+    if operation.one_shot:
+        workspace = create_workspace(update.effective_user.id)
+    else:
+        workspace = get_session_workspace(update, context)
+    
+    try:
+        # Download file; small one-shot inputs stay in memory, the rest spool to disk.
+        # ZIPs always go to disk, batch workers open the archive by path
+        with stage('download'):
+            file = await context.bot.get_file(document.file_id)
+            in_memory = operation.in_memory and not is_batch
+            file_path = await download_input(file, document.file_name, document.file_size, in_memory, workspace)
+        add_bytes('in', document.file_size or 0)
         
+        # Multi-step operations key their cache entry on the uploaded file
+        context.user_data['file_unique_id'] = document.file_unique_id
+        
+        if is_batch:
+            return await process_zip_batch(update, context, file_path, operation)
+        return await operation.handler(update, context, file_path)
+    finally:
+        if operation.one_shot:
+            remove_workspace(workspace)
+
 async def process_group_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process group photo for rekap"""
     await update.message.reply_text(
@@ -628,46 +1025,83 @@ async def process_group_photo(update: Update, context: ContextTypes.DEFAULT_TYPE
         "Saat ini bot fokus pada konversi dan manajemen file.\n\n"
         "Silakan gunakan fitur lain yang tersedia! 😊"
     )
-    context.user_data.clear()
+    reset_user_data(context)
 
 async def process_finish_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process /selesai command for merging files"""
     waiting_for = context.user_data.get('waiting_for')
     
-    if waiting_for == 'merge_txt':
-        files = context.user_data.get('txt_files', [])
-        if files:
-            await merge_txt_files(update, context, files)
-        else:
-            await update.message.reply_text("❌ Tidak ada file TXT untuk digabung.")
-    elif waiting_for == 'merge_vcf':
-        files = context.user_data.get('vcf_files', [])
-        if files:
-            await merge_vcf_files(update, context, files)
-        else:
-            await update.message.reply_text("❌ Tidak ada file VCF untuk digabung.")
+    if waiting_for in ('merge_txt', 'merge_vcf'):
+        output_file = context.user_data.get('merge_output')
+        if output_file and os.path.exists(output_file):
+            await warn_if_output_too_large(update, os.path.getsize(output_file), get_operation(waiting_for).output_ratio)
+        async with observe_operation(update, context, waiting_for):
+            await send_merge_result(update, context)
     else:
         await update.message.reply_text("❌ Tidak ada operasi yang sedang berlangsung.")
     
-    context.user_data.clear()
-
-async def process_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE, waiting_for: str, text: str):
-    """Process text input based on waiting_for state"""
-    if waiting_for == 'message_to_txt':
-        await save_message_to_txt(update, context, text)
-    elif waiting_for == 'bug_report':
-        await process_bug_report(update, context, text)
-    elif waiting_for == 'add_user':
-        await process_add_user(update, context, text)
-    elif waiting_for == 'delete_user':
-        await process_delete_user(update, context, text)
-    elif waiting_for == 'new_contact_data':
-        await add_contact_to_vcf(update, context, text)
-    elif waiting_for == 'new_file_name':
-        await process_rename_file(update, context, text)
-    elif waiting_for == 'split_parts':
-        await process_split_parts(update, context, text)
-    elif waiting_for == 'contacts_per_file':
-        await process_contacts_per_file(update, context, text)
-    else:
-        await update.message.reply_text("❌ Input tidak dikenali. Gunakan /reset_conversions")
+    reset_user_data(context)
+
+async def process_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE, operation, text: str):
+    """Process text input with the operation registered for its state"""
+    # Only scheduled steps do file work worth logging; bug reports and user admin are not file operations
+    async with observe_operation(update, context, operation.name, log=operation.scheduled):
+        await run_text_operation(update, context, operation, text)
+
+async def run_text_operation(update: Update, context: ContextTypes.DEFAULT_TYPE, operation, text: str):
+    """Run a text step, serving numeric split requests from the result cache"""
+    if not operation.cacheable:
+        await operation.handler(update, context, text)
+        return
+    
+    # Same file processed with the same number as before: re-send the cached result
+    source_id = context.user_data.get('file_unique_id')
+    cache_key = None
+    if source_id and text.strip().isdigit():
+        cache_key = make_cache_key(source_id, operation.name, int(text.strip()), *compression_params())
+    
+    await run_with_result_cache(update, context, cache_key, lambda: operation.handler(update, context, text))
+
+# Daftar command: (command, handler, deskripsi menu); tanpa deskripsi tidak tampil di menu
+COMMANDS = [
+    ("start", start_command, "Mulai menggunakan bot"),
+    ("help", help_command, "Tampilkan bantuan"),
+    ("menu", menu_command, "Tampilkan semua menu"),
+    
+    # File Conversion
+    ("rekapgroup", rekap_group_command, "Rekap nama grup dan jumlah member"),
+    ("cv_txt_to_vcf", cv_txt_to_vcf_command, "Convert TXT ke VCF"),
+    ("cv_vcf_to_txt", cv_vcf_to_txt_command, "Convert VCF ke TXT"),
+    ("cv_xlsx_to_vcf", cv_xlsx_to_vcf_command, "Convert XLSX ke VCF"),
+    ("txt2vcf", txt2vcf_command, "Convert TXT ke VCF otomatis"),
+    ("cvadminfile", cv_admin_file_command, "Kelola file admin"),
+    
+    # File Management
+    ("renamectc", rename_ctc_command, "Ganti nama kontak VCF"),
+    ("renamefile", rename_file_command, "Ganti nama file"),
+    ("gabungtxt", gabung_txt_command, "Gabung file TXT"),
+    ("gabungvcf", gabung_vcf_command, "Gabung file VCF"),
+    ("selesai", selesai_command, None),
+    ("pecahfile", pecah_file_command, "Pecah file VCF"),
+    ("pecahctc", pecah_ctc_command, "Pecah VCF sesuai jumlah kontak"),
+    ("addctc", add_ctc_command, "Tambah kontak ke VCF"),
+    ("delctc", del_ctc_command, "Hapus kontak dari VCF"),
+    ("hitungctc", hitung_ctc_command, "Hitung total kontak VCF"),
+    ("totxt", to_txt_command, "Simpan pesan ke TXT"),
+    ("listgc", list_gc_command, "Buat list group"),
+    
+    # Other Menu
+    ("batal", batal_command, "Batalkan proses yang berjalan"),
+    ("kompres", kompres_command, "Kompres file hasil (gz/zip)"),
+    ("reset_conversions", reset_conversions_command, "Reset duplikat respon"),
+    ("fixbug", fix_bug_command, "Perbaiki bug menyeluruh"),
+    ("laporkanbug", laporkan_bug_command, "Laporkan bug"),
+    ("stats", stats_command, "Statistik penggunaan"),
+    
+    # Owner Menu
+    ("adduser", add_user_command, "Tambah pengguna"),
+    ("deluser", del_user_command, "Hapus akses pengguna"),
+    ("totaluser", total_user_command, "Lihat jumlah pengguna"),
+    ("metrics", metrics_command, "Metrics bot"),
+    ("profile", profile_command, "Profil operasi berikutnya"),
+]
@@ -0,0 +1,165 @@
+"""
+Periodic cleanup of temp/ with a file TTL and a total byte budget
+"""
+
+import os
+import time
+import asyncio
+import logging
+from utils.helpers import TEMP_DIR, format_size
+from bot.workspace import WORKSPACE_ROOT
+from bot.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Files older than this are evicted (seconds)
+TEMP_FILE_TTL = int(os.environ.get('TEMP_FILE_TTL', str(6 * 60 * 60)))
+
+# Maximum total size of temp/ before oldest files are evicted (bytes)
+TEMP_DIR_BUDGET = int(os.environ.get('TEMP_DIR_BUDGET', str(1024 * 1024 * 1024)))
+
+# Empty workspaces younger than this may be about to receive a download (seconds)
+EMPTY_WORKSPACE_GRACE = 60
+
+# How often the janitor runs (seconds)
+JANITOR_INTERVAL = int(os.environ.get('JANITOR_INTERVAL', '600'))
+
+def workspace_owner(name: str):
+    """User ID a workspace directory was created for, from its "<user_id>_<id>" name"""
+    try:
+        return int(name.split('_', 1)[0])
+    except ValueError:
+        return None
+
+def sweep_temp_dir(ttl: int = None, budget: int = None, busy_users=(), sessions=()) -> dict:
+    """Evict expired files, then oldest files until under budget; returns what was reclaimed
+
+    Workspaces of users with a running job (busy_users) are left alone, and live
+    session workspaces (sessions) only lose expired files, so the budget never
+    evicts an input or output that a job is still using.
+    """
+    ttl = TEMP_FILE_TTL if ttl is None else ttl
+    budget = TEMP_DIR_BUDGET if budget is None else budget
+    busy_users = set(busy_users)
+    sessions = {os.path.normpath(path) for path in sessions if path}
+    result = {'files': 0, 'bytes': 0, 'remaining_bytes': 0}
+
+    if not os.path.isdir(TEMP_DIR):
+        return result
+
+    files = []
+    for root, _, names in os.walk(TEMP_DIR):
+        # Files inside a workspace share whether it is busy or a live session
+        busy, in_session = False, False
+        if os.path.dirname(root) == WORKSPACE_ROOT:
+            busy = workspace_owner(os.path.basename(root)) in busy_users
+            in_session = os.path.normpath(root) in sessions
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path, busy, in_session))
+
+    now = time.time()
+    total = sum(size for _, size, _, _, _ in files)
+    files.sort()
+
+    for mtime, size, path, busy, in_session in files:
+        expired = now - mtime > ttl
+        if not expired and total <= budget:
+            # Sorted oldest first, so nothing newer is expired either
+            break
+        if busy or (in_session and not expired):
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Janitor could not remove {path}: {e}")
+            continue
+        total -= size
+        result['files'] += 1
+        result['bytes'] += size
+
+    # Drop workspaces that are now empty
+    if os.path.isdir(WORKSPACE_ROOT):
+        for name in os.listdir(WORKSPACE_ROOT):
+            path = os.path.join(WORKSPACE_ROOT, name)
+            try:
+                if workspace_owner(name) in busy_users:
+                    continue
+                if not os.listdir(path) and now - os.path.getctime(path) > EMPTY_WORKSPACE_GRACE:
+                    os.rmdir(path)
+            except OSError:
+                continue
+
+    result['remaining_bytes'] = total
+    return result
+
+def prune_abandoned_sessions(user_data: dict) -> tuple:
+    """Find sessions whose workspace is gone and forget merge files the janitor removed
+
+    Returns (abandoned, changed): user ids whose session should be dropped, and user ids
+    whose user_data was edited here and must be written back to the persistence.
+    """
+    abandoned, changed = [], []
+    for user_id, data in user_data.items():
+        workspace = data.get('workspace')
+        if workspace and not os.path.isdir(workspace):
+            abandoned.append(user_id)
+            continue
+
+        # A swept merge output loses the files merged so far
+        merge_output = data.get('merge_output')
+        if merge_output and not os.path.exists(merge_output):
+            for key in ('merge_output', 'merge_files', 'merge_items'):
+                data.pop(key, None)
+            changed.append(user_id)
+
+    return abandoned, changed
+
+async def run_janitor(application=None) -> dict:
+    """Sweep temp/ off the event loop and prune sessions pointing at removed files"""
+    sessions = [data.get('workspace') for data in application.user_data.values()] if application is not None else []
+    result = await asyncio.to_thread(sweep_temp_dir, None, None, scheduler.running_users, sessions)
+
+    if application is not None:
+        abandoned, changed = prune_abandoned_sessions(application.user_data)
+        # Edits to other users' user_data are only persisted for users the Application knows changed
+        for user_id in abandoned:
+            application.drop_user_data(user_id)
+        if changed:
+            application.mark_data_for_update_persistence(user_ids=changed)
+        result['sessions'] = len(abandoned)
+
+    if result['files'] or result.get('sessions'):
+        logger.info(
+            f"Janitor reclaimed {format_size(result['bytes'])} from {result['files']} files, "
+            f"reset {result.get('sessions', 0)} abandoned sessions, "
+            f"{format_size(result['remaining_bytes'])} still in {TEMP_DIR}/"
+        )
+    return result
+
+async def janitor_job(context):
+    """JobQueue callback"""
+    try:
+        await run_janitor(context.application)
+    except Exception as e:
+        logger.error(f"Error running janitor: {e}")
+
+async def _janitor_loop(application):
+    while True:
+        await asyncio.sleep(JANITOR_INTERVAL)
+        try:
+            await run_janitor(application)
+        except Exception as e:
+            logger.error(f"Error running janitor: {e}")
+
+def schedule_janitor(application):
+    """Run the janitor periodically via JobQueue, or a plain task without the job-queue extra"""
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(janitor_job, interval=JANITOR_INTERVAL, first=JANITOR_INTERVAL, name='janitor')
+    else:
+        logger.warning("JobQueue tidak tersedia (pip install \"python-telegram-bot[job-queue]\"), janitor memakai task biasa")
+        application.create_task(_janitor_loop(application))
@@ -0,0 +1,287 @@
+"""
+In-process metrics with a Prometheus text endpoint
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Local scrape endpoint; METRICS_PORT=0 disables it
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9464'))
+
+# Latency buckets in seconds, from quick commands to 1M-contact conversions
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_metrics = []
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+class Counter:
+    """Monotonic counter per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def items(self) -> list:
+        with _lock:
+            return list(self._values.items())
+
+    def render(self) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.items()]
+
+class Histogram:
+    """Cumulative bucket histogram per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with _lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def items(self) -> list:
+        with _lock:
+            return [(key, list(data)) for key, data in self._values.items()]
+
+    def percentile(self, percentile: float, **labels) -> float:
+        """Estimate a percentile as the upper bound of the bucket it falls in"""
+        data = self._values.get(tuple(labels.get(name, '') for name in self.labelnames))
+        if not data or not data[-1]:
+            return 0.0
+        target = data[-1] * percentile / 100
+        for i, bound in enumerate(self.buckets):
+            if data[i] >= target:
+                return bound
+        return float('inf')
+
+    def render(self) -> list:
+        lines = []
+        for key, data in self.items():
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), key + (bound,))} {data[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), key + ('+Inf',))} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {data[-1]}")
+        return lines
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        _metrics.append(self)
+
+    def render(self) -> list:
+        try:
+            return [f"{self.name} {self.callback()}"]
+        except Exception as e:
+            logger.warning(f"Error reading gauge {self.name}: {e}")
+            return []
+
+def register_gauge(name: str, help_text: str, callback) -> Gauge:
+    """Expose a value owned by another module, e.g. the scheduler's queue depth"""
+    return Gauge(name, help_text, callback)
+
+REQUESTS = Counter('bot_requests_total', "Updates handled per command or message type", ('command',))
+REQUEST_ERRORS = Counter('bot_request_errors_total', "Updates whose handler raised", ('command',))
+REQUEST_LATENCY = Histogram('bot_request_duration_seconds', "End-to-end handler time including queueing", ('command',))
+OPERATIONS = Counter('bot_operations_total', "File operations run", ('operation',))
+OPERATION_ERRORS = Counter('bot_operation_errors_total', "File operations that raised or reported a failure", ('operation',))
+OPERATION_LATENCY = Histogram('bot_operation_duration_seconds', "File operation time after admission", ('operation',))
+STAGE_LATENCY = Histogram('bot_stage_duration_seconds', "Time per stage of a file operation", ('operation', 'stage'))
+BYTES = Counter('bot_bytes_total', "Bytes downloaded from and uploaded to users", ('operation', 'direction'))
+
+class OperationFailed(Exception):
+    """Raised by a converter once it has told the user why it failed
+
+    track_operation counts it as a failed operation; observe_operation then
+    swallows it, since the user already has the "❌" reply.
+    """
+
+# Operation being handled in this task (or its run_blocking threads), with its error flag
+_current_operation = contextvars.ContextVar('current_operation', default=None)
+
+@contextmanager
+def track_operation(name: str):
+    """Count and time a file operation; stages and errors inside are attributed to it
+
+    The yielded state is the operation's span: stage timings, bytes and contacts
+    are accumulated into it and 'duration' is set on exit.
+    """
+    state = {
+        'name': name,
+        'failed': False,
+        'duration': 0.0,
+        'stages': {},
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'contacts': 0,
+    }
+    token = _current_operation.set(state)
+    start = time.perf_counter()
+    OPERATIONS.inc(operation=name)
+    try:
+        yield state
+    except Exception:
+        state['failed'] = True
+        raise
+    finally:
+        _current_operation.reset(token)
+        state['duration'] = time.perf_counter() - start
+        OPERATION_LATENCY.observe(state['duration'], operation=name)
+        if state['failed']:
+            OPERATION_ERRORS.inc(operation=name)
+
+def current_operation() -> str:
+    state = _current_operation.get()
+    return state['name'] if state else 'none'
+
+@contextmanager
+def stage(name: str):
+    """Time one stage (download, parse, transform, write, upload) of the current operation"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, operation=current_operation(), stage=name)
+        state = _current_operation.get()
+        if state is not None:
+            state['stages'][name] = state['stages'].get(name, 0.0) + elapsed
+
+def add_bytes(direction: str, amount: int):
+    """Count bytes in ('in') or out ('out') for the current operation"""
+    if amount:
+        BYTES.inc(amount, operation=current_operation(), direction=direction)
+        state = _current_operation.get()
+        if state is not None:
+            state[f"bytes_{direction}"] += amount
+
+def add_contacts(count: int):
+    """Record how many contacts the current operation processed"""
+    state = _current_operation.get()
+    if state is not None and count:
+        state['contacts'] += count
+
+# run_blocking helpers are classified into stages by name
+STAGE_PREFIXES = (
+    ('parse_', 'parse'),
+    ('read_', 'parse'),
+    ('analyze_', 'parse'),
+    ('write_', 'write'),
+    ('merge_', 'write'),
+)
+
+def stage_for(func) -> str:
+    name = getattr(func, '__name__', '')
+    for prefix, stage_name in STAGE_PREFIXES:
+        if name.startswith(prefix):
+            return stage_name
+    return 'transform'
+
+def instrument(command: str, callback):
+    """Wrap a handler callback with request count, error count and latency"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        REQUESTS.inc(command=command)
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            REQUEST_ERRORS.inc(command=command)
+            raise
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, command=command)
+    return wrapper
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+async def _handle_scrape(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Drain headers
+        while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+            pass
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', render_metrics().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'not found\n'
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logger.debug(f"Metrics scrape aborted: {e}")
+    finally:
+        writer.close()
+
+async def start_metrics_server():
+    """Serve /metrics on METRICS_HOST:METRICS_PORT; returns the server, or None when disabled"""
+    if not METRICS_PORT:
+        return None
+    try:
+        server = await asyncio.start_server(_handle_scrape, METRICS_HOST, METRICS_PORT)
+    except OSError as e:
+        logger.error(f"Metrics endpoint tidak bisa dijalankan di {METRICS_HOST}:{METRICS_PORT}: {e}")
+        return None
+    logger.info(f"Metrics tersedia di http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return server
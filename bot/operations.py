@@ -0,0 +1,106 @@
+"""
+Registry of conversation states and the operations that handle them
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional
+from bot.user_manager import process_add_user, process_delete_user
+from bot.file_converters import (
+    convert_txt_to_vcf, convert_vcf_to_txt, convert_xlsx_to_vcf, convert_txt2vcf_auto, process_admin_file,
+    batch_txt_to_vcf, batch_vcf_to_txt, batch_xlsx_to_vcf, batch_txt2vcf_auto
+)
+from bot.file_managers import (
+    rename_contact_in_vcf, rename_uploaded_file, process_rename_file, add_file_to_merge,
+    split_vcf_file, process_split_parts, split_vcf_by_contact, process_contacts_per_file,
+    save_message_to_txt, process_bug_report
+)
+from bot.contact_utils import (
+    count_contacts_in_vcf, receive_vcf_for_new_contact, add_contact_to_vcf,
+    delete_contact_from_vcf, process_delete_contact, process_rename_contact
+)
+
+# Largest upload accepted; the public Bot API cannot download files above 20 MB
+MAX_INPUT_SIZE = int(os.environ.get('MAX_INPUT_SIZE', str(20 * 1024 * 1024)))
+
+@dataclass(frozen=True)
+class Operation:
+    """A waiting_for state and how its input is handled
+
+    handler is called as handler(update, context, file_path) for document
+    operations and handler(update, context, text) for text operations.
+    Cacheable text operations are keyed on the uploaded file and the number sent.
+    Operations with a batch converter also accept a ZIP of their input files.
+    """
+    name: str
+    handler: Callable
+    input: str = 'document'
+    extensions: tuple = ()  # Allowed upload extensions, empty for any file
+    max_size: int = MAX_INPUT_SIZE
+    cpu_heavy: bool = False  # Always scheduled as a heavy job
+    scheduled: bool = True  # Text operations that do not touch files skip the scheduler
+    cacheable: bool = False  # Result depends only on the input file and parameters
+    in_memory: bool = False  # Converter accepts an in-memory buffer instead of a path
+    one_shot: bool = False  # Finishes within one update and gets a throwaway workspace
+    output_ratio: Optional[float] = None  # Rough output/input size, to warn before doing the work
+    batch: Optional[Callable] = None  # Converts one ZIP member in a worker process, see bot.batch
+
+    @property
+    def upload_extensions(self) -> tuple:
+        return self.extensions + ('.zip',) if self.batch else self.extensions
+
+    def accepts(self, file_name: str) -> bool:
+        """Check the upload's extension against the allowed ones"""
+        if not self.extensions:
+            return True
+        return os.path.splitext(file_name or '')[1].lower() in self.upload_extensions
+
+    def is_batch(self, file_name: str) -> bool:
+        """Whether the upload is a ZIP to be converted member by member"""
+        return self.batch is not None and os.path.splitext(file_name or '')[1].lower() == '.zip'
+
+OPERATIONS = {}
+
+def register(operation: Operation) -> Operation:
+    """Add an operation to the registry under its state name"""
+    if operation.name in OPERATIONS:
+        raise ValueError(f"Operation {operation.name!r} is already registered")
+    OPERATIONS[operation.name] = operation
+    return operation
+
+def get_operation(name: str) -> Optional[Operation]:
+    """Get the operation for a waiting_for state, or None"""
+    return OPERATIONS.get(name)
+
+# Upload steps
+register(Operation('txt_to_vcf', convert_txt_to_vcf, extensions=('.txt',),
+                   cacheable=True, in_memory=True, one_shot=True, output_ratio=3.0, batch=batch_txt_to_vcf))
+register(Operation('vcf_to_txt', convert_vcf_to_txt, extensions=('.vcf',),
+                   cacheable=True, in_memory=True, one_shot=True, output_ratio=0.4, batch=batch_vcf_to_txt))
+register(Operation('xlsx_to_vcf', convert_xlsx_to_vcf, extensions=('.xlsx',), cpu_heavy=True,
+                   cacheable=True, in_memory=True, one_shot=True, output_ratio=8.0, batch=batch_xlsx_to_vcf))
+register(Operation('txt2vcf_auto', convert_txt2vcf_auto, extensions=('.txt', '.csv'),
+                   cacheable=True, in_memory=True, one_shot=True, output_ratio=3.2, batch=batch_txt2vcf_auto))
+register(Operation('count_contact', count_contacts_in_vcf, extensions=('.vcf',),
+                   in_memory=True, one_shot=True))
+register(Operation('admin_file', process_admin_file, one_shot=True))
+register(Operation('rename_contact', rename_contact_in_vcf, extensions=('.vcf',)))
+register(Operation('rename_file', rename_uploaded_file))
+register(Operation('merge_txt', add_file_to_merge, extensions=('.txt',), output_ratio=1.0))
+register(Operation('merge_vcf', add_file_to_merge, extensions=('.vcf',), output_ratio=1.0))
+register(Operation('split_file', split_vcf_file, extensions=('.vcf',)))
+register(Operation('split_contact', split_vcf_by_contact, extensions=('.vcf',)))
+register(Operation('add_contact', receive_vcf_for_new_contact, extensions=('.vcf',)))
+register(Operation('delete_contact', delete_contact_from_vcf, extensions=('.vcf',)))
+
+# Text steps
+register(Operation('split_parts', process_split_parts, input='text', cpu_heavy=True, cacheable=True))
+register(Operation('contacts_per_file', process_contacts_per_file, input='text', cpu_heavy=True, cacheable=True))
+register(Operation('new_contact_data', add_contact_to_vcf, input='text'))
+register(Operation('new_contact_name', process_rename_contact, input='text'))
+register(Operation('delete_contact_index', process_delete_contact, input='text'))
+register(Operation('new_file_name', process_rename_file, input='text'))
+register(Operation('message_to_txt', save_message_to_txt, input='text'))
+register(Operation('bug_report', process_bug_report, input='text', scheduled=False))
+register(Operation('add_user', process_add_user, input='text', scheduled=False))
+register(Operation('delete_user', process_delete_user, input='text', scheduled=False))
@@ -0,0 +1,130 @@
+"""
+SQLite-backed persistence for conversation state in user_data
+"""
+
+import os
+import json
+import asyncio
+import logging
+from telegram.ext import BasePersistence, PersistenceInput
+from bot.database import load_conversation_state, save_conversation_state, delete_conversation_state
+
+logger = logging.getLogger(__name__)
+
+# How often the Application hands changed user_data to the persistence (seconds)
+PERSISTENCE_INTERVAL = float(os.environ.get('PERSISTENCE_INTERVAL', '10'))
+
+# Changes arriving within this window are written in one transaction (seconds)
+FLUSH_DELAY = 0.5
+
+class SQLitePersistence(BasePersistence):
+    """Persist user_data into bot_database.db, one JSON row per (user, key), writing only changed keys
+
+    Only small values belong in user_data: file paths, counts and indices, never file contents.
+    Values that are not JSON serializable are skipped with a warning.
+    """
+
+    def __init__(self, update_interval: float = PERSISTENCE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._snapshots = {}  # user_id -> {key: json} as last written
+        self._pending = {}  # (user_id, key) -> json, or None to delete
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def get_user_data(self) -> dict:
+        rows = await asyncio.to_thread(load_conversation_state)
+        user_data = {}
+        for user_id, key, value in rows:
+            self._snapshots.setdefault(user_id, {})[key] = value
+            user_data.setdefault(user_id, {})[key] = json.loads(value)
+        logger.info(f"Loaded conversation state for {len(user_data)} users")
+        return user_data
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        snapshot = self._snapshots.setdefault(user_id, {})
+
+        for key, value in data.items():
+            try:
+                encoded = json.dumps(value, sort_keys=True)
+            except (TypeError, ValueError):
+                logger.warning(f"Not persisting user_data[{key!r}] of user {user_id}: not JSON serializable")
+                continue
+            if snapshot.get(key) != encoded:
+                snapshot[key] = encoded
+                self._pending[(user_id, key)] = encoded
+
+        for key in [key for key in snapshot if key not in data]:
+            del snapshot[key]
+            self._pending[(user_id, key)] = None
+
+        if self._pending and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._snapshots.pop(user_id, None)
+        for pending_key in [pending_key for pending_key in self._pending if pending_key[0] == user_id]:
+            del self._pending[pending_key]
+        await asyncio.to_thread(delete_conversation_state, user_id)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._write_pending()
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(FLUSH_DELAY)
+            self._flush_task = None
+            await self._write_pending()
+        except asyncio.CancelledError:
+            pass
+
+    async def _write_pending(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            changes = [(user_id, key, value) for (user_id, key), value in self._pending.items()]
+            self._pending = {}
+            await asyncio.to_thread(save_conversation_state, changes)
+
+    # Only user_data is persisted
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
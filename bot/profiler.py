@@ -0,0 +1,160 @@
+"""
+On-demand cProfile of the next operations, armed by the owner with /profile
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import contextvars
+from contextlib import asynccontextmanager
+from bot.workspace import job_workspace
+
+logger = logging.getLogger(__name__)
+
+# Functions listed in the TXT report
+PROFILE_TOP_FUNCTIONS = 40
+
+# {'owner_id', 'remaining', 'user_id', 'operation'} while armed, else None
+_armed = None
+
+# Profiling session of the operation running in this task, seen by run_blocking threads
+_session = contextvars.ContextVar('profile_session', default=None)
+
+# Only one event-loop profile can be enabled at a time
+_loop_profile_active = False
+
+# From Python 3.12 cProfile runs on sys.monitoring: one profiler per process, and it
+# already records every thread, so run_blocking threads must not start their own
+PROFILE_SEES_THREADS = sys.version_info >= (3, 12)
+
+def arm(owner_id: int, count: int, user_id: int = None, operation: str = None):
+    """Profile the next count operations, optionally only of one user or operation"""
+    global _armed
+    _armed = {'owner_id': owner_id, 'remaining': count, 'user_id': user_id, 'operation': operation}
+
+def disarm():
+    global _armed
+    _armed = None
+
+def get_armed():
+    return dict(_armed) if _armed else None
+
+def _claim(user_id: int, operation: str):
+    """Take one profiling slot if this operation matches the armed filter; returns the owner to report to"""
+    global _armed
+    if _armed['user_id'] is not None and _armed['user_id'] != user_id:
+        return None
+    if _armed['operation'] is not None and _armed['operation'] != operation:
+        return None
+
+    _armed['remaining'] -= 1
+    owner_id = _armed['owner_id']
+    if _armed['remaining'] <= 0:
+        _armed = None
+    return owner_id
+
+@asynccontextmanager
+async def profile_operation(context, user_id: int, operation: str):
+    """Profile the block when armed for this user/operation and send the report to the owner
+
+    Costs one global check when not armed.
+    """
+    global _loop_profile_active
+    if _armed is None or _loop_profile_active:
+        yield
+        return
+
+    owner_id = _claim(user_id, operation)
+    if not owner_id:
+        yield
+        return
+
+    session = {
+        'owner_id': owner_id,
+        'user_id': user_id,
+        'operation': operation,
+        'loop_profile': cProfile.Profile(),
+        'thread_profiles': [],
+    }
+    try:
+        session['loop_profile'].enable()
+    except ValueError as e:
+        # Another profiler (e.g. a debugger) holds the process-wide slot
+        logger.warning(f"Profil {operation} dilewati: {e}")
+        yield
+        return
+
+    _loop_profile_active = True
+    token = _session.set(session)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        session['loop_profile'].disable()
+        session['duration'] = time.perf_counter() - start
+        _session.reset(token)
+        _loop_profile_active = False
+        try:
+            await send_profile_report(context, session)
+        except Exception as e:
+            logger.error(f"Error sending profile report: {e}")
+
+def profile_blocking(func):
+    """Wrap a run_blocking helper so it is profiled in its worker thread during a session
+
+    On Python 3.12+ the session's loop profile covers the thread and func is returned as is.
+    """
+    session = _session.get()
+    if session is None or PROFILE_SEES_THREADS:
+        return func
+
+    def profiled(*args):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            session['thread_profiles'].append(profile)
+
+    return profiled
+
+def build_report(session: dict):
+    """Merge event-loop and worker-thread profiles; returns (report text, Stats)"""
+    stats = pstats.Stats(session['loop_profile'])
+    for profile in session['thread_profiles']:
+        stats.add(profile)
+    threads = "tercakup profil utama" if PROFILE_SEES_THREADS else len(session['thread_profiles'])
+
+    buffer = io.StringIO()
+    buffer.write(
+        f"Operasi: {session['operation']}\n"
+        f"User ID: {session['user_id']}\n"
+        f"Durasi: {session['duration']:.3f} dtk\n"
+        f"Thread run_blocking: {threads}\n"
+        "Catatan: profil event loop juga mencakup update lain yang berjalan bersamaan\n\n"
+    )
+    stats.stream = buffer
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return buffer.getvalue(), stats
+
+async def send_profile_report(context, session: dict):
+    """Send the TXT report and the raw .pstats file to the owner who armed the profiler"""
+    report, stats = build_report(session)
+    name = f"profile_{session['operation']}_{session['user_id']}_{int(time.time())}"
+
+    with job_workspace(session['owner_id']) as workspace:
+        report_path = os.path.join(workspace, f"{name}.txt")
+        stats_path = os.path.join(workspace, f"{name}.pstats")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        stats.dump_stats(stats_path)
+
+        caption = f"🔬 Profil {session['operation']} ({session['duration']:.2f} dtk)"
+        for path in (report_path, stats_path):
+            with open(path, 'rb') as f:
+                await context.bot.send_document(
+                    chat_id=session['owner_id'], document=f, filename=os.path.basename(path), caption=caption
+                )
@@ -0,0 +1,142 @@
+"""
+Live progress of long jobs in a single, periodically edited status message
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between edits of the status message; Telegram throttles frequent edits
+PROGRESS_INTERVAL = float(os.environ.get('PROGRESS_INTERVAL', '3'))
+
+# Jobs that finish sooner never get a status message of their own
+PROGRESS_DELAY = float(os.environ.get('PROGRESS_DELAY', '2'))
+
+# Parsers report their position every this many lines or contacts
+PROGRESS_EVERY = 10000
+
+PROGRESS_BAR_WIDTH = 10
+
+# Reporter of the operation running in this task, seen by its run_blocking threads
+_reporter = contextvars.ContextVar('progress_reporter', default=None)
+
+class ProgressReporter:
+    """Progress of one operation; written from worker threads, rendered on the event loop"""
+
+    def __init__(self, update):
+        self.update = update
+        self.title = "🔄 Memproses..."
+        self.message = None
+        self.rendered = None
+        self.created = time.monotonic()
+        self.done = 0
+        self.total = 0
+        self.rows = 0
+        # Rates are measured from the first report of the current phase
+        self.phase_start = None
+        self.task = None
+
+    def report(self, done: int, total: int, rows: int = None):
+        if total != self.total or self.phase_start is None:
+            self.phase_start = (time.monotonic(), done, rows or 0)
+        self.done = done
+        self.total = total
+        if rows is not None:
+            self.rows = rows
+
+    def render(self) -> str:
+        fraction = min(self.done / self.total, 1.0) if self.total else 0.0
+        filled = int(fraction * PROGRESS_BAR_WIDTH)
+        lines = [self.title, "", f"{'▓' * filled}{'░' * (PROGRESS_BAR_WIDTH - filled)} {fraction:.0%}"]
+
+        started, done_start, rows_start = self.phase_start
+        elapsed = time.monotonic() - started
+        details = []
+        if elapsed > 0 and self.rows > rows_start:
+            details.append(f"⚡ {(self.rows - rows_start) / elapsed:,.0f} kontak/dtk")
+        if elapsed > 0 and self.done > done_start:
+            remaining = elapsed * (self.total - self.done) / (self.done - done_start)
+            details.append(f"⏳ sisa ~{remaining:.0f} dtk")
+        if details:
+            lines.append(" • ".join(details))
+        return "\n".join(lines)
+
+    async def set_status(self, text: str):
+        """Send the operation's status message; later progress edits this message"""
+        self.title = text
+        self.rendered = text
+        self.message = await self.update.message.reply_text(text)
+
+    async def refresh(self):
+        """Show the latest reported progress, sending a status message for jobs that run long"""
+        if not self.total:
+            return
+        if self.message is None:
+            if time.monotonic() - self.created < PROGRESS_DELAY:
+                return
+            await self.set_status(self.title)
+
+        text = self.render()
+        if text != self.rendered:
+            await self.message.edit_text(text)
+            self.rendered = text
+
+    async def finish(self):
+        """Replace the progress bar with the total time once the operation succeeded"""
+        if self.task:
+            self.task.cancel()
+        if self.message is None or not self.total:
+            return
+        text = f"{self.title}\n\n✅ Selesai dalam {time.monotonic() - self.created:.1f} dtk"
+        if self.rows:
+            text += f" • {self.rows:,} kontak"
+        try:
+            await self.message.edit_text(text)
+        except Exception as e:
+            logger.warning(f"Error finishing progress message: {e}")
+
+async def _refresh_periodically(reporter: ProgressReporter):
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        try:
+            await reporter.refresh()
+        except Exception as e:
+            # A missed edit (flood limit, deleted message) must not affect the job
+            logger.warning(f"Error updating progress message: {e}")
+
+@asynccontextmanager
+async def track_progress(update):
+    """Collect progress reports made within the block into one edited status message
+
+    Call reporter.finish() inside the block when the operation succeeded.
+    """
+    reporter = ProgressReporter(update)
+    token = _reporter.set(reporter)
+    reporter.task = asyncio.create_task(_refresh_periodically(reporter))
+    try:
+        yield reporter
+    finally:
+        reporter.task.cancel()
+        _reporter.reset(token)
+
+def report_progress(done: int, total: int, rows: int = None):
+    """Report done out of total units (bytes, files, parts) and rows processed so far
+
+    Safe to call from run_blocking threads; a no-op outside track_progress.
+    """
+    reporter = _reporter.get()
+    if reporter is not None:
+        reporter.report(done, total, rows)
+
+async def send_status(update, text: str):
+    """Send a status message that progress reports of the current operation will update"""
+    reporter = _reporter.get()
+    if reporter is None:
+        return await update.message.reply_text(text)
+    await reporter.set_status(text)
+    return reporter.message
@@ -0,0 +1,140 @@
+"""
+Outbound rate limiting for Bot API calls: token buckets per chat and global, RetryAfter retries
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import datetime
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from bot.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages per second overall, 1 per second per chat
+# (short bursts tolerated) and 20 per minute per group
+RATE_LIMIT_GLOBAL = float(os.environ.get('RATE_LIMIT_GLOBAL', '30'))
+RATE_LIMIT_PER_CHAT = float(os.environ.get('RATE_LIMIT_PER_CHAT', '1'))
+RATE_LIMIT_CHAT_BURST = int(os.environ.get('RATE_LIMIT_CHAT_BURST', '3'))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.environ.get('RATE_LIMIT_GROUP_PER_MINUTE', '20'))
+
+# Retries of a request answered with 429 RetryAfter
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get('RATE_LIMIT_MAX_RETRIES', '3'))
+
+# Extra random delay on top of retry_after, so queued sends do not all fire at once
+RETRY_JITTER = 1.0
+
+# Idle full chat buckets are dropped once there are more than this many
+MAX_CHAT_BUCKETS = 1000
+
+THROTTLE_DELAY = Histogram('bot_throttle_delay_seconds', "Time Bot API calls waited for the rate limiter", ('scope',))
+RATE_LIMIT_RETRIES = Counter('bot_rate_limit_retries_total', "Bot API calls retried after 429 RetryAfter", ('endpoint',))
+RATE_LIMIT_FAILURES = Counter('bot_rate_limit_failures_total', "Bot API calls still rate limited after all retries", ('endpoint',))
+
+class TokenBucket:
+    """Token bucket where callers reserve a token up front and sleep until it is due"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """Hold all further reservations for seconds, after a RetryAfter from Telegram"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def idle(self) -> bool:
+        now = time.monotonic()
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, datetime.timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Throttle every Bot API call globally and per chat, retrying 429 responses with jitter
+
+    rate_limit_args may be {'max_retries': n} to override the retry count of one call.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(RATE_LIMIT_GLOBAL, max(1, int(RATE_LIMIT_GLOBAL)))
+        self._chats = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+
+            # Group and channel ids are negative (or @username strings) and have a per-minute limit
+            is_group = isinstance(chat_id, str) or int(chat_id) < 0
+            if is_group:
+                bucket = TokenBucket(RATE_LIMIT_GROUP_PER_MINUTE / 60, RATE_LIMIT_CHAT_BURST)
+            else:
+                bucket = TokenBucket(RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id):
+        # Per chat first, so a busy chat does not hold global tokens while it waits
+        if chat_id is not None:
+            wait = self._chat_bucket(chat_id).reserve()
+            if wait > 0:
+                THROTTLE_DELAY.observe(wait, scope='chat')
+                await asyncio.sleep(wait)
+
+        wait = self._global.reserve()
+        if wait > 0:
+            THROTTLE_DELAY.observe(wait, scope='global')
+            await asyncio.sleep(wait)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        max_retries = RATE_LIMIT_MAX_RETRIES
+        if isinstance(rate_limit_args, dict):
+            max_retries = rate_limit_args.get('max_retries', max_retries)
+
+        for attempt in range(max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    RATE_LIMIT_FAILURES.inc(endpoint=endpoint)
+                    raise
+
+                delay = retry_after_seconds(e) + random.uniform(0, RETRY_JITTER)
+                logger.warning(f"{endpoint} dibatasi Telegram, mencoba lagi dalam {delay:.1f} dtk")
+                RATE_LIMIT_RETRIES.inc(endpoint=endpoint)
+                THROTTLE_DELAY.observe(delay, scope='retry_after')
+
+                # Everything else bound for this chat (or any chat) waits out the same window
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(delay)
+                else:
+                    self._global.block(delay)
+                await asyncio.sleep(delay)
@@ -0,0 +1,138 @@
+"""
+Conversion result cache keyed on input file and operation
+"""
+
+import os
+import json
+import time
+import logging
+from telegram import InputMediaDocument
+from bot.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached results before least recently used ones are evicted
+MAX_CACHE_ENTRIES = int(os.environ.get('RESULT_CACHE_ENTRIES', '5000'))
+
+# Hit/miss counters since startup
+_cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'stale': 0}
+
+def make_cache_key(source_id: str, operation: str, *params) -> str:
+    """Build cache key from file_unique_id (or content hash), operation and parameters"""
+    return ":".join([operation, source_id] + [str(param) for param in params])
+
+def get_cached_result(cache_key: str):
+    """Get cached sent messages for key and mark it recently used, or None"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT results FROM result_cache WHERE cache_key = ?", (cache_key,))
+        row = cursor.fetchone()
+
+        if row:
+            cursor.execute("UPDATE result_cache SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+            conn.commit()
+        conn.close()
+
+        if not row:
+            _cache_stats['misses'] += 1
+            return None
+
+        _cache_stats['hits'] += 1
+        return json.loads(row[0])
+
+    except Exception as e:
+        logger.error(f"Error reading result cache: {e}")
+        _cache_stats['misses'] += 1
+        return None
+
+def store_result(cache_key: str, results: list):
+    """Store sent messages for key and evict least recently used entries over the limit"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO result_cache (cache_key, results, created_date, last_used)
+            VALUES (?, ?, datetime('now'), ?)
+        ''', (cache_key, json.dumps(results), time.time()))
+
+        cursor.execute('''
+            DELETE FROM result_cache WHERE cache_key NOT IN (
+                SELECT cache_key FROM result_cache ORDER BY last_used DESC LIMIT ?
+            )
+        ''', (MAX_CACHE_ENTRIES,))
+
+        _cache_stats['stores'] += 1
+        _cache_stats['evictions'] += max(cursor.rowcount, 0)
+        conn.commit()
+        conn.close()
+
+    except Exception as e:
+        logger.error(f"Error storing result cache: {e}")
+
+def invalidate_result(cache_key: str):
+    """Drop a cache entry whose file_ids no longer work"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM result_cache WHERE cache_key = ?", (cache_key,))
+        conn.commit()
+        conn.close()
+
+    except Exception as e:
+        logger.error(f"Error invalidating result cache: {e}")
+
+def _batches(results: list) -> list:
+    """Split cached entries into single entries and runs sent as one media group"""
+    batches = []
+    for entry in results:
+        group = entry.get('group')
+        if group is not None and batches and batches[-1][0].get('group') == group:
+            batches[-1].append(entry)
+        else:
+            batches.append([entry])
+    return batches
+
+async def send_cached_result(update, cache_key: str) -> bool:
+    """Re-send a cached result by file_id; returns False on a miss or stale entry"""
+    results = get_cached_result(cache_key)
+    if not results:
+        return False
+
+    try:
+        await update.message.reply_text("⚡ File ini sudah pernah diproses, hasil dikirim ulang langsung.")
+        for batch in _batches(results):
+            entry = batch[0]
+            if len(batch) > 1:
+                await update.message.reply_media_group(media=[
+                    InputMediaDocument(media=item['file_id'], caption=item.get('caption')) for item in batch
+                ])
+            elif 'file_id' in entry:
+                await update.message.reply_document(document=entry['file_id'], caption=entry.get('caption'))
+            else:
+                await update.message.reply_text(entry['text'])
+        return True
+
+    except Exception as e:
+        logger.warning(f"Cached result {cache_key} could not be re-sent, recomputing: {e}")
+        _cache_stats['stale'] += 1
+        invalidate_result(cache_key)
+        return False
+
+def get_cache_stats() -> dict:
+    """Get cache counters, hit rate and current size"""
+    lookups = _cache_stats['hits'] + _cache_stats['misses']
+    stats = dict(_cache_stats)
+    stats['hit_rate'] = _cache_stats['hits'] / lookups if lookups else 0.0
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM result_cache")
+        stats['entries'] = cursor.fetchone()[0]
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error counting result cache: {e}")
+        stats['entries'] = 0
+
+    return stats
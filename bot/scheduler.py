@@ -0,0 +1,162 @@
+"""
+Job scheduler with fair queuing and concurrency caps
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from bot.metrics import register_gauge, stage, stage_for
+from bot.profiler import profile_blocking
+from bot.cancellation import check_cancelled, wait_cancellable
+
+logger = logging.getLogger(__name__)
+
+# Concurrency limits, tunable from environment
+MAX_CONCURRENT_JOBS = int(os.environ.get('MAX_CONCURRENT_JOBS', '4'))
+MAX_JOBS_PER_USER = int(os.environ.get('MAX_JOBS_PER_USER', '1'))
+
+# Jobs with inputs above this size count as heavy for latency reporting
+SMALL_JOB_BYTES = int(os.environ.get('SMALL_JOB_BYTES', str(1024 * 1024)))
+
+# Number of finished jobs kept for latency percentiles
+LATENCY_SAMPLE_SIZE = 1000
+
+class JobScheduler:
+    """Admit jobs under global and per-user caps, round-robin across users"""
+
+    def __init__(self, max_concurrent: int, max_per_user: int):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self._queues = OrderedDict()  # user_id -> deque of waiting tickets, in round-robin order
+        self._running = {}  # user_id -> number of running jobs
+        self._active = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    @property
+    def active_jobs(self) -> int:
+        return self._active
+
+    @property
+    def running_users(self) -> set:
+        return set(self._running)
+
+    @property
+    def queued_jobs(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def submit(self, user_id: int, job, on_queued=None, heavy: bool = False):
+        """Run job() once a slot is free and return its result
+
+        job is a zero-argument callable returning a coroutine. on_queued, if
+        given, is awaited with the queue position when the job has to wait.
+        """
+        enqueued_at = time.monotonic()
+        ticket = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_id, deque()).append(ticket)
+        self._dispatch()
+
+        try:
+            if not ticket.done():
+                if on_queued:
+                    try:
+                        await on_queued(self.queue_position(user_id, ticket))
+                    except Exception as e:
+                        logger.warning(f"Error notifying queued job for user {user_id}: {e}")
+                await ticket
+        except BaseException:
+            # Cancelled while waiting: drop the ticket, or give back the slot it was just granted
+            if ticket.done() and not ticket.cancelled():
+                self._release(user_id)
+            else:
+                self._discard(user_id, ticket)
+            raise
+
+        started_at = time.monotonic()
+        try:
+            return await job()
+        finally:
+            finished_at = time.monotonic()
+            self._latencies.append((heavy, started_at - enqueued_at, finished_at - enqueued_at))
+            self._release(user_id)
+
+    def queue_position(self, user_id: int, ticket) -> int:
+        """Estimate 1-based position of a waiting ticket under round-robin admission"""
+        queue = self._queues.get(user_id)
+        if not queue or ticket not in queue:
+            return 0
+
+        index = list(queue).index(ticket)
+        ahead = index
+        for other_id, other_queue in self._queues.items():
+            if other_id != user_id:
+                ahead += min(len(other_queue), index + 1)
+        return ahead + 1
+
+    def latency_percentile(self, percentile: float, heavy: bool = None) -> float:
+        """Get end-to-end latency percentile in seconds, optionally only small or heavy jobs"""
+        samples = sorted(total for is_heavy, _, total in self._latencies if heavy is None or is_heavy == heavy)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def get_stats(self) -> dict:
+        """Get a snapshot of scheduler load and latency"""
+        return {
+            'active': self._active,
+            'queued': self.queued_jobs,
+            'users_waiting': len(self._queues),
+            'p95_small': self.latency_percentile(95, heavy=False),
+            'p95_heavy': self.latency_percentile(95, heavy=True),
+            'p95_all': self.latency_percentile(95),
+        }
+
+    def _dispatch(self):
+        """Grant free slots to waiting users in round-robin order"""
+        while self._active < self.max_concurrent:
+            for user_id, queue in self._queues.items():
+                if self._running.get(user_id, 0) < self.max_per_user:
+                    break
+            else:
+                return
+
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+
+            self._active += 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            ticket.set_result(None)
+
+    def _release(self, user_id: int):
+        self._active -= 1
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._dispatch()
+
+    def _discard(self, user_id: int, ticket):
+        queue = self._queues.get(user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[user_id]
+
+scheduler = JobScheduler(MAX_CONCURRENT_JOBS, MAX_JOBS_PER_USER)
+
+register_gauge('bot_queue_depth', "Jobs waiting for a scheduler slot", lambda: scheduler.queued_jobs)
+register_gauge('bot_active_jobs', "Jobs currently running", lambda: scheduler.active_jobs)
+
+async def run_blocking(func, *args):
+    """Run CPU-bound or blocking file work off the event loop, timed as a parse/write/transform stage
+
+    A cancelled job stops waiting right away instead of when the thread finishes.
+    """
+    check_cancelled()
+    with stage(stage_for(func)):
+        future = asyncio.ensure_future(asyncio.to_thread(profile_blocking(func), *args))
+        return await wait_cancellable(future)
@@ -0,0 +1,76 @@
+"""
+Isolated workspace directories for jobs and multi-step sessions
+"""
+
+import os
+import uuid
+import shutil
+import logging
+from contextlib import contextmanager
+from utils.helpers import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Every workspace is a unique directory below this root
+WORKSPACE_ROOT = os.path.join(TEMP_DIR, "jobs")
+
+def create_workspace(user_id: int) -> str:
+    """Create a unique workspace directory for one job or session"""
+    path = os.path.join(WORKSPACE_ROOT, f"{user_id}_{uuid.uuid4().hex[:12]}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def remove_workspace(path: str):
+    """Delete a workspace directory and everything in it"""
+    if not path:
+        return
+    try:
+        shutil.rmtree(path, ignore_errors=True)
+    except Exception as e:
+        logger.error(f"Error removing workspace {path}: {e}")
+
+@contextmanager
+def job_workspace(user_id: int):
+    """Workspace for a single job, removed on completion or error"""
+    path = create_workspace(user_id)
+    try:
+        yield path
+    finally:
+        remove_workspace(path)
+
+def get_session_workspace(update, context) -> str:
+    """Get the workspace of the user's multi-step session, creating it on first use"""
+    path = context.user_data.get('workspace')
+    if path and os.path.isdir(path):
+        return path
+
+    path = create_workspace(update.effective_user.id)
+    context.user_data['workspace'] = path
+    return path
+
+def release_session_workspace(context):
+    """Delete the session workspace, if any, and forget it"""
+    remove_workspace(context.user_data.pop('workspace', None))
+
+def reset_user_data(context):
+    """End the user's session: delete its workspace and clear conversation state"""
+    release_session_workspace(context)
+    context.user_data.clear()
+
+def cleanup_stale_workspaces(keep=()) -> int:
+    """Remove workspaces left behind by a previous run, except those of persisted sessions"""
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+
+    keep = {os.path.normpath(path) for path in keep if path}
+    removed = 0
+    for name in os.listdir(WORKSPACE_ROOT):
+        path = os.path.join(WORKSPACE_ROOT, name)
+        if os.path.normpath(path) in keep:
+            continue
+        remove_workspace(path)
+        removed += 1
+
+    if removed:
+        logger.info(f"Removed {removed} stale workspaces")
+    return removed
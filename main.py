@@ -8,10 +8,20 @@ import os
 import sys
 import asyncio
 import logging
+import secrets
+import importlib.util
 from telegram import Update, BotCommand
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 from bot.handlers import *
 from bot.database import init_database
+from bot.workspace import cleanup_stale_workspaces
+from bot.janitor import schedule_janitor
+from bot.persistence import SQLitePersistence
+from bot.rate_limiter import TokenBucketRateLimiter
+from bot.scheduler import MAX_CONCURRENT_JOBS
+from utils.helpers import UPLOAD_CONCURRENCY
+from bot.metrics import instrument, start_metrics_server
+from bot.batch import shutdown_worker_pool
 
 # Setup logging
 logging.basicConfig(
@@ -23,46 +33,157 @@ logger = logging.getLogger(__name__)
 # Token bot dari environment variable
 BOT_TOKEN = "8131425355:AAFWisLEDBnXm-NsJq-6EgVh247n4o7NwOY"
 
+# Mode serving: 'polling' (default) atau 'webhook'
+BOT_MODE = os.environ.get('BOT_MODE', 'polling').lower()
+
+# Jumlah update yang diproses bersamaan (worker)
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', '32'))
+
+# Koneksi HTTP ke Bot API: satu per worker ditambah upload paralel dari setiap job yang berjalan
+CONNECTION_POOL_SIZE = int(os.environ.get(
+    'CONNECTION_POOL_SIZE', str(BOT_WORKERS + MAX_CONCURRENT_JOBS * UPLOAD_CONCURRENCY)
+))
+
+# Detik menunggu koneksi kosong sebelum gagal; upload besar bisa menahan koneksi cukup lama
+POOL_TIMEOUT = float(os.environ.get('POOL_TIMEOUT', '30'))
+
+# Konfigurasi webhook
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')  # URL publik, contoh: https://nama-app.herokuapp.com
+WEBHOOK_LISTEN = os.environ.get('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('PORT', os.environ.get('WEBHOOK_PORT', '8443')))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+
+# Bot API alternatif, misalnya stand-in lokal untuk pengujian end-to-end
+BOT_API_BASE_URL = os.environ.get('BOT_API_BASE_URL')
+BOT_API_BASE_FILE_URL = os.environ.get('BOT_API_BASE_FILE_URL')
+
+# Dependensi berat konverter dimuat saat pertama dipakai; set PREWARM_IMPORTS=0 agar tidak dipanaskan di background
+PREWARM_IMPORTS = os.environ.get('PREWARM_IMPORTS', '1') == '1'
+PREWARM_MODULES = ('pandas', 'openpyxl', 'vobject')
+PREWARM_DELAY = 5  # detik setelah startup, agar tidak bersaing dengan update pertama
+
 async def setup_commands(application):
     """Setup bot commands untuk menu"""
-    commands = [
-        BotCommand("start", "Mulai menggunakan bot"),
-        BotCommand("help", "Tampilkan bantuan"),
-        BotCommand("menu", "Tampilkan semua menu"),
-        
-        # File Conversion
-        BotCommand("rekapgroup", "Rekap nama grup dan jumlah member"),
-        BotCommand("cv_txt_to_vcf", "Convert TXT ke VCF"),
-        BotCommand("cv_vcf_to_txt", "Convert VCF ke TXT"),
-        BotCommand("cv_xlsx_to_vcf", "Convert XLSX ke VCF"),
-        BotCommand("txt2vcf", "Convert TXT ke VCF otomatis"),
-        BotCommand("cvadminfile", "Kelola file admin"),
-        
-        # File Management
-        BotCommand("renamectc", "Ganti nama kontak VCF"),
-        BotCommand("renamefile", "Ganti nama file"),
-        BotCommand("gabungtxt", "Gabung file TXT"),
-        BotCommand("gabungvcf", "Gabung file VCF"),
-        BotCommand("pecahfile", "Pecah file VCF"),
-        BotCommand("pecahctc", "Pecah VCF sesuai jumlah kontak"),
-        BotCommand("addctc", "Tambah kontak ke VCF"),
-        BotCommand("delctc", "Hapus kontak dari VCF"),
-        BotCommand("hitungctc", "Hitung total kontak VCF"),
-        BotCommand("totxt", "Simpan pesan ke TXT"),
-        BotCommand("listgc", "Buat list group"),
-        
-        # Other Menu
-        BotCommand("reset_conversions", "Reset duplikat respon"),
-        BotCommand("fixbug", "Perbaiki bug menyeluruh"),
-        BotCommand("laporkanbug", "Laporkan bug"),
+    commands = [BotCommand(command, description) for command, _, description in COMMANDS if description]
+    await application.bot.set_my_commands(commands)
+
+async def prewarm_imports():
+    """Import heavy converter dependencies in the background once the bot is serving"""
+    await asyncio.sleep(PREWARM_DELAY)
+    for name in PREWARM_MODULES:
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except ImportError as e:
+            logger.warning(f"Tidak bisa memuat {name} di background: {e}")
+
+# Aplikasi yang sudah menjalankan on_startup; run_polling memanggilnya lagi saat webhook gagal
+_started = set()
+
+async def on_startup(application):
+    """Clean up after the previous run and start background jobs once state is loaded
+
+    Runs once per Application: the polling fallback re-initializes it after
+    run_webhook failed, while the janitor and metrics server are still running.
+    """
+    if id(application) in _started:
+        return
+    _started.add(id(application))
+    
+    # Hapus workspace sisa proses sebelumnya, kecuali milik sesi yang dipulihkan
+    active = [data.get('workspace') for data in application.user_data.values()]
+    cleanup_stale_workspaces(keep=active)
+    
+    try:
+        await setup_commands(application)
+    except Exception as e:
+        logger.error(f"Error setting bot commands: {e}")
+    
+    schedule_janitor(application)
+    
+    # Simpan referensi server agar tidak di-garbage-collect
+    application.bot_data['metrics_server'] = await start_metrics_server()
+    
+    if PREWARM_IMPORTS:
+        application.create_task(prewarm_imports())
+
+async def on_shutdown(application):
+    """Stop the ZIP batch worker processes"""
+    shutdown_worker_pool()
+
+def build_application():
+    """Build the Application with worker count and optional custom Bot API endpoint"""
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(BOT_WORKERS)
+        .connection_pool_size(CONNECTION_POOL_SIZE)
+        .pool_timeout(POOL_TIMEOUT)
+        .persistence(SQLitePersistence())
+        .rate_limiter(TokenBucketRateLimiter())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(BOT_API_BASE_URL)
+        builder = builder.base_file_url(BOT_API_BASE_FILE_URL or BOT_API_BASE_URL.replace('/bot', '/file/bot'))
+    
+    return builder.build()
+
+def add_handlers(application):
+    """Register the command, upload and text handlers"""
+    # Command handlers, lihat COMMANDS di bot/handlers.py
+    for command, callback, _ in COMMANDS:
+        application.add_handler(CommandHandler(command, instrument(command, callback)))
+    
+    # Message handlers untuk file upload
+    application.add_handler(MessageHandler(filters.Document.ALL, instrument("document", handle_document)))
+    application.add_handler(MessageHandler(filters.PHOTO, instrument("photo", handle_photo)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument("text", handle_text_message)))
+    
+    # Error handler
+    application.add_error_handler(error_handler)
+
+def webhook_available() -> bool:
+    """Check whether webhook mode can start"""
+    if not WEBHOOK_URL:
+        logger.warning("BOT_MODE=webhook tetapi WEBHOOK_URL belum diset")
+        return False
+    
+    if importlib.util.find_spec('tornado') is None:
+        logger.warning("Webhook membutuhkan: pip install \"python-telegram-bot[webhooks]\"")
+        return False
+    
+    return True
+
+def run_bot(application):
+    """Serve updates via webhook when configured, falling back to polling"""
+    if BOT_MODE == 'webhook' and webhook_available():
+        secret_token = WEBHOOK_SECRET
+        if not secret_token:
+            # Tanpa secret tetap, tiap instance punya secret sendiri
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET belum diset, memakai secret acak untuk instance ini")
         
-        # Owner Menu
-        BotCommand("adduser", "Tambah pengguna"),
-        BotCommand("deluser", "Hapus akses pengguna"),
-        BotCommand("totaluser", "Lihat jumlah pengguna"),
-    ]
+        try:
+            logger.info(f"Bot dimulai dalam mode webhook di {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+            application.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=secret_token,
+                max_connections=min(100, BOT_WORKERS),
+                allowed_updates=Update.ALL_TYPES,
+                close_loop=False,
+            )
+            return
+        except Exception as e:
+            logger.error(f"Webhook gagal dijalankan, beralih ke polling: {e}")
     
-    await application.bot.set_my_commands(commands)
+    logger.info("Bot dimulai dalam mode polling")
+    application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 def main():
     """Main function untuk menjalankan bot"""
@@ -70,58 +191,13 @@ def main():
         # Inisialisasi database
         init_database()
         
-        # Buat aplikasi bot
-        application = Application.builder().token(BOT_TOKEN).build()
-        
-        # Command handlers
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(CommandHandler("menu", menu_command))
-        
-        # File Conversion handlers
-        application.add_handler(CommandHandler("rekapgroup", rekap_group_command))
-        application.add_handler(CommandHandler("cv_txt_to_vcf", cv_txt_to_vcf_command))
-        application.add_handler(CommandHandler("cv_vcf_to_txt", cv_vcf_to_txt_command))
-        application.add_handler(CommandHandler("cv_xlsx_to_vcf", cv_xlsx_to_vcf_command))
-        application.add_handler(CommandHandler("txt2vcf", txt2vcf_command))
-        application.add_handler(CommandHandler("cvadminfile", cv_admin_file_command))
-        
-        # File Management handlers
-        application.add_handler(CommandHandler("renamectc", rename_ctc_command))
-        application.add_handler(CommandHandler("renamefile", rename_file_command))
-        application.add_handler(CommandHandler("gabungtxt", gabung_txt_command))
-        application.add_handler(CommandHandler("gabungvcf", gabung_vcf_command))
-        application.add_handler(CommandHandler("pecahfile", pecah_file_command))
-        application.add_handler(CommandHandler("pecahctc", pecah_ctc_command))
-        application.add_handler(CommandHandler("addctc", add_ctc_command))
-        application.add_handler(CommandHandler("delctc", del_ctc_command))
-        application.add_handler(CommandHandler("hitungctc", hitung_ctc_command))
-        application.add_handler(CommandHandler("totxt", to_txt_command))
-        application.add_handler(CommandHandler("listgc", list_gc_command))
-        
-        # Other handlers
-        application.add_handler(CommandHandler("reset_conversions", reset_conversions_command))
-        application.add_handler(CommandHandler("fixbug", fix_bug_command))
-        application.add_handler(CommandHandler("laporkanbug", laporkan_bug_command))
-        
-        # Owner handlers
-        application.add_handler(CommandHandler("adduser", add_user_command))
-        application.add_handler(CommandHandler("deluser", del_user_command))
-        application.add_handler(CommandHandler("totaluser", total_user_command))
-        
-        # Message handlers untuk file upload
-        application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-        application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
-        
-        # Error handler
-        application.add_error_handler(error_handler)
+        # Buat aplikasi bot; update diproses paralel, pembatasan beban lewat bot.scheduler
+        application = build_application()
+        add_handlers(application)
         
         # Start bot
         logger.info("Bot dimulai...")
-        
-        # Untuk development, gunakan polling
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        run_bot(application)
             
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
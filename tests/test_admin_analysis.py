@@ -0,0 +1,60 @@
+"""
+/cvadminfile analysis counts lines, contacts and duplicate phones in one pass, whatever the chunk boundaries
+"""
+
+import hashlib
+from array import array
+import pytest
+from bot import file_converters
+from bot.file_converters import analyze_admin_file, collect_phones, count_distinct
+
+TXT = "Budi|0812-3456-789\nAni,08129876543\nBudi lagi;08123456789\nTanpa nomor\nCici:08111\n"
+
+VCF = (
+    "BEGIN:VCARD\nVERSION:3.0\nFN:Budi\nTEL;TYPE=CELL:+62 812 3456 789\nEND:VCARD\n"
+    "BEGIN:VCARD\nVERSION:3.0\nFN:Ani\nTEL:08129876543\nTEL:+62 812-3456-789\nEND:VCARD\n"
+)
+
+def write(path, content: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+def test_phones_are_hashed_by_their_digits():
+    keys = array('q')
+
+    assert collect_phones([b"|0812-345", b"|tanpa", b"|0812 345"], keys) == 2
+    assert len(keys) == 2 and count_distinct(keys) == 1
+    assert count_distinct(array('q')) == 0
+
+@pytest.mark.parametrize('chunk_size', [7, 64, file_converters.ANALYZE_CHUNK_SIZE])
+def test_txt_counts_do_not_depend_on_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(file_converters, 'ANALYZE_CHUNK_SIZE', chunk_size)
+    content = TXT.encode('utf-8')
+
+    result = analyze_admin_file(write(tmp_path / "kontak.txt", content))
+
+    assert (result['format'], result['lines'], result['contacts'], result['duplicates']) == ('TXT', 5, 4, 1)
+    assert result['sha256'] == hashlib.sha256(content).hexdigest()
+
+@pytest.mark.parametrize('chunk_size', [5, file_converters.ANALYZE_CHUNK_SIZE])
+def test_vcf_duplicates_count_repeated_numbers(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(file_converters, 'ANALYZE_CHUNK_SIZE', chunk_size)
+
+    result = analyze_admin_file(write(tmp_path / "kontak.vcf", VCF.encode('utf-8')))
+
+    assert (result['format'], result['contacts'], result['phones'], result['duplicates']) == ('VCF', 2, 3, 1)
+
+def test_utf16_text_is_scanned_like_utf8(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_converters, 'ANALYZE_CHUNK_SIZE', 9)
+
+    result = analyze_admin_file(write(tmp_path / "kontak.txt", TXT.encode('utf-16')))
+
+    assert result['encoding'].startswith('utf-16')
+    assert (result['lines'], result['contacts'], result['duplicates']) == (5, 4, 1)
+
+def test_empty_and_binary_files(tmp_path):
+    assert analyze_admin_file(write(tmp_path / "kosong.txt", b""))['lines'] == 0
+
+    result = analyze_admin_file(write(tmp_path / "data.bin", b"\x00\x01|0812\n" * 10))
+    assert result['format'] == 'BINARY' and result['contacts'] == 0
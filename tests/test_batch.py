@@ -0,0 +1,72 @@
+"""
+ZIP uploads are converted member by member; the manifest records failures and the status keeps them out of the cache
+"""
+
+import csv
+import asyncio
+import zipfile
+import pytest
+from benchmarks.fakes import FakeUpdate, FakeContext
+from bot import batch
+from bot.metrics import OperationFailed
+from bot.operations import get_operation
+
+CONTACTS = "Budi|08123456789\nAni|08129876543\n"
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch, 'BATCH_WORKERS', 2)
+    yield tmp_path
+    batch.shutdown_worker_pool()
+
+def make_zip(path, members: dict) -> str:
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+def test_members_are_listed_with_skips_and_limits(workdir, monkeypatch):
+    archive = make_zip(workdir / "in.zip", {
+        "a.txt": CONTACTS, "folder/b.TXT": CONTACTS, "foto.jpg": b"x",
+        "__MACOSX/._a.txt": b"x", ".DS_Store": b"x", "besar.txt": "0" * 200,
+    })
+
+    rows = batch.read_batch_members(archive, ('.txt',), max_size=100)
+
+    assert [(row['file'], row['status']) for row in rows] == [
+        ("a.txt", None), ("folder/b.TXT", None), ("foto.jpg", 'dilewati'), ("besar.txt", 'gagal'),
+    ]
+
+    monkeypatch.setattr(batch, 'MAX_BATCH_MEMBERS', 1)
+    with pytest.raises(ValueError):
+        batch.read_batch_members(archive, ('.txt',), max_size=100)
+
+def run_batch(workdir, members: dict):
+    archive = make_zip(workdir / "kontak.zip", members)
+    update = FakeUpdate()
+    outcome = asyncio.run(batch.process_zip_batch(update, FakeContext(), archive, get_operation('txt_to_vcf')))
+    return outcome, update.message
+
+def read_manifest(workdir) -> list:
+    with open(workdir / f"kontak_{batch.MANIFEST_NAME}", encoding='utf-8', newline='') as f:
+        return [row[:3] for row in csv.reader(f)][1:]
+
+def test_every_member_converted(workdir):
+    outcome, message = run_batch(workdir, {"a.txt": CONTACTS, "sub/a.txt": CONTACTS})
+
+    assert outcome is None and message.errors() == []
+    assert [doc['filename'] for doc in message.documents] == ["kontak_hasil.zip"]
+    assert read_manifest(workdir) == [["a.txt", "ok", "2"], ["sub/a.txt", "ok", "2"]]
+
+def test_failed_member_marks_the_batch_partial(workdir):
+    outcome, message = run_batch(workdir, {"a.txt": CONTACTS, "kosong.txt": "\n"})
+
+    assert outcome == 'partial'
+    assert read_manifest(workdir) == [["a.txt", "ok", "2"], ["kosong.txt", "gagal", "0"]]
+
+def test_no_member_converted_raises_operation_failed(workdir):
+    with pytest.raises(OperationFailed):
+        run_batch(workdir, {"kosong.txt": "\n", "juga_kosong.txt": ""})
+
+    assert read_manifest(workdir) == [["kosong.txt", "gagal", "0"], ["juga_kosong.txt", "gagal", "0"]]
@@ -0,0 +1,45 @@
+"""
+The benchmark runner flags regressions beyond noise, records handler failures and skips cases it cannot run
+"""
+
+import pytest
+from benchmarks import run
+from bot.metrics import OperationFailed
+
+def result(case='txt_to_vcf', size='1k', wall=1.0, rss=100.0):
+    return {'case': case, 'size': size, 'wall_s': wall, 'peak_rss_mb': rss, 'errors': []}
+
+def test_compare_flags_slower_and_bigger_runs():
+    baseline = [result(wall=1.0, rss=100.0)]
+
+    assert run.compare([result(wall=1.3, rss=100.0)], baseline) == ["txt_to_vcf 1k: 1.000 s -> 1.300 s"]
+    assert run.compare([result(wall=1.0, rss=130.0)], baseline) == ["txt_to_vcf 1k: peak RSS 100.0 MB -> 130.0 MB"]
+    assert run.compare([result(wall=1.2, rss=120.0)], baseline) == []
+
+def test_compare_ignores_noise_and_unmatched_runs():
+    # Over the ratio but under the absolute thresholds
+    assert run.compare([result(wall=0.03, rss=6.0)], [result(wall=0.01, rss=2.0)]) == []
+    assert run.compare([result(case='baru')], [result()]) == []
+    assert run.compare([{'case': 'txt_to_vcf', 'size': '1k', 'skipped': "vobject tidak terinstall", 'errors': []}], [result()]) == []
+
+def test_case_without_its_module_is_skipped(monkeypatch):
+    case = run.Case('butuh_modul', 'txt', run.run_txt_to_vcf, modules=('modul_yang_tidak_ada',))
+    monkeypatch.setitem(run.CASES, case.name, case)
+
+    outcome = run.spawn_case(case.name, '1k')
+
+    assert outcome['skipped'] == "modul_yang_tidak_ada tidak terinstall"
+    assert 'wall_s' not in outcome
+
+def test_handler_failure_is_recorded_not_raised(tmp_path, monkeypatch):
+    async def failing(update, context, paths, contacts):
+        await update.message.reply_text("❌ Error: file rusak")
+        raise OperationFailed("file rusak")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(run.CASES, 'gagal', run.Case('gagal', 'txt', failing))
+
+    outcome = run.run_child('gagal', '1k')
+
+    assert outcome['errors'] == ["❌ Error: file rusak"]
+    assert outcome['documents'] == 0
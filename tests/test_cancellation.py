@@ -0,0 +1,90 @@
+"""
+/batal stops a job at once, but its scheduler slot is held until the worker thread it left behind returns
+"""
+
+import asyncio
+import threading
+import pytest
+from benchmarks.fakes import FakeUpdate
+from bot import cancellation, handlers
+from bot.scheduler import JobScheduler, run_blocking
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = JobScheduler(max_concurrent=1, max_per_user=1)
+    monkeypatch.setattr(handlers, 'scheduler', scheduler)
+    monkeypatch.setattr(cancellation, 'CANCEL_POLL_INTERVAL', 0.01)
+    return scheduler
+
+async def wait_until(condition, timeout: float = 5):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+def test_cancelled_job_holds_its_slot_until_the_worker_returns(scheduler):
+    worker_started = threading.Event()
+    release_worker = threading.Event()
+    events = []
+
+    def slow_transform():
+        worker_started.set()
+        release_worker.wait(5)
+        events.append('worker returned')
+
+    async def cancelled_job():
+        await run_blocking(slow_transform)
+        events.append('cancelled job finished')
+
+    async def next_job():
+        events.append('next job started')
+
+    async def scenario():
+        first = asyncio.ensure_future(handlers.schedule_job(FakeUpdate(user_id=1), cancelled_job))
+        await wait_until(worker_started.is_set)
+        second = asyncio.ensure_future(handlers.schedule_job(FakeUpdate(user_id=2), next_job))
+
+        assert cancellation.cancel_user_jobs(1) == 1
+        await asyncio.sleep(0.1)
+        # Unwound from run_blocking, but the thread still runs and keeps the slot
+        assert events == [] and scheduler.active_jobs == 1 and not first.done()
+
+        release_worker.set()
+        await asyncio.wait_for(asyncio.gather(first, second), 5)
+
+    asyncio.run(scenario())
+
+    assert events == ['worker returned', 'next job started']
+    assert scheduler.active_jobs == 0
+
+def test_job_cancelled_while_queued_never_starts(scheduler):
+    started = []
+
+    async def scenario():
+        running = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def blocking_job():
+            running.set()
+            await finish.wait()
+
+        async def queued_job():
+            started.append('queued')
+
+        first = asyncio.ensure_future(handlers.schedule_job(FakeUpdate(user_id=1), blocking_job))
+        await running.wait()
+        queued = asyncio.ensure_future(handlers.schedule_job(FakeUpdate(user_id=2), queued_job))
+        await wait_until(lambda: scheduler.queued_jobs == 1)
+
+        assert cancellation.cancel_user_jobs(2) == 1
+        finish.set()
+        await asyncio.gather(first, queued)
+
+    asyncio.run(scenario())
+
+    assert started == []
+    assert scheduler.active_jobs == 0 and scheduler.queued_jobs == 0
+
+def test_checkpoint_outside_a_job_is_a_no_op():
+    cancellation.check_cancelled()
+    assert cancellation.cancel_user_jobs(12345) == 0
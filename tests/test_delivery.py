@@ -0,0 +1,84 @@
+"""
+Split outputs go out as media groups; only a group Telegram rejected is resent one by one
+"""
+
+import os
+import asyncio
+import pytest
+from telegram.error import BadRequest, NetworkError, TimedOut
+from utils import helpers
+
+class FakeDocument:
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+class FakeSent:
+    def __init__(self, file_id):
+        self.document = FakeDocument(file_id)
+
+class FakeMessage:
+    def __init__(self, group_error=None):
+        self.group_error = group_error
+        self.groups = []
+        self.documents = []
+
+    async def reply_media_group(self, media):
+        if self.group_error is not None:
+            raise self.group_error
+        names = [item.media.filename for item in media]
+        self.groups.append(names)
+        return [FakeSent(name) for name in names]
+
+    async def reply_document(self, document, filename, caption):
+        self.documents.append(filename)
+        return FakeSent(filename)
+
+class FakeChat:
+    id = 42
+
+class FakeUpdate:
+    def __init__(self, group_error=None):
+        self.message = FakeMessage(group_error)
+        self.effective_chat = FakeChat()
+
+def make_outputs(directory, count: int) -> list:
+    documents = []
+    for i in range(count):
+        path = os.path.join(directory, f"part_{i + 1:02d}.vcf")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("BEGIN:VCARD\nEND:VCARD\n")
+        documents.append((path, f"Bagian {i + 1}"))
+    return documents
+
+def caption(first: int, last: int) -> str:
+    return f"Bagian {first + 1}-{last + 1}"
+
+def test_outputs_are_planned_in_groups_of_ten_with_oversized_files_alone(tmp_path, monkeypatch):
+    documents = make_outputs(tmp_path, 13)
+    monkeypatch.setattr(helpers, 'MAX_FILE_SIZE', 100)
+    with open(documents[4][0], 'a', encoding='utf-8') as f:
+        f.write("x" * 100)
+
+    plan = helpers._plan_deliveries(documents)
+
+    assert [[index for index, _, _ in batch] for batch in plan] == [[0, 1, 2, 3], [4], [5, 6, 7, 8, 9, 10, 11, 12]]
+
+def test_rejected_group_is_resent_one_by_one(tmp_path):
+    update = FakeUpdate(BadRequest("Group send failed"))
+    documents = make_outputs(tmp_path, 3)
+
+    with helpers.collect_sent_messages() as sent:
+        asyncio.run(helpers.send_documents_to_user(update, documents, caption))
+
+    assert update.message.documents == ["part_01.vcf", "part_02.vcf", "part_03.vcf"]
+    assert [entry['caption'] for entry in sent] == ["Bagian 1", "Bagian 2", "Bagian 3"]
+
+@pytest.mark.parametrize('error', [TimedOut(), NetworkError("Connection reset")])
+def test_group_is_not_resent_after_a_network_error(tmp_path, error):
+    # The group may have reached the chat already; resending would duplicate it
+    update = FakeUpdate(error)
+
+    with pytest.raises(type(error)):
+        asyncio.run(helpers.send_documents_to_user(update, make_outputs(tmp_path, 3), caption))
+
+    assert update.message.documents == []
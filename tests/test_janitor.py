@@ -0,0 +1,98 @@
+"""
+temp/ budget eviction must spare running jobs and live sessions; pruned sessions must reach the persistence
+"""
+
+import os
+import time
+import asyncio
+import pytest
+from telegram.ext import Application
+from bot import janitor
+from bot.database import init_database, load_conversation_state
+from bot.persistence import SQLitePersistence
+from bot.workspace import WORKSPACE_ROOT
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # temp/ and the database are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    init_database()
+    return tmp_path
+
+def make_file(path: str, size: int, age: float = 0) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+def test_budget_evicts_oldest_files_first(workdir):
+    old = make_file(os.path.join('temp', 'old.txt'), 100, age=30)
+    new = make_file(os.path.join('temp', 'new.txt'), 100, age=10)
+
+    result = janitor.sweep_temp_dir(ttl=3600, budget=150)
+
+    assert result == {'files': 1, 'bytes': 100, 'remaining_bytes': 100}
+    assert not os.path.exists(old) and os.path.exists(new)
+
+def test_budget_spares_running_jobs_and_live_sessions(workdir):
+    busy = make_file(os.path.join(WORKSPACE_ROOT, '7_aaaa', 'input.vcf'), 100, age=50)
+    session = os.path.join(WORKSPACE_ROOT, '8_bbbb')
+    live = make_file(os.path.join(session, 'merge.vcf'), 100, age=40)
+    idle = make_file(os.path.join(WORKSPACE_ROOT, '9_cccc', 'input.vcf'), 100, age=30)
+
+    result = janitor.sweep_temp_dir(ttl=3600, budget=0, busy_users={7}, sessions=[session])
+
+    assert result['files'] == 1
+    assert os.path.exists(busy) and os.path.exists(live) and not os.path.exists(idle)
+
+def test_expired_session_files_are_still_removed(workdir):
+    session = os.path.join(WORKSPACE_ROOT, '8_bbbb')
+    expired = make_file(os.path.join(session, 'merge.vcf'), 100, age=7200)
+
+    janitor.sweep_temp_dir(ttl=3600, budget=10**9, sessions=[session])
+
+    assert not os.path.exists(expired)
+
+def test_prune_reports_abandoned_and_changed_sessions(workdir):
+    live = os.path.join(WORKSPACE_ROOT, '2_live')
+    os.makedirs(live)
+    user_data = {
+        1: {'workspace': os.path.join(WORKSPACE_ROOT, '1_gone'), 'waiting_for': 'merge_vcf'},
+        2: {'workspace': live, 'merge_output': os.path.join(live, 'swept.vcf'), 'merge_files': 3, 'waiting_for': 'merge_vcf'},
+        3: {'waiting_for': 'txt_to_vcf'},
+    }
+
+    abandoned, changed = janitor.prune_abandoned_sessions(user_data)
+
+    assert abandoned == [1] and changed == [2]
+    assert user_data[2] == {'workspace': live, 'waiting_for': 'merge_vcf'}
+    assert user_data[3] == {'waiting_for': 'txt_to_vcf'}
+
+def test_run_janitor_persists_pruned_sessions(workdir):
+    live = os.path.join(WORKSPACE_ROOT, '2_live')
+    os.makedirs(live)
+    sessions = {
+        1: {'workspace': os.path.join(WORKSPACE_ROOT, '1_gone'), 'waiting_for': 'merge_vcf'},
+        2: {'workspace': live, 'merge_output': os.path.join(live, 'swept.vcf'), 'waiting_for': 'merge_vcf'},
+    }
+
+    async def scenario():
+        persistence = SQLitePersistence()
+        application = Application.builder().token("123:TEST").persistence(persistence).build()
+        for user_id, data in sessions.items():
+            application.user_data[user_id].update(data)
+            await persistence.update_user_data(user_id, application.user_data[user_id])
+        await persistence.flush()
+
+        result = await janitor.run_janitor(application)
+        await application.update_persistence()
+        await persistence.flush()
+        return result, application
+
+    result, application = asyncio.run(scenario())
+
+    assert result['sessions'] == 1
+    assert 1 not in application.user_data
+    assert sorted((user_id, key) for user_id, key, _ in load_conversation_state()) == [(2, 'waiting_for'), (2, 'workspace')]
@@ -0,0 +1,82 @@
+"""
+Outputs over Telegram's upload limit are sent zipped, or as ZIP volumes that join back to the archive
+"""
+
+import os
+import asyncio
+import zipfile
+from utils import helpers
+
+class FakeDocument:
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+class FakeSent:
+    def __init__(self, file_id):
+        self.document = FakeDocument(file_id)
+
+class FakeMessage:
+    def __init__(self):
+        self.texts = []
+        self.documents = {}
+
+    async def reply_text(self, text):
+        self.texts.append(text)
+
+    async def reply_document(self, document, filename, caption):
+        self.documents[filename] = (document.read(), caption)
+        return FakeSent(filename)
+
+class FakeChat:
+    id = 42
+
+class FakeUpdate:
+    def __init__(self):
+        self.message = FakeMessage()
+        self.effective_chat = FakeChat()
+
+def write(path, content: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+def test_volumes_join_back_to_the_original(tmp_path):
+    content = os.urandom(2500)
+    path = write(tmp_path / "data.bin", content)
+
+    volumes = helpers.split_into_volumes(path, 1000)
+
+    assert [os.path.basename(volume) for volume in volumes] == ["data.bin.001", "data.bin.002", "data.bin.003"]
+    assert [os.path.getsize(volume) for volume in volumes] == [1000, 1000, 500]
+    assert b''.join(open(volume, 'rb').read() for volume in volumes) == content
+
+def test_compressible_output_is_sent_as_one_zip(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'MAX_FILE_SIZE', 1000)
+    path = write(tmp_path / "kontak.vcf", b"BEGIN:VCARD\nEND:VCARD\n" * 200)
+    update = FakeUpdate()
+
+    asyncio.run(helpers.send_document_to_user(update, path, "Hasil"))
+
+    [(name, (content, caption))] = update.message.documents.items()
+    assert name == "kontak.vcf.zip" and caption.startswith("Hasil")
+    write(tmp_path / "received.zip", content)
+    with zipfile.ZipFile(tmp_path / "received.zip") as archive:
+        assert archive.read("kontak.vcf") == open(path, 'rb').read()
+    assert not os.path.exists(f"{path}.zip")
+
+def test_incompressible_output_is_sent_as_volumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, 'MAX_FILE_SIZE', 1000)
+    monkeypatch.setattr(helpers, 'VOLUME_SIZE', 900)
+    path = write(tmp_path / "foto.bin", os.urandom(2000))
+    update = FakeUpdate()
+
+    asyncio.run(helpers.send_document_to_user(update, path, "Hasil"))
+
+    names = sorted(update.message.documents)
+    assert names == ["foto.bin.zip.001", "foto.bin.zip.002", "foto.bin.zip.003"]
+    assert "3 bagian ZIP" in update.message.texts[0]
+
+    write(tmp_path / "joined.zip", b''.join(update.message.documents[name][0] for name in names))
+    with zipfile.ZipFile(tmp_path / "joined.zip") as archive:
+        assert archive.read("foto.bin") == open(path, 'rb').read()
+    assert sorted(os.listdir(tmp_path)) == ["foto.bin", "joined.zip"]
@@ -0,0 +1,71 @@
+"""
+Small one-shot inputs are downloaded into memory and convert exactly like the same file on disk
+"""
+
+import io
+import os
+import asyncio
+import pytest
+from benchmarks.fakes import FakeUpdate, FakeContext
+from bot.file_converters import convert_txt_to_vcf
+from utils import helpers
+
+CONTACTS = "Budi|08123456789\nAni|08129876543\n".encode('utf-8')
+
+class FakeFile:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.downloads = []
+
+    async def download_to_memory(self, out):
+        self.downloads.append('memory')
+        out.write(self.content)
+
+    async def download_to_drive(self, custom_path):
+        self.downloads.append('drive')
+        with open(custom_path, 'wb') as f:
+            f.write(self.content)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.mark.parametrize('in_memory, size, expected', [
+    (True, len(CONTACTS), 'memory'),
+    (True, helpers.MEMORY_DOWNLOAD_LIMIT + 1, 'drive'),
+    (False, len(CONTACTS), 'drive'),
+])
+def test_only_small_one_shot_inputs_stay_in_memory(workdir, in_memory, size, expected):
+    file = FakeFile(CONTACTS)
+
+    source = asyncio.run(helpers.download_input(file, "kontak.txt", size, in_memory, directory="job"))
+
+    assert file.downloads == [expected]
+    if expected == 'memory':
+        assert isinstance(source, io.BytesIO) and source.getvalue() == CONTACTS
+        assert helpers.source_path(source) == os.path.join("job", "kontak.txt")
+        assert not os.path.exists("job")
+    else:
+        assert source == os.path.join("job", "kontak.txt") and os.path.exists(source)
+    assert helpers.source_name(source) == "kontak.txt"
+    assert helpers.source_size(source) == len(CONTACTS)
+
+def convert(source) -> tuple:
+    update = FakeUpdate()
+    asyncio.run(convert_txt_to_vcf(update, FakeContext(), source))
+    return update.message.errors(), [(doc['filename'], doc['size']) for doc in update.message.documents]
+
+def test_buffer_converts_like_a_file(workdir):
+    os.makedirs("disk")
+    with open(os.path.join("disk", "kontak.txt"), 'wb') as f:
+        f.write(CONTACTS)
+    from_disk = convert(os.path.join("disk", "kontak.txt"))
+
+    buffer = io.BytesIO(CONTACTS)
+    buffer.name = os.path.join("memory", "kontak.txt")
+    os.makedirs("memory")
+    from_memory = convert(buffer)
+
+    assert from_disk[0] == from_memory[0] == []
+    assert from_disk[1] == from_memory[1] and from_disk[1][0][1] > 0
@@ -0,0 +1,82 @@
+"""
+Merge sessions append each upload as it arrives, skipping lines or vCards already merged when asked to
+"""
+
+import os
+import asyncio
+import pytest
+from benchmarks.fakes import FakeUpdate, FakeContext
+from bot import file_managers
+from bot.file_managers import merge_into_output, read_merge_seen
+
+VCARD_A = "BEGIN:VCARD\nVERSION:3.0\nFN:Budi\nTEL:08123456789\nEND:VCARD"
+VCARD_B = "BEGIN:VCARD\nVERSION:3.0\nFN:Ani\nTEL:08129876543\nEND:VCARD"
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def write(path, text: str) -> str:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return str(path)
+
+def read(path) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def test_txt_duplicates_are_skipped_across_uploads(workdir):
+    output = str(workdir / "merged.txt")
+    seen = set()
+
+    first = merge_into_output(write(workdir / "a.txt", "08111\n08222\n"), output, 'txt', 1, seen)
+    second = merge_into_output(write(workdir / "b.txt", "08222\n08333\n08111\n"), output, 'txt', 2, seen)
+
+    assert (first, second) == ((2, 0), (1, 2))
+    assert read(output) == "=== File 1: a.txt ===\n08111\n08222\n\n=== File 2: b.txt ===\n08333\n"
+
+def test_vcf_duplicates_are_skipped_and_all_duplicates_add_nothing(workdir):
+    output = str(workdir / "merged.vcf")
+    seen = set()
+
+    merge_into_output(write(workdir / "a.vcf", f"{VCARD_A}\n{VCARD_B}\n"), output, 'vcf', 1, seen)
+    merged = read(output)
+    repeat = merge_into_output(write(workdir / "b.vcf", f"{VCARD_B}\n\n{VCARD_A}\n"), output, 'vcf', 2, seen)
+
+    assert repeat == (0, 2)
+    assert read(output) == merged and merged.count("BEGIN:VCARD") == 2
+
+def test_without_dedup_everything_is_appended(workdir):
+    output = str(workdir / "merged.vcf")
+
+    merge_into_output(write(workdir / "a.vcf", VCARD_A), output, 'vcf', 1)
+    assert merge_into_output(write(workdir / "b.vcf", VCARD_A), output, 'vcf', 2) == (1, 0)
+
+    assert read(output).count("BEGIN:VCARD") == 2
+
+def test_seen_set_is_rebuilt_from_the_output(workdir):
+    output = str(workdir / "merged.txt")
+    merge_into_output(write(workdir / "a.txt", "08111\n08222\n"), output, 'txt', 1, set())
+
+    # After a restart the dedup set is gone; the output already holds what was merged
+    seen = read_merge_seen(output, 'txt')
+
+    assert seen == {"08111", "08222"}
+    assert merge_into_output(write(workdir / "b.txt", "08111\n"), output, 'txt', 2, seen) == (0, 1)
+
+def test_merge_session_sends_deduplicated_output(workdir):
+    update = FakeUpdate()
+    context = FakeContext({'waiting_for': 'merge_vcf', 'merge_unique': True})
+
+    async def session():
+        for name, text in (("a.vcf", VCARD_A), ("b.vcf", f"{VCARD_A}\n\n{VCARD_B}")):
+            await file_managers.add_file_to_merge(update, context, write(workdir / name, text))
+        await file_managers.send_merge_result(update, context)
+
+    asyncio.run(session())
+
+    assert update.message.errors() == []
+    [document] = update.message.documents
+    assert document['filename'].endswith(".vcf")
+    assert "Total kontak: 2" in document['caption'] and "Duplikat sudah dihapus" in document['caption']
@@ -0,0 +1,89 @@
+"""
+Operations are timed per stage, failures are counted from OperationFailed, and /metrics renders them
+"""
+
+import asyncio
+import pytest
+from benchmarks.fakes import FakeUpdate, FakeContext
+from bot import metrics
+from bot.database import init_database, get_db_connection
+from bot.handlers import observe_operation
+from bot.scheduler import run_blocking
+
+def parse_rows(text: str) -> list:
+    return text.splitlines()
+
+def test_blocking_work_is_attributed_to_the_operation_and_stage():
+    async def operation():
+        with metrics.track_operation('test_stage_attribution') as span:
+            rows = await run_blocking(parse_rows, "a\nb\nc")
+            metrics.add_bytes('in', 10)
+            metrics.add_contacts(len(rows))
+        return span
+
+    span = asyncio.run(operation())
+
+    assert list(span['stages']) == ['parse'] and span['duration'] >= span['stages']['parse']
+    assert (span['bytes_in'], span['contacts'], span['failed']) == (10, 3, False)
+    assert ('test_stage_attribution', 'parse') in dict(metrics.STAGE_LATENCY.items())
+
+def test_operation_failed_is_counted_and_reraised():
+    before = metrics.OPERATION_ERRORS.get(operation='test_failure')
+
+    with pytest.raises(metrics.OperationFailed):
+        with metrics.track_operation('test_failure') as span:
+            raise metrics.OperationFailed("❌ sudah dilaporkan")
+
+    assert span['failed']
+    assert metrics.OPERATION_ERRORS.get(operation='test_failure') == before + 1
+
+def test_observed_failure_is_logged_as_error_without_a_second_reply(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_database()
+    update = FakeUpdate(user_id=5)
+
+    async def operation():
+        async with observe_operation(update, FakeContext(), 'test_observed', 'a.txt'):
+            await update.message.reply_text("❌ Error: file rusak")
+            raise metrics.OperationFailed("file rusak")
+
+    asyncio.run(operation())
+
+    conn = get_db_connection()
+    rows = conn.execute("SELECT operation_type, status FROM file_operations WHERE user_id = 5").fetchall()
+    conn.close()
+    assert rows == [('test_observed', 'error')]
+    assert update.message.errors() == ["❌ Error: file rusak"]
+
+def test_histogram_percentile_and_rendering():
+    histogram = metrics.Histogram('test_latency_seconds', "Test latency", ('operation',), buckets=(0.1, 1, 10))
+    for value in (0.05, 0.5, 0.5, 5):
+        histogram.observe(value, operation='x')
+
+    assert histogram.percentile(50, operation='x') == 1
+    assert histogram.percentile(100, operation='x') == 10
+
+    text = metrics.render_metrics()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{operation="x",le="1"} 3' in text
+    assert 'test_latency_seconds_count{operation="x"} 4' in text
+
+def test_scrape_endpoint(monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_PORT', 0)
+    assert asyncio.run(metrics.start_metrics_server()) is None
+
+    async def scrape():
+        server = await asyncio.start_server(metrics._handle_scrape, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        responses = []
+        for path in ('/metrics', '/lain'):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+            responses.append((await reader.read()).decode('utf-8'))
+            writer.close()
+        server.close()
+        return responses
+
+    found, missing = asyncio.run(scrape())
+    assert found.startswith("HTTP/1.1 200 OK") and "# TYPE bot_operations_total counter" in found
+    assert missing.startswith("HTTP/1.1 404")
@@ -0,0 +1,87 @@
+"""
+SQLitePersistence writes only changed keys, batches them, and restores user_data after a restart
+"""
+
+import asyncio
+import pytest
+from bot import database
+from bot.persistence import SQLitePersistence
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.init_database()
+
+@pytest.fixture
+def writes(db, monkeypatch):
+    """Every batch handed to save_conversation_state"""
+    batches = []
+    save = database.save_conversation_state
+
+    def recording_save(changes):
+        batches.append(sorted(changes))
+        save(changes)
+
+    monkeypatch.setattr('bot.persistence.save_conversation_state', recording_save)
+    return batches
+
+def test_only_changed_keys_are_written(writes):
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(1, {'waiting_for': 'merge_vcf', 'merge_files': 1})
+        await persistence.flush()
+        await persistence.update_user_data(1, {'waiting_for': 'merge_vcf', 'merge_files': 2})
+        await persistence.flush()
+        await persistence.update_user_data(1, {'merge_files': 2})
+        await persistence.flush()
+
+    asyncio.run(scenario())
+
+    assert writes == [
+        [(1, 'merge_files', '1'), (1, 'waiting_for', '"merge_vcf"')],
+        [(1, 'merge_files', '2')],
+        [(1, 'waiting_for', None)],
+    ]
+
+def test_changes_within_the_delay_share_one_write(writes, monkeypatch):
+    monkeypatch.setattr('bot.persistence.FLUSH_DELAY', 0.01)
+
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(1, {'waiting_for': 'txt_to_vcf'})
+        await persistence.update_user_data(2, {'waiting_for': 'vcf_to_txt'})
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    assert writes == [[(1, 'waiting_for', '"txt_to_vcf"'), (2, 'waiting_for', '"vcf_to_txt"')]]
+
+def test_state_survives_a_restart(writes):
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(1, {'waiting_for': 'split_parts', 'parts': [1, 2]})
+        await persistence.update_user_data(2, {'waiting_for': 'merge_txt'})
+        await persistence.flush()
+        await persistence.drop_user_data(2)
+
+        restarted = SQLitePersistence()
+        user_data = await restarted.get_user_data()
+        # Unchanged data loaded at startup is not written again
+        await restarted.update_user_data(1, user_data[1])
+        await restarted.flush()
+        return user_data
+
+    user_data = asyncio.run(scenario())
+
+    assert user_data == {1: {'waiting_for': 'split_parts', 'parts': [1, 2]}}
+    assert len(writes) == 1
+
+def test_values_that_are_not_json_are_skipped(writes):
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(1, {'waiting_for': 'txt_to_vcf', 'buffer': object()})
+        await persistence.flush()
+
+    asyncio.run(scenario())
+
+    assert writes == [[(1, 'waiting_for', '"txt_to_vcf"')]]
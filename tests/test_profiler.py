@@ -0,0 +1,47 @@
+"""
+/profile must report on every supported interpreter, including 3.12+ where only one cProfile may run
+"""
+
+import asyncio
+from bot import profiler
+from bot.scheduler import run_blocking
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_document(self, chat_id, document, filename, caption):
+        self.sent.append((chat_id, filename, document.read()))
+
+class FakeContext:
+    def __init__(self):
+        self.bot = FakeBot()
+
+def count_digits(text: str) -> int:
+    return sum(ch.isdigit() for ch in text)
+
+def test_profiled_operation_runs_blocking_work_and_sends_report():
+    context = FakeContext()
+
+    async def operation():
+        profiler.arm(owner_id=1, count=1, user_id=2)
+        async with profiler.profile_operation(context, 2, 'txt2vcf'):
+            return await run_blocking(count_digits, "0812" * 1000)
+
+    assert asyncio.run(operation()) == 4000
+    assert profiler.get_armed() is None
+
+    names = [filename for _, filename, _ in context.bot.sent]
+    assert [name.rsplit('.', 1)[1] for name in names] == ['txt', 'pstats']
+    report = context.bot.sent[0][2].decode('utf-8')
+    assert "Operasi: txt2vcf" in report
+
+def test_unarmed_operation_is_not_profiled():
+    context = FakeContext()
+
+    async def operation():
+        async with profiler.profile_operation(context, 2, 'txt2vcf'):
+            return await run_blocking(count_digits, "0812")
+
+    assert asyncio.run(operation()) == 4
+    assert context.bot.sent == []
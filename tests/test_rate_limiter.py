@@ -0,0 +1,86 @@
+"""
+Bot API calls wait for per-chat and global tokens, and 429 RetryAfter answers are retried after the window
+"""
+
+import time
+import asyncio
+import datetime
+import pytest
+from telegram.error import RetryAfter
+from bot import rate_limiter
+from bot.rate_limiter import TokenBucket, TokenBucketRateLimiter
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'RETRY_JITTER', 0)
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=10, capacity=3)
+
+    waits = [bucket.reserve() for _ in range(5)]
+
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3] == pytest.approx(0.1, abs=0.01)
+    assert waits[4] == pytest.approx(0.2, abs=0.01)
+
+def test_blocked_bucket_waits_out_the_window():
+    bucket = TokenBucket(rate=10, capacity=3)
+    bucket.block(0.5)
+
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.01)
+    assert not bucket.idle()
+
+def test_group_chats_use_the_per_minute_limit():
+    limiter = TokenBucketRateLimiter()
+
+    assert limiter._chat_bucket(-100123).rate == pytest.approx(rate_limiter.RATE_LIMIT_GROUP_PER_MINUTE / 60)
+    assert limiter._chat_bucket(42).rate == rate_limiter.RATE_LIMIT_PER_CHAT
+
+def flaky_call(failures: int, retry_after: float):
+    calls = []
+
+    async def callback():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise RetryAfter(datetime.timedelta(seconds=retry_after))
+        return 'terkirim'
+
+    return callback, calls
+
+def process(limiter, callback, chat_id=42, rate_limit_args=None):
+    return asyncio.run(limiter.process_request(
+        callback, (), {}, 'sendDocument', {'chat_id': chat_id}, rate_limit_args
+    ))
+
+def test_retry_after_is_retried_after_the_window():
+    callback, calls = flaky_call(failures=2, retry_after=0.05)
+
+    assert process(TokenBucketRateLimiter(), callback) == 'terkirim'
+
+    assert len(calls) == 3
+    assert calls[1] - calls[0] >= 0.05 and calls[2] - calls[1] >= 0.05
+
+def test_retry_after_holds_other_calls_to_the_chat():
+    limiter = TokenBucketRateLimiter()
+    limited, limited_calls = flaky_call(failures=1, retry_after=0.2)
+    other, other_calls = flaky_call(failures=0, retry_after=0)
+
+    async def scenario():
+        first = asyncio.ensure_future(limiter.process_request(limited, (), {}, 'sendDocument', {'chat_id': 42}, None))
+        await asyncio.sleep(0.05)
+        await limiter.process_request(other, (), {}, 'sendMessage', {'chat_id': 42}, None)
+        await first
+
+    asyncio.run(scenario())
+
+    assert other_calls[0] - limited_calls[0] >= 0.2
+
+def test_gives_up_after_max_retries():
+    callback, calls = flaky_call(failures=5, retry_after=0.01)
+    before = rate_limiter.RATE_LIMIT_FAILURES.get(endpoint='sendDocument')
+
+    with pytest.raises(RetryAfter):
+        process(TokenBucketRateLimiter(), callback, rate_limit_args={'max_retries': 1})
+
+    assert len(calls) == 2
+    assert rate_limiter.RATE_LIMIT_FAILURES.get(endpoint='sendDocument') == before + 1
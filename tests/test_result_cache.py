@@ -0,0 +1,112 @@
+"""
+Result cache: least recently used eviction, stale entry invalidation, and only clean results are stored
+"""
+
+import asyncio
+import itertools
+import pytest
+from telegram.error import BadRequest
+from bot import result_cache
+from bot.database import init_database
+from bot.handlers import run_with_result_cache
+from bot.metrics import OperationFailed
+from utils.helpers import _record_sent
+
+class FakeClock:
+    def __init__(self):
+        self._ticks = itertools.count(1)
+
+    def time(self):
+        return float(next(self._ticks))
+
+class FakeMessage:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def reply_text(self, text):
+        self.sent.append(('text', text))
+
+    async def reply_document(self, document, caption=None):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(('document', document))
+
+    async def reply_media_group(self, media):
+        self.sent.append(('group', [item.media for item in media]))
+
+class FakeUpdate:
+    def __init__(self, error=None):
+        self.message = FakeMessage(error)
+
+class FakeContext:
+    def __init__(self):
+        self.user_data = {}
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(result_cache, 'time', FakeClock())
+    init_database()
+    return result_cache
+
+def test_least_recently_used_entry_is_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'MAX_CACHE_ENTRIES', 2)
+    cache.store_result('a', [{'file_id': 'A'}])
+    cache.store_result('b', [{'file_id': 'B'}])
+    assert cache.get_cached_result('a') == [{'file_id': 'A'}]
+
+    cache.store_result('c', [{'file_id': 'C'}])
+
+    assert cache.get_cached_result('b') is None
+    assert cache.get_cached_result('a') and cache.get_cached_result('c')
+    assert cache.get_cache_stats()['entries'] == 2
+
+def test_cache_key_includes_operation_and_parameters():
+    assert result_cache.make_cache_key('uniq', 'split_vcf', 10) == "split_vcf:uniq:10"
+    assert result_cache.make_cache_key('uniq', 'split_vcf', 10) != result_cache.make_cache_key('uniq', 'split_vcf', 20)
+
+def test_cached_result_is_resent_in_its_groups(cache):
+    cache.store_result('k', [
+        {'text': "Catatan"},
+        {'file_id': 'A', 'group': 1}, {'file_id': 'B', 'group': 1, 'caption': "Bagian 1-2"},
+        {'file_id': 'C', 'caption': "Bagian 3"},
+    ])
+    update = FakeUpdate()
+
+    assert asyncio.run(cache.send_cached_result(update, 'k'))
+
+    assert update.message.sent[1:] == [('text', "Catatan"), ('group', ['A', 'B']), ('document', 'C')]
+
+def test_stale_entry_is_invalidated(cache):
+    cache.store_result('k', [{'file_id': 'expired'}])
+
+    assert not asyncio.run(cache.send_cached_result(FakeUpdate(BadRequest("Wrong file identifier")), 'k'))
+
+    assert cache.get_cached_result('k') is None
+
+def sending_job(status=None, error=None):
+    async def job():
+        _record_sent({'file_id': 'OUT', 'caption': "Hasil"})
+        if error is not None:
+            raise error
+        return status
+    return job
+
+def test_clean_result_is_stored_and_served_next_time(cache):
+    context = FakeContext()
+
+    assert asyncio.run(run_with_result_cache(FakeUpdate(), context, 'k', sending_job())) is None
+    assert asyncio.run(run_with_result_cache(FakeUpdate(), context, 'k', sending_job())) == 'cached'
+
+def test_failed_result_is_not_stored(cache):
+    with pytest.raises(OperationFailed):
+        asyncio.run(run_with_result_cache(FakeUpdate(), FakeContext(), 'k', sending_job(error=OperationFailed("gagal"))))
+
+    assert cache.get_cached_result('k') is None
+
+def test_zip_with_failed_members_is_not_stored(cache):
+    status = asyncio.run(run_with_result_cache(FakeUpdate(), FakeContext(), 'k', sending_job('partial')))
+
+    assert status == 'partial'
+    assert cache.get_cached_result('k') is None
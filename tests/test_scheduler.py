@@ -0,0 +1,106 @@
+"""
+Jobs are admitted round-robin across users, under the global and per-user caps
+"""
+
+import asyncio
+from bot.scheduler import JobScheduler
+
+def run_jobs(scheduler, submissions):
+    """Submit (user_id, name) jobs in order; return names in start order and the peak concurrency"""
+    started = []
+    running = {'now': 0, 'peak': 0, 'per_user': {}}
+
+    async def job(user_id, name):
+        started.append(name)
+        running['now'] += 1
+        running['peak'] = max(running['peak'], running['now'])
+        running['per_user'][user_id] = running['per_user'].get(user_id, 0) + 1
+        assert running['per_user'][user_id] <= scheduler.max_per_user
+        await asyncio.sleep(0.01)
+        running['per_user'][user_id] -= 1
+        running['now'] -= 1
+
+    async def scenario():
+        await asyncio.gather(*[
+            scheduler.submit(user_id, lambda user_id=user_id, name=name: job(user_id, name))
+            for user_id, name in submissions
+        ])
+
+    asyncio.run(scenario())
+    return started, running['peak']
+
+def test_users_take_turns():
+    scheduler = JobScheduler(max_concurrent=1, max_per_user=1)
+
+    started, _ = run_jobs(scheduler, [(1, 'a1'), (1, 'a2'), (1, 'a3'), (2, 'b1'), (3, 'c1')])
+
+    # b1 and c1 arrived after a2 but still go before a3
+    assert started == ['a1', 'a2', 'b1', 'c1', 'a3']
+
+def test_per_user_cap_leaves_slots_to_others():
+    scheduler = JobScheduler(max_concurrent=3, max_per_user=1)
+
+    started, peak = run_jobs(scheduler, [(1, 'a1'), (1, 'a2'), (2, 'b1'), (3, 'c1')])
+
+    assert started[:3] == ['a1', 'b1', 'c1']
+    assert peak == 3
+    assert scheduler.active_jobs == 0 and scheduler.running_users == set()
+
+def test_global_cap():
+    scheduler = JobScheduler(max_concurrent=2, max_per_user=2)
+
+    _, peak = run_jobs(scheduler, [(user_id, f"job{user_id}") for user_id in range(6)])
+
+    assert peak == 2
+
+def test_queue_position_and_cancelled_waiter():
+    scheduler = JobScheduler(max_concurrent=1, max_per_user=1)
+    positions = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        async def on_queued(position):
+            positions.append(position)
+
+        running = asyncio.ensure_future(scheduler.submit(1, blocker))
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(scheduler.submit(2, blocker, on_queued))
+        queued = asyncio.ensure_future(scheduler.submit(3, blocker, on_queued))
+        await asyncio.sleep(0)
+        assert scheduler.queued_jobs == 2
+
+        waiting.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queued_jobs == 1
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert waiting.cancelled()
+
+    asyncio.run(scenario())
+
+    assert positions == [1, 2]
+    assert scheduler.active_jobs == 0 and scheduler.queued_jobs == 0
+
+def test_failed_job_releases_its_slot():
+    scheduler = JobScheduler(max_concurrent=1, max_per_user=1)
+
+    async def failing():
+        raise ValueError("rusak")
+
+    async def ok():
+        return 'ok'
+
+    async def scenario():
+        try:
+            await scheduler.submit(1, failing)
+        except ValueError:
+            pass
+        return await scheduler.submit(1, ok)
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert scheduler.active_jobs == 0
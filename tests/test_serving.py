@@ -0,0 +1,124 @@
+"""
+End-to-end runs of the bot against the local fake Bot API, in polling and webhook mode
+"""
+
+import socket
+import asyncio
+import pytest
+import main
+from bot import metrics
+from bot.database import init_database
+from bot.user_manager import OWNER_USER_ID
+from benchmarks.fake_bot_api import FakeBotAPI
+
+WEBHOOK_SECRET = "rahasia-uji"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Database, persistence and temp/ are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    init_database()
+    return tmp_path
+
+def build_bot(monkeypatch, api):
+    monkeypatch.setattr(main, 'BOT_API_BASE_URL', api.base_url)
+    monkeypatch.setattr(main, 'BOT_API_BASE_FILE_URL', api.base_file_url)
+    application = main.build_application()
+    main.add_handlers(application)
+    return application
+
+async def serve(application, mode: str):
+    await application.initialize()
+    await application.start()
+    if mode == 'polling':
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+    else:
+        port = free_port()
+        await application.updater.start_webhook(
+            listen='127.0.0.1', port=port, url_path='telegram',
+            webhook_url=f"http://127.0.0.1:{port}/telegram", secret_token=WEBHOOK_SECRET,
+        )
+
+async def stop(application, api):
+    await api.release_polls()
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+
+async def convert_txt_to_vcf(api):
+    """Run /cv_txt_to_vcf with an upload and return the VCF the bot sent"""
+    await api.push_update(api.message_update(OWNER_USER_ID, "/cv_txt_to_vcf"))
+    await api.wait_for('sendMessage', lambda params: 'TXT' in params['text'])
+
+    document = api.add_file("kontak.txt", "Budi|08123456789\nAni|08129876543\n".encode('utf-8'))
+    mark = len(api.calls)
+    await api.push_update(api.message_update(OWNER_USER_ID, document=document))
+    sent = await api.wait_for('sendDocument', after=mark)
+    return sent['document']['content']
+
+@pytest.mark.parametrize('mode', ['polling', 'webhook'])
+def test_converts_an_upload_end_to_end(workdir, monkeypatch, mode):
+    async def scenario():
+        api = FakeBotAPI()
+        await api.start()
+        application = build_bot(monkeypatch, api)
+        try:
+            await serve(application, mode)
+            if mode == 'webhook':
+                assert api.webhook['secret_token'] == WEBHOOK_SECRET
+            return await convert_txt_to_vcf(api)
+        finally:
+            await stop(application, api)
+            await api.stop()
+
+    vcf = asyncio.run(scenario()).decode('utf-8')
+    assert vcf.count("BEGIN:VCARD") == 2
+    assert "08123456789" in vcf
+
+def test_webhook_rejects_a_wrong_secret(workdir, monkeypatch):
+    async def scenario():
+        api = FakeBotAPI()
+        await api.start()
+        application = build_bot(monkeypatch, api)
+        try:
+            await serve(application, 'webhook')
+            update = api.message_update(OWNER_USER_ID, "/start")
+            return await api.post_to_webhook(update, "salah"), await api.post_to_webhook(update, None)
+        finally:
+            await stop(application, api)
+            await api.stop()
+
+    assert asyncio.run(scenario()) == (403, 403)
+
+def test_startup_runs_once_when_polling_takes_over(workdir, monkeypatch):
+    """run_polling calls post_init again after run_webhook failed"""
+    monkeypatch.setattr(metrics, 'METRICS_PORT', free_port())
+    monkeypatch.setattr(main, 'PREWARM_IMPORTS', False)
+
+    async def scenario():
+        api = FakeBotAPI()
+        await api.start()
+        application = build_bot(monkeypatch, api)
+        try:
+            await application.initialize()
+            await main.on_startup(application)
+            server = application.bot_data['metrics_server']
+            await main.on_startup(application)
+            janitors = application.job_queue.get_jobs_by_name('janitor')
+            return server, application.bot_data['metrics_server'], len(janitors), api.methods().count('setMyCommands')
+        finally:
+            server = application.bot_data.get('metrics_server')
+            if server is not None:
+                server.close()
+            await application.shutdown()
+            await api.stop()
+
+    first, second, janitors, set_commands = asyncio.run(scenario())
+    assert first is not None and first is second
+    assert janitors == 1
+    assert set_commands == 1
@@ -0,0 +1,49 @@
+"""
+/stats reads daily rollups kept in step with file_operations, and old logs can go without losing them
+"""
+
+import pytest
+from bot import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database.init_database()
+
+def test_logged_operations_are_rolled_up(db):
+    database.log_file_operation(1, 'txt_to_vcf', 'a.txt', 'success')
+    database.log_file_operation(1, 'txt_to_vcf', 'b.txt', 'error')
+    database.log_file_operation(1, 'merge_vcf', 'c.vcf', 'success')
+    database.log_file_operation(2, 'txt_to_vcf', 'd.txt', 'success')
+
+    assert database.get_user_stats(1) == [('txt_to_vcf', 2, 1), ('merge_vcf', 1, 0)]
+    assert database.get_user_stats(1, days=7) == database.get_user_stats(1)
+    assert database.get_global_stats(30) == [('txt_to_vcf', 3, 1), ('merge_vcf', 1, 0)]
+    assert [row[1:] for row in database.get_daily_totals(7)] == [(4, 1)]
+
+def test_rollups_survive_log_cleanup(db):
+    database.log_file_operation(1, 'txt_to_vcf', 'a.txt', 'success')
+    conn = database.get_db_connection()
+    conn.execute("UPDATE file_operations SET operation_date = datetime('now', '-40 days')")
+    conn.commit()
+    conn.close()
+
+    database.cleanup_old_records(30)
+
+    assert database.get_user_stats(1) == [('txt_to_vcf', 1, 0)]
+
+def test_existing_logs_are_backfilled_once(db):
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO file_operations (user_id, operation_type, file_name, operation_date, status) "
+        "VALUES (?, ?, ?, datetime('now'), ?)",
+        [(1, 'vcf_to_txt', 'a.vcf', 'success'), (1, 'vcf_to_txt', 'b.vcf', 'error')]
+    )
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+    database.init_database()
+
+    assert database.get_user_stats(1) == [('vcf_to_txt', 2, 1)]
+    assert database.get_global_stats(30) == [('vcf_to_txt', 2, 1)]
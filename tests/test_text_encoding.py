@@ -0,0 +1,46 @@
+"""
+Text inputs are decoded in the encoding sniffed from their start, without failing on stray bytes later on
+"""
+
+import io
+import logging
+from bot.file_converters import parse_txt_contacts
+from utils.helpers import open_text_source, sniff_encoding, SNIFF_SIZE
+
+def mixed_file_bytes() -> bytes:
+    """Valid UTF-8 for more than the sniff window, then one Windows-1252 line"""
+    lines = [f"Budi {i}|0812{i:08d}\n".encode('utf-8') for i in range(SNIFF_SIZE // 16)]
+    data = b"".join(lines) + "Zoë|08129999\n".encode('cp1252') + "Dewi|08120000\n".encode('utf-8')
+    assert len(data) > SNIFF_SIZE
+    return data
+
+def test_sniffs_utf8_from_the_start():
+    assert sniff_encoding(mixed_file_bytes()[:SNIFF_SIZE]) == 'utf-8'
+
+def test_bad_byte_after_sniff_window_in_path(tmp_path, caplog):
+    path = tmp_path / "kontak.txt"
+    path.write_bytes(mixed_file_bytes())
+
+    with caplog.at_level(logging.WARNING, logger='utils.helpers'):
+        contacts = parse_txt_contacts(str(path))
+
+    assert {'name': 'Zoë', 'phone': '08129999'} in contacts
+    assert contacts[-1] == {'name': 'Dewi', 'phone': '08120000'}
+    assert "1 byte di kontak.txt" in caplog.text
+
+def test_bad_byte_after_sniff_window_in_buffer():
+    source = io.BytesIO(mixed_file_bytes())
+    source.name = "kontak.txt"
+
+    with open_text_source(source) as f:
+        text = f.read()
+
+    assert "Zoë|08129999" in text
+    assert not source.closed
+
+def test_cp1252_undefined_byte_reads_as_latin1(tmp_path):
+    path = tmp_path / "kontak.txt"
+    path.write_bytes(b"A" * SNIFF_SIZE + b"\n\x81|0812\n")
+
+    with open_text_source(str(path)) as f:
+        assert f.read().endswith("\x81|0812\n")
@@ -0,0 +1,76 @@
+"""
+Result parts upload concurrently within the chat's cap, but are recorded in their original order
+"""
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from utils import helpers
+
+def make_update(chat_id: int = 42):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+def make_uploads(delays: list, log: dict):
+    """Upload factories that record their part after sleeping delays[i] seconds"""
+    async def upload(i, delay):
+        log['running'] += 1
+        log['peak'] = max(log['peak'], log['running'])
+        await asyncio.sleep(delay)
+        log['finished'].append(i)
+        helpers._record_sent({'file_id': f"part-{i}"})
+        log['running'] -= 1
+
+    return [lambda i=i, delay=delay: upload(i, delay) for i, delay in enumerate(delays)]
+
+def new_log() -> dict:
+    return {'running': 0, 'peak': 0, 'finished': []}
+
+def test_parts_are_recorded_in_order_whatever_finishes_first(monkeypatch):
+    monkeypatch.setattr(helpers, 'UPLOAD_CONCURRENCY', 3)
+    log = new_log()
+
+    async def scenario():
+        with helpers.collect_sent_messages() as sent:
+            await helpers.upload_concurrently(make_update(), make_uploads([0.05, 0.01, 0.03, 0.0], log))
+        return sent
+
+    sent = asyncio.run(scenario())
+
+    assert log['finished'] != sorted(log['finished'])
+    assert [entry['file_id'] for entry in sent] == ["part-0", "part-1", "part-2", "part-3"]
+    assert log['peak'] == 3
+
+def test_chat_cap_is_shared_by_concurrent_jobs(monkeypatch):
+    monkeypatch.setattr(helpers, 'UPLOAD_CONCURRENCY', 2)
+    log = new_log()
+
+    async def scenario():
+        await asyncio.gather(
+            helpers.upload_concurrently(make_update(), make_uploads([0.02] * 3, log)),
+            helpers.upload_concurrently(make_update(), make_uploads([0.02] * 3, log)),
+        )
+
+    asyncio.run(scenario())
+
+    assert log['peak'] == 2
+    assert helpers._upload_slots == {}
+
+def test_first_failure_stops_the_other_uploads(monkeypatch):
+    monkeypatch.setattr(helpers, 'UPLOAD_CONCURRENCY', 2)
+    log = new_log()
+
+    async def failing():
+        raise ValueError("upload gagal")
+
+    uploads = [failing] + make_uploads([0.05, 0.05, 0.05], log)
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await helpers.upload_concurrently(make_update(), uploads)
+        # Uploads that were not cancelled would finish meanwhile
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    assert log['finished'] == []
+    assert helpers._upload_slots == {}
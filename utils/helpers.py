@@ -0,0 +1,559 @@
+"""
+Helper utilities untuk operasi file
+"""
+
+import io
+import os
+import gzip
+import codecs
+import shutil
+import asyncio
+import logging
+import zipfile
+import itertools
+import contextvars
+from contextlib import contextmanager, asynccontextmanager, ExitStack
+from telegram import InputMediaDocument
+from telegram.error import BadRequest
+from bot.metrics import stage, add_bytes
+from bot.cancellation import check_cancelled
+from bot.progress import report_progress
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API upload limit for documents
+MAX_FILE_SIZE = 50 * 1024 * 1024
+
+# Volume size for split archives, with headroom for multipart overhead
+VOLUME_SIZE = MAX_FILE_SIZE - 1024 * 1024
+
+# Telegram accepts 2 to 10 documents per sendMediaGroup
+MEDIA_GROUP_SIZE = 10
+
+# Uploads in flight per chat; each holds one HTTP connection
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '3'))
+
+# Copy buffer for compressing and splitting
+CHUNK_SIZE = 1024 * 1024
+
+# Directory for downloaded inputs and generated outputs
+TEMP_DIR = "temp"
+
+# Bytes sampled from the start of a text input to pick its encoding
+SNIFF_SIZE = 64 * 1024
+
+# Byte order marks, longest first: the UTF-32 LE mark starts with the UTF-16 LE one
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Share of 2-byte units with a NUL in one half that marks BOM-less UTF-16 (mostly ASCII text)
+UTF16_NUL_RATIO = 0.3
+
+# Codec error handler for bytes past the sniffed sample that do not fit its encoding
+DECODE_FALLBACK = 'cp1252-fallback'
+
+# Undecodable bytes met in the text source being read in this thread, for the warning logged on close
+_decode_fallbacks = contextvars.ContextVar('decode_fallbacks', default=None)
+
+# Inputs up to this size are downloaded into memory instead of temp/
+MEMORY_DOWNLOAD_LIMIT = int(os.environ.get('MEMORY_DOWNLOAD_LIMIT', str(2 * 1024 * 1024)))
+
+# Output compression chosen with /kompres, by output name suffix
+COMPRESSION_SUFFIXES = {'gz': '.gz', 'zip': '.zip'}
+COMPRESS_LEVEL = 6
+
+# Compression of the current operation's outputs, seen by its run_blocking threads
+_output_compression = contextvars.ContextVar('output_compression', default=None)
+
+# Messages sent by the current job, collected for the result cache
+_sent_messages = contextvars.ContextVar('sent_messages', default=None)
+
+# Documents sent in one media group share a group id in the result cache
+_media_group_ids = itertools.count(1)
+
+# chat_id -> {'semaphore', 'users'} while the chat has uploads queued or running
+_upload_slots = {}
+
+# Set inside an upload slot, so nested uploads (volumes of a part) do not wait for another slot
+_in_upload_slot = contextvars.ContextVar('in_upload_slot', default=False)
+
+@contextmanager
+def collect_sent_messages():
+    """Collect documents and notes sent through these helpers within the block"""
+    sent = []
+    token = _sent_messages.set(sent)
+    try:
+        yield sent
+    finally:
+        _sent_messages.reset(token)
+
+def _record_sent(entry: dict):
+    sent = _sent_messages.get()
+    if sent is not None:
+        sent.append(entry)
+
+def format_size(size: int) -> str:
+    """Format byte count for display"""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size} bytes"
+
+def estimate_output_size(input_size: int, ratio: float = None) -> int:
+    """Estimate output size in bytes from the operation's output/input ratio, or 0 if unknown"""
+    if ratio is None:
+        return 0
+    return int(input_size * ratio)
+
+async def warn_if_output_too_large(update, input_size: int, ratio: float = None) -> bool:
+    """Warn the user up front when the result will not fit in one document"""
+    estimated = estimate_output_size(input_size, ratio)
+    if estimated <= MAX_FILE_SIZE:
+        return False
+
+    await update.message.reply_text(
+        f"⚠️ Hasil diperkirakan sekitar {format_size(estimated)}, melebihi batas Telegram {format_size(MAX_FILE_SIZE)}.\n"
+        "File akan dikompres (ZIP) dan dipecah menjadi beberapa bagian bila perlu."
+    )
+    return True
+
+# Sources are either a file path or an in-memory buffer with a .name, see download_input
+
+def source_name(source) -> str:
+    """Get the file name of a path or named buffer"""
+    if isinstance(source, str):
+        return os.path.basename(source)
+    return os.path.basename(getattr(source, 'name', 'file'))
+
+def source_path(source) -> str:
+    """Get a path to derive output names from; buffers are named after their target directory"""
+    if isinstance(source, str):
+        return source
+    name = getattr(source, 'name', 'file')
+    if os.path.dirname(name):
+        return name
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    return os.path.join(TEMP_DIR, name)
+
+def source_size(source) -> int:
+    """Get size in bytes of a path or buffer"""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return source.getbuffer().nbytes
+
+def sniff_encoding(sample: bytes) -> str:
+    """Pick the encoding of a text input from its first bytes
+
+    A BOM decides; otherwise NUL bytes in every other position mean UTF-16, and
+    text that is not valid UTF-8 is taken as Windows-1252 or Latin-1, the usual
+    encodings of contact exports from older phones.
+    """
+    for bom, encoding in BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+
+    units = len(sample) // 2
+    if units:
+        even_nuls = sample[0:units * 2:2].count(0)
+        odd_nuls = sample[1:units * 2:2].count(0)
+        if odd_nuls >= units * UTF16_NUL_RATIO and odd_nuls > even_nuls * 4:
+            return 'utf-16-le'
+        if even_nuls >= units * UTF16_NUL_RATIO and even_nuls > odd_nuls * 4:
+            return 'utf-16-be'
+
+    try:
+        # Not final: the sample may end in the middle of a character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        sample.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def _decode_fallback(error: UnicodeDecodeError):
+    """Decode the offending bytes as Windows-1252, or Latin-1 where it has no character
+
+    Mixed files, e.g. UTF-8 with one line pasted from an older export, keep
+    every byte instead of failing after the whole upload was read.
+    """
+    bad = error.object[error.start:error.end]
+    counter = _decode_fallbacks.get()
+    if counter is not None:
+        counter[0] += len(bad)
+    text = ''.join(bytes([byte]).decode('cp1252', errors='ignore') or chr(byte) for byte in bad)
+    return text, error.end
+
+codecs.register_error(DECODE_FALLBACK, _decode_fallback)
+
+@contextmanager
+def _count_decode_fallbacks(source, encoding: str):
+    counter = [0]
+    token = _decode_fallbacks.set(counter)
+    try:
+        yield
+    finally:
+        _decode_fallbacks.reset(token)
+        if counter[0]:
+            logger.warning(
+                f"{counter[0]} byte di {source_name(source)} bukan {encoding}, dibaca sebagai Windows-1252"
+            )
+
+@contextmanager
+def open_text_source(source):
+    """Open a path or buffer for reading as text in its sniffed encoding
+
+    Decoding happens incrementally as the caller reads; the sample is taken from
+    the read buffer, so nothing is read twice. Bytes later in the file that do
+    not fit the sniffed encoding are read as Windows-1252 and logged. .gz paths
+    are this bot's own compressed outputs and always UTF-8.
+    """
+    if isinstance(source, str):
+        if source.endswith('.gz'):
+            with gzip.open(source, 'rt', encoding='utf-8') as f:
+                yield f
+            return
+
+        with open(source, 'rb', buffering=SNIFF_SIZE) as raw:
+            encoding = sniff_encoding(raw.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+            with _count_decode_fallbacks(source, encoding):
+                with io.TextIOWrapper(raw, encoding=encoding, errors=DECODE_FALLBACK) as f:
+                    yield f
+        return
+
+    with source.getbuffer() as view:
+        encoding = sniff_encoding(bytes(view[:SNIFF_SIZE]))
+    source.seek(0)
+    with _count_decode_fallbacks(source, encoding):
+        wrapper = io.TextIOWrapper(source, encoding=encoding, errors=DECODE_FALLBACK)
+        try:
+            yield wrapper
+        finally:
+            # Leave the underlying buffer open for the caller
+            wrapper.detach()
+
+@contextmanager
+def use_output_compression(compression: str = None):
+    """Compress outputs named with output_path within the block: 'gz', 'zip' or None"""
+    token = _output_compression.set(compression)
+    try:
+        yield
+    finally:
+        _output_compression.reset(token)
+
+def get_output_compression() -> str:
+    return _output_compression.get()
+
+def output_path(file_path: str, appendable: bool = False) -> str:
+    """Name an output for the current compression, e.g. hasil.vcf -> hasil.vcf.gz
+
+    Appendable outputs are gzip for 'zip' too, since a ZIP member cannot be extended;
+    see gzip_to_zip.
+    """
+    compression = _output_compression.get()
+    if compression == 'zip' and appendable:
+        compression = 'gz'
+    return file_path + COMPRESSION_SUFFIXES.get(compression, '')
+
+@contextmanager
+def open_output(file_path: str, mode: str = 'w'):
+    """Open an output for writing, streamed through gzip or zip when named .gz or .zip
+
+    The uncompressed content never reaches disk. Text modes write UTF-8;
+    append ('a') works for plain and .gz outputs only.
+    """
+    binary = 'b' in mode
+    encoding = None if binary else 'utf-8'
+
+    if file_path.endswith('.gz'):
+        with gzip.open(file_path, mode if binary else f"{mode}t", compresslevel=COMPRESS_LEVEL, encoding=encoding) as f:
+            yield f
+    elif file_path.endswith('.zip'):
+        if 'a' in mode:
+            raise ValueError(f"Cannot append to ZIP output {file_path}")
+        with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as archive:
+            # One member named like the archive without .zip
+            with archive.open(os.path.basename(file_path)[:-len('.zip')], 'w', force_zip64=True) as member:
+                if binary:
+                    yield member
+                    return
+                wrapper = io.TextIOWrapper(member, encoding='utf-8')
+                try:
+                    yield wrapper
+                finally:
+                    wrapper.flush()
+                    wrapper.detach()
+    else:
+        with open(file_path, mode, encoding=encoding) as f:
+            yield f
+
+def gzip_to_zip(gz_path: str) -> str:
+    """Recompress an appendable .gz output as .zip without decompressing it to disk; removes the .gz"""
+    zip_path = gz_path[:-len('.gz')] + '.zip'
+    with gzip.open(gz_path, 'rb') as src, open_output(zip_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    os.remove(gz_path)
+    return zip_path
+
+async def download_input(file, file_name: str, file_size: int, in_memory: bool, directory: str = TEMP_DIR):
+    """Download a Telegram file into memory when allowed and small, otherwise into directory"""
+    file_path = os.path.join(directory, os.path.basename(file_name))
+
+    if in_memory and file_size and file_size <= MEMORY_DOWNLOAD_LIMIT:
+        buffer = io.BytesIO()
+        await file.download_to_memory(buffer)
+        # Outputs derived from the buffer's name land in the same directory
+        buffer.name = file_path
+        return buffer
+
+    os.makedirs(directory, exist_ok=True)
+    await file.download_to_drive(file_path)
+    return file_path
+
+async def cleanup_temp_file(file_path):
+    """Remove temporary file if it exists, or release an in-memory buffer"""
+    try:
+        if isinstance(file_path, io.BytesIO):
+            file_path.close()
+        elif file_path and os.path.exists(file_path):
+            os.remove(file_path)
+    except Exception as e:
+        logger.error(f"Error cleaning up temp file {file_path}: {e}")
+
+def compress_file(file_path: str) -> str:
+    """Stream file into a ZIP archive next to it and return the archive path"""
+    archive_path = f"{file_path}.zip"
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        archive.write(file_path, arcname=os.path.basename(file_path))
+    return archive_path
+
+def split_into_volumes(file_path: str, volume_size: int = None) -> list:
+    """Split file into numbered volumes (.001, .002, ...) of at most volume_size bytes"""
+    volume_size = volume_size or VOLUME_SIZE
+    volumes = []
+    with open(file_path, 'rb') as src:
+        while True:
+            volume_path = f"{file_path}.{len(volumes) + 1:03d}"
+            written = 0
+            with open(volume_path, 'wb') as dst:
+                while written < volume_size:
+                    chunk = src.read(min(CHUNK_SIZE, volume_size - written))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    written += len(chunk)
+
+            if not written:
+                os.remove(volume_path)
+                break
+            volumes.append(volume_path)
+
+    return volumes
+
+async def _reply_document(update, file_path: str, caption: str):
+    with open(file_path, 'rb') as f:
+        message = await update.message.reply_document(
+            document=f,
+            filename=os.path.basename(file_path),
+            caption=caption
+        )
+    if message and message.document:
+        _record_sent({'file_id': message.document.file_id, 'caption': caption})
+    return message
+
+async def send_document_to_user(update, file_path: str, caption: str = ""):
+    """Send file to user, compressing and splitting it when over Telegram's size limit"""
+    with stage('upload'):
+        await _send_single(update, file_path, caption)
+
+async def _send_single(update, file_path: str, caption: str):
+    # A cancelled job must not upload its result anyway
+    check_cancelled()
+    file_size = os.path.getsize(file_path)
+    add_bytes('out', file_size)
+    await _send_document(update, file_path, file_size, caption)
+
+@asynccontextmanager
+async def _upload_slot(chat_id):
+    """Hold one of the chat's UPLOAD_CONCURRENCY upload slots, shared by all its jobs"""
+    slot = _upload_slots.get(chat_id)
+    if slot is None:
+        slot = _upload_slots[chat_id] = {'semaphore': asyncio.Semaphore(UPLOAD_CONCURRENCY), 'users': 0}
+    slot['users'] += 1
+    try:
+        async with slot['semaphore']:
+            yield
+    finally:
+        slot['users'] -= 1
+        if not slot['users']:
+            del _upload_slots[chat_id]
+
+async def upload_concurrently(update, uploads: list):
+    """Run upload coroutine factories concurrently within the chat's upload slots
+
+    Sent messages are recorded for the result cache in list order, not completion order.
+    The first failure or cancellation stops the remaining uploads.
+    """
+    if _in_upload_slot.get():
+        for upload in uploads:
+            await upload()
+        return
+
+    chat_id = update.effective_chat.id
+
+    async def run(upload):
+        async with _upload_slot(chat_id):
+            _in_upload_slot.set(True)
+            with collect_sent_messages() as sent:
+                await upload()
+        return sent
+
+    tasks = [asyncio.ensure_future(run(upload)) for upload in uploads]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    for sent in results:
+        for entry in sent:
+            _record_sent(entry)
+
+def _plan_deliveries(documents: list) -> list:
+    """Group indexed (file_path, caption) outputs into media-group batches; oversized files go alone"""
+    deliveries = []
+    batch = []
+    for index, (file_path, caption) in enumerate(documents):
+        if os.path.getsize(file_path) > MAX_FILE_SIZE:
+            if batch:
+                deliveries.append(batch)
+                batch = []
+            deliveries.append([(index, file_path, caption)])
+            continue
+
+        batch.append((index, file_path, caption))
+        if len(batch) == MEDIA_GROUP_SIZE:
+            deliveries.append(batch)
+            batch = []
+    if batch:
+        deliveries.append(batch)
+    return deliveries
+
+async def send_documents_to_user(update, documents: list, batch_caption):
+    """Send several (file_path, caption) outputs as media groups of up to MEDIA_GROUP_SIZE documents
+
+    Each group carries one caption, batch_caption(first, last) with 0-based indices.
+    Files over the size limit, lone leftovers and groups Telegram rejects are sent one by one
+    with their own caption. Groups upload concurrently, so captions carry the order.
+    """
+    total = len(documents)
+    done = 0
+
+    async def deliver(batch):
+        nonlocal done
+        if len(batch) > 1:
+            await _send_media_group(update, batch, batch_caption)
+        else:
+            _, file_path, caption = batch[0]
+            await _send_single(update, file_path, caption)
+        done += len(batch)
+        report_progress(done, total)
+
+    with stage('upload'):
+        await upload_concurrently(update, [
+            lambda batch=batch: deliver(batch) for batch in _plan_deliveries(documents)
+        ])
+
+async def _send_media_group(update, batch: list, batch_caption):
+    check_cancelled()
+    caption = batch_caption(batch[0][0], batch[-1][0])
+    batch_size = sum(os.path.getsize(file_path) for _, file_path, _ in batch)
+    
+    try:
+        with ExitStack() as stack:
+            # Telegram shows the last document's caption under the group
+            media = [
+                InputMediaDocument(
+                    media=stack.enter_context(open(file_path, 'rb')),
+                    filename=os.path.basename(file_path),
+                    caption=caption if position == len(batch) - 1 else None
+                )
+                for position, (_, file_path, _) in enumerate(batch)
+            ]
+            messages = await update.message.reply_media_group(media=media)
+    except BadRequest as e:
+        # Only a rejected group is safe to resend; after a timeout or network error
+        # the group may have been delivered already
+        logger.warning(f"Media group of {len(batch)} documents failed, sending one by one: {e}")
+        for _, file_path, single_caption in batch:
+            await _send_single(update, file_path, single_caption)
+        return
+    
+    add_bytes('out', batch_size)
+    group_id = next(_media_group_ids)
+    for position, message in enumerate(messages):
+        if message and message.document:
+            _record_sent({
+                'file_id': message.document.file_id,
+                'caption': caption if position == len(messages) - 1 else None,
+                'group': group_id,
+            })
+
+async def _send_document(update, file_path: str, file_size: int, caption: str):
+    if file_size <= MAX_FILE_SIZE:
+        await _reply_document(update, file_path, caption)
+        return
+
+    generated = []
+    try:
+        archive_path = await asyncio.to_thread(compress_file, file_path)
+        generated.append(archive_path)
+        archive_size = os.path.getsize(archive_path)
+        archive_name = os.path.basename(archive_path)
+
+        if archive_size <= MAX_FILE_SIZE:
+            await _reply_document(
+                update, archive_path,
+                f"{caption}\n\n📦 File {format_size(file_size)} dikompres menjadi {format_size(archive_size)}. "
+                f"Ekstrak {archive_name} untuk membuka."
+            )
+            return
+
+        volumes = await asyncio.to_thread(split_into_volumes, archive_path)
+        generated.extend(volumes)
+        total = len(volumes)
+        first_volume = os.path.basename(volumes[0])
+
+        instructions = (
+            f"{caption}\n\n"
+            f"📦 File terlalu besar ({format_size(file_size)}), dikirim sebagai {total} bagian ZIP.\n"
+            f"Cara menggabungkan setelah semua bagian diunduh:\n"
+            f"• Android/Linux/Mac: cat {archive_name}.* > {archive_name}\n"
+            f"• Windows: copy /b {archive_name}.001+{archive_name}.002+... {archive_name}\n"
+            f"• Atau buka {first_volume} dengan 7-Zip\n"
+            f"Lalu ekstrak {archive_name}."
+        )
+        await update.message.reply_text(instructions)
+        _record_sent({'text': instructions})
+
+        await upload_concurrently(update, [
+            lambda i=i, volume_path=volume_path: _reply_document(
+                update, volume_path,
+                f"📦 Bagian {i+1}/{total} dari {archive_name} — gabungkan semua bagian sebelum ekstrak"
+            )
+            for i, volume_path in enumerate(volumes)
+        ])
+
+    finally:
+        for path in generated:
+            await cleanup_temp_file(path)